@@ -0,0 +1,422 @@
+"""
+Vectorized engine for many faces at once.
+
+BatchRoboEyes keeps the animation state of N faces in NumPy arrays and
+advances them with the same rules as RoboEyes.update, but in one vectorized
+step for all faces. The sweat drops of all faces share one
+particles.ParticleEmitter, three drops per face. Every face is then drawn into its own tile of a shared
+atlas surface, reusing eye sprites between faces with the same geometry.
+
+    faces = BatchRoboEyes(64, 128, 64, columns=8)
+    faces.open()
+    faces.set_autoblinker(True, 2, 3)
+    faces.set_mood(Mood.HAPPY, faces=slice(0, 32))
+    faces.update(now_ms)
+    atlas = faces.render()
+"""
+import numpy as np
+import pygame
+
+import particles
+import raster
+from emotions import Mood, Position, PygameBackend, draw_smooth_rounded_rect, ease
+from layout import get_layout
+from sprite_cache import SpriteCache
+
+SWEAT_DROPS = 3
+
+
+class BatchRoboEyes:
+    def __init__(self, count, width=1024, height=512, columns=None, seed=None,
+                 eye_width=None, eye_height=None, border_radius=None, space_between=None):
+        """Eye sizes default to the layout for width x height, see layout.py"""
+        layout = self.layout = get_layout(width, height)
+        eye_width = eye_width or layout.eye_width
+        eye_height = eye_height or layout.eye_height
+        border_radius = border_radius or layout.border_radius
+        space_between = space_between or layout.space_between
+        self.count = count
+        self.screen_width = width
+        self.screen_height = height
+        self.columns = columns or count
+        self.rows = -(-count // self.columns)
+
+        self.BG_COLOR = (0, 0, 0)
+        self.MAIN_COLOR = (0, 200, 255)
+        self.reference_frame_ms = 20
+        self.last_update_ms = None
+        self.rng = np.random.default_rng(seed)
+
+        self.atlas = pygame.Surface((self.columns * width, self.rows * height))
+        self.tiles = [self.atlas.subsurface(self.face_rect(i)) for i in range(count)]
+        self.sprite_cache = SpriteCache()
+        self.backend = PygameBackend()
+
+        def full(value, dtype=np.int64):
+            return np.full(count, value, dtype=dtype)
+
+        def flags():
+            return np.zeros(count, dtype=bool)
+
+        self.tired = flags()
+        self.angry = flags()
+        self.happy = flags()
+        self.curious = flags()
+        self.cyclops = flags()
+        self.eye_l_open = flags()
+        self.eye_r_open = flags()
+
+        self.eye_l_width_default = full(eye_width)
+        self.eye_l_height_default = full(eye_height)
+        self.eye_l_width_current = self.eye_l_width_default.copy()
+        self.eye_l_height_current = full(1)
+        self.eye_l_width_next = self.eye_l_width_default.copy()
+        self.eye_l_height_next = self.eye_l_height_default.copy()
+        self.eye_l_height_offset = full(0)
+        self.eye_l_border_radius_current = full(border_radius)
+
+        self.eye_r_width_default = full(eye_width)
+        self.eye_r_height_default = full(eye_height)
+        self.eye_r_width_current = self.eye_r_width_default.copy()
+        self.eye_r_height_current = full(1)
+        self.eye_r_width_next = self.eye_r_width_default.copy()
+        self.eye_r_height_next = self.eye_r_height_default.copy()
+        self.eye_r_height_offset = full(0)
+        self.eye_r_border_radius_current = full(border_radius)
+
+        self.space_between_current = full(space_between)
+        self.space_between_next = full(space_between)
+
+        self.eye_l_x = full((width - (2 * eye_width + space_between)) // 2)
+        self.eye_l_y = full((height - eye_height) // 2)
+        self.eye_l_x_next = self.eye_l_x.copy()
+        self.eye_l_y_next = self.eye_l_y.copy()
+        self.eye_l_y_target = self.eye_l_y.copy()
+        self.eye_r_x = self.eye_l_x + eye_width + space_between
+        self.eye_r_y = self.eye_l_y.copy()
+        self.eye_r_x_next = self.eye_r_x.copy()
+        self.eye_r_y_next = self.eye_r_y.copy()
+        self.eye_r_y_target = self.eye_r_y.copy()
+
+        self.eyelids_tired_height = full(0)
+        self.eyelids_tired_height_next = full(0)
+        self.eyelids_angry_height = full(0)
+        self.eyelids_angry_height_next = full(0)
+        self.eyelids_happy_bottom_offset = full(0)
+        self.eyelids_happy_bottom_offset_next = full(0)
+
+        self.h_flicker = flags()
+        self.h_flicker_alternate = flags()
+        self.h_flicker_amplitude = full(layout.h_flicker)
+        self.h_flicker_offset = full(0)
+        self.v_flicker = flags()
+        self.v_flicker_alternate = flags()
+        self.v_flicker_amplitude = full(layout.v_flicker)
+        self.v_flicker_offset = full(0)
+
+        self.autoblinker = flags()
+        self.blink_interval = full(1)
+        self.blink_interval_variation = full(4)
+        self.blink_timer = full(0)
+
+        self.idle = flags()
+        self.idle_interval = full(1)
+        self.idle_interval_variation = full(3)
+        self.idle_timer = full(0)
+
+        self.confused = flags()
+        self.confused_timer = full(0)
+        self.confused_duration = 500
+        self.confused_toggle = full(True, bool)
+
+        self.laugh = flags()
+        self.laugh_timer = full(0)
+        self.laugh_duration = 500
+        self.laugh_toggle = full(True, bool)
+
+        # Drops 3i..3i+2 belong to face i and get the left, middle and right
+        # bands, like the emitter of a single RoboEyes
+        self.sweat = flags()
+        self.sweat_drops = particles.sweat(width, self.rng, count * SWEAT_DROPS, layout.scale)
+
+    def face_rect(self, index):
+        column, row = index % self.columns, index // self.columns
+        return pygame.Rect(column * self.screen_width, row * self.screen_height,
+                           self.screen_width, self.screen_height)
+
+    def select(self, faces):
+        """Boolean mask for faces given as None (all), an index, a slice, indices or a mask"""
+        mask = np.zeros(self.count, dtype=bool)
+        mask[slice(None) if faces is None else faces] = True
+        return mask
+
+    def get_screen_constraint_x(self):
+        return self.screen_width - self.eye_l_width_current - self.space_between_current - self.eye_r_width_current
+
+    def get_screen_constraint_y(self):
+        return self.screen_height - self.eye_l_height_default
+
+    def set_mood(self, mood, faces=None):
+        mask = self.select(faces)
+        self.tired[mask] = mood == Mood.TIRED
+        self.angry[mask] = mood == Mood.ANGRY
+        self.happy[mask] = mood == Mood.HAPPY
+
+    def set_position(self, position, faces=None):
+        mask = self.select(faces)
+        cx = self.get_screen_constraint_x()
+        cy = self.get_screen_constraint_y()
+        if position in (Position.N, Position.S):
+            x = cx // 2
+        elif position in (Position.NE, Position.E, Position.SE):
+            x = cx
+        elif position in (Position.SW, Position.W, Position.NW):
+            x = np.zeros_like(cx)
+        else:
+            x = cx // 2
+        if position in (Position.N, Position.NE, Position.NW):
+            y = np.zeros_like(cy)
+        elif position in (Position.SE, Position.S, Position.SW):
+            y = cy
+        else:
+            y = cy // 2
+        self.eye_l_x_next[mask] = x[mask]
+        self.eye_l_y_next[mask] = y[mask]
+
+    def set_autoblinker(self, active, interval=1, variation=4, faces=None):
+        mask = self.select(faces)
+        self.autoblinker[mask] = active
+        self.blink_interval[mask] = interval
+        self.blink_interval_variation[mask] = variation
+
+    def set_idle_mode(self, active, interval=1, variation=3, faces=None):
+        mask = self.select(faces)
+        self.idle[mask] = active
+        self.idle_interval[mask] = interval
+        self.idle_interval_variation[mask] = variation
+
+    def set_curiosity(self, curious, faces=None):
+        self.curious[self.select(faces)] = curious
+
+    def set_cyclops(self, cyclops, faces=None):
+        self.cyclops[self.select(faces)] = cyclops
+
+    def set_sweat(self, sweat, faces=None):
+        self.sweat[self.select(faces)] = sweat
+
+    def close(self, left=True, right=True, faces=None):
+        mask = self.select(faces)
+        if left:
+            self.eye_l_height_next[mask] = 1
+            self.eye_l_open[mask] = False
+        if right:
+            self.eye_r_height_next[mask] = 1
+            self.eye_r_open[mask] = False
+
+    def open(self, left=True, right=True, faces=None):
+        mask = self.select(faces)
+        if left:
+            self.eye_l_open[mask] = True
+        if right:
+            self.eye_r_open[mask] = True
+
+    def blink(self, left=True, right=True, faces=None):
+        self.close(left, right, faces)
+        self.open(left, right, faces)
+
+    def anim_confused(self, faces=None):
+        self.confused[self.select(faces)] = True
+
+    def anim_laugh(self, faces=None):
+        self.laugh[self.select(faces)] = True
+
+    def update(self, now_ms):
+        """Advance every face to now_ms in one vectorized step"""
+        if self.last_update_ms is None:
+            dt_ms = self.reference_frame_ms
+        else:
+            dt_ms = max(0, now_ms - self.last_update_ms)
+        self.last_update_ms = now_ms
+        factor = 0.5 ** (dt_ms / self.reference_frame_ms)
+
+        self.update_eye_geometry(factor)
+        self.update_timers(now_ms)
+        self.update_flicker()
+        self.update_eyelids(factor)
+        if self.sweat.any():
+            self.update_sweat(dt_ms / self.reference_frame_ms)
+
+    def update_eye_geometry(self, f):
+        constraint_x = self.get_screen_constraint_x()
+        margin, offset = self.layout.curious_margin, self.layout.curious_offset
+        self.eye_l_height_offset = np.where(
+            self.curious & ((self.eye_l_x_next <= margin) | ((self.eye_l_x_next >= constraint_x - margin) & self.cyclops)),
+            offset, 0)
+        self.eye_r_height_offset = np.where(
+            self.curious & (self.eye_r_x_next >= self.screen_width - self.eye_r_width_current - margin), offset, 0)
+
+        self.eye_l_height_current = ease(self.eye_l_height_current, self.eye_l_height_next + self.eye_l_height_offset, f)
+        eye_l_y_shift = (self.eye_l_height_default - self.eye_l_height_current) // 2 - self.eye_l_height_offset // 2
+        self.eye_r_height_current = ease(self.eye_r_height_current, self.eye_r_height_next + self.eye_r_height_offset, f)
+        eye_r_y_shift = (self.eye_r_height_default - self.eye_r_height_current) // 2 - self.eye_r_height_offset // 2
+
+        reopen_l = self.eye_l_open & (self.eye_l_height_current <= 1 + self.eye_l_height_offset)
+        self.eye_l_height_next[reopen_l] = self.eye_l_height_default[reopen_l]
+        reopen_r = self.eye_r_open & (self.eye_r_height_current <= 1 + self.eye_r_height_offset)
+        self.eye_r_height_next[reopen_r] = self.eye_r_height_default[reopen_r]
+
+        self.eye_l_width_current = ease(self.eye_l_width_current, self.eye_l_width_next, f)
+        self.eye_r_width_current = ease(self.eye_r_width_current, self.eye_r_width_next, f)
+        self.space_between_current = ease(self.space_between_current, self.space_between_next, f)
+
+        self.eye_l_x = ease(self.eye_l_x, self.eye_l_x_next, f)
+        self.eye_l_y_target = self.eye_l_y_next + eye_l_y_shift
+        self.eye_l_y = ease(self.eye_l_y, self.eye_l_y_target, f)
+
+        self.eye_r_x_next = self.eye_l_x_next + self.eye_l_width_current + self.space_between_current
+        self.eye_r_y_next = self.eye_l_y_next.copy()
+        self.eye_r_x = ease(self.eye_r_x, self.eye_r_x_next, f)
+        self.eye_r_y_target = self.eye_r_y_next + eye_r_y_shift
+        self.eye_r_y = ease(self.eye_r_y, self.eye_r_y_target, f)
+
+    def schedule(self, now_ms, interval, variation, mask):
+        """Next timer value for the masked faces: interval plus a random 0..variation seconds"""
+        return now_ms + interval[mask] * 1000 + self.rng.integers(0, variation[mask] + 1) * 1000
+
+    def update_timers(self, now_ms):
+        blinking = self.autoblinker & (now_ms >= self.blink_timer)
+        if blinking.any():
+            self.blink(faces=blinking)
+            self.blink_timer[blinking] = self.schedule(
+                now_ms, self.blink_interval, self.blink_interval_variation, blinking)
+
+        laugh_start = self.laugh & self.laugh_toggle
+        laugh_end = self.laugh & ~self.laugh_toggle & (now_ms >= self.laugh_timer + self.laugh_duration)
+        self.v_flicker[laugh_start] = True
+        self.v_flicker_amplitude[laugh_start] = self.layout.laugh_flicker
+        self.laugh_timer[laugh_start] = now_ms
+        self.laugh_toggle[laugh_start] = False
+        self.v_flicker[laugh_end] = False
+        self.v_flicker_amplitude[laugh_end] = 0
+        self.laugh_toggle[laugh_end] = True
+        self.laugh[laugh_end] = False
+
+        confused_start = self.confused & self.confused_toggle
+        confused_end = (self.confused & ~self.confused_toggle
+                        & (now_ms >= self.confused_timer + self.confused_duration))
+        self.h_flicker[confused_start] = True
+        self.h_flicker_amplitude[confused_start] = self.layout.confused_flicker
+        self.confused_timer[confused_start] = now_ms
+        self.confused_toggle[confused_start] = False
+        self.h_flicker[confused_end] = False
+        self.h_flicker_amplitude[confused_end] = 0
+        self.confused_toggle[confused_end] = True
+        self.confused[confused_end] = False
+
+        wandering = self.idle & (now_ms >= self.idle_timer)
+        if wandering.any():
+            # Eyes larger than the screen have no room to wander
+            constraint_x = np.maximum(0, self.get_screen_constraint_x()[wandering])
+            constraint_y = np.maximum(0, self.get_screen_constraint_y()[wandering])
+            self.eye_l_x_next[wandering] = self.rng.integers(0, constraint_x + 1)
+            self.eye_l_y_next[wandering] = self.rng.integers(0, constraint_y + 1)
+            self.idle_timer[wandering] = self.schedule(
+                now_ms, self.idle_interval, self.idle_interval_variation, wandering)
+
+    def update_flicker(self):
+        self.h_flicker_offset = np.where(
+            self.h_flicker, np.where(self.h_flicker_alternate, self.h_flicker_amplitude, -self.h_flicker_amplitude), 0)
+        self.h_flicker_alternate ^= self.h_flicker
+        self.v_flicker_offset = np.where(
+            self.v_flicker, np.where(self.v_flicker_alternate, self.v_flicker_amplitude, -self.v_flicker_amplitude), 0)
+        self.v_flicker_alternate ^= self.v_flicker
+
+    def update_eyelids(self, f):
+        half_height = self.eye_l_height_current // 2
+        self.eyelids_tired_height_next = np.where(self.tired & ~self.angry, half_height, 0)
+        self.eyelids_angry_height_next = np.where(self.angry, half_height, 0)
+        self.eyelids_happy_bottom_offset_next = np.where(self.happy, half_height, 0)
+
+        self.eyelids_tired_height = ease(self.eyelids_tired_height, self.eyelids_tired_height_next, f)
+        self.eyelids_angry_height = ease(self.eyelids_angry_height, self.eyelids_angry_height_next, f)
+        self.eyelids_happy_bottom_offset = ease(
+            self.eyelids_happy_bottom_offset, self.eyelids_happy_bottom_offset_next, f)
+
+    def update_sweat(self, step):
+        self.sweat_drops.update(step, np.repeat(self.sweat, SWEAT_DROPS))
+
+    def get_sweat_rects(self):
+        """Integer (x, y, w, h) drop columns as (faces, drops) arrays"""
+        return tuple(column.reshape(self.count, SWEAT_DROPS) for column in self.sweat_drops.rects())
+
+    def get_eye_sprite(self, i, left):
+        if left:
+            geometry = (int(self.eye_l_width_current[i]), int(self.eye_l_height_current[i]),
+                        int(self.eye_l_border_radius_current[i]), int(self.eye_l_height_default[i]))
+        else:
+            geometry = (int(self.eye_r_width_current[i]), int(self.eye_r_height_current[i]),
+                        int(self.eye_r_border_radius_current[i]), int(self.eye_r_height_default[i]))
+        width, height, radius, height_default = geometry
+        if width <= 0 or height <= 0:
+            return None
+        cyclops = bool(self.cyclops[i])
+        eyelids = (int(self.eyelids_tired_height[i]), int(self.eyelids_angry_height[i]),
+                   int(self.eyelids_happy_bottom_offset[i]))
+        key = (left, cyclops) + geometry + eyelids + (self.MAIN_COLOR, self.BG_COLOR)
+
+        def build():
+            sprite = pygame.Surface((width, height), 0, self.atlas)
+            sprite.fill(self.BG_COLOR)
+            self.backend.compose_eye(sprite, 0, 0, width, height, radius, height_default, left, cyclops,
+                                     *eyelids, self.MAIN_COLOR, self.BG_COLOR)
+            return sprite
+
+        return self.sprite_cache.get(key, build)
+
+    def render(self):
+        """Draw every face into its tile of the atlas surface and return the atlas"""
+        self.atlas.fill(self.BG_COLOR)
+        eye_l_x = (self.eye_l_x + self.h_flicker_offset).tolist()
+        eye_l_y = (self.eye_l_y + self.v_flicker_offset).tolist()
+        eye_r_x = (self.eye_r_x + self.h_flicker_offset).tolist()
+        eye_r_y = (self.eye_r_y + self.v_flicker_offset).tolist()
+        cyclops = self.cyclops.tolist()
+        sweat = self.sweat.tolist()
+        drops = [column.tolist() for column in self.get_sweat_rects()]
+        radius = self.sweat_drops.border_radius
+
+        for i, tile in enumerate(self.tiles):
+            blits = []
+            sprite = self.get_eye_sprite(i, True)
+            if sprite is not None:
+                blits.append((sprite, (eye_l_x[i], eye_l_y[i])))
+            if not cyclops[i]:
+                sprite = self.get_eye_sprite(i, False)
+                if sprite is not None:
+                    blits.append((sprite, (eye_r_x[i], eye_r_y[i])))
+            tile.blits(blits, doreturn=False)
+
+            if sweat[i]:
+                for rect in zip(*(column[i] for column in drops)):
+                    draw_smooth_rounded_rect(tile, self.MAIN_COLOR, rect, radius)
+        return self.atlas
+
+    def render_array(self, antialias=True):
+        """
+        Rasterize every face with NumPy in one pass, without pygame, and
+        return the atlas as a (height, width, 3) uint8 array. Even without
+        antialias this is not pixel-identical to render(): the rasterizer's
+        exact corner circles cover a few pixels per corner that pygame leaves
+        out.
+        """
+        coverage = raster.face_coverage(self, self.screen_height, self.screen_width, self.get_sweat_rects(),
+                                        self.sweat_drops.border_radius, antialias)
+        tiles = np.zeros((self.rows * self.columns, self.screen_height, self.screen_width), dtype=np.float32)
+        tiles[:self.count] = coverage
+        atlas = (tiles.reshape(self.rows, self.columns, self.screen_height, self.screen_width)
+                 .transpose(0, 2, 1, 3).reshape(self.rows * self.screen_height, self.columns * self.screen_width))
+        return raster.shade(atlas, self.MAIN_COLOR, self.BG_COLOR)
+
+    def get_frame_array(self):
+        """Copy of the atlas as a (height, width, 3) NumPy array"""
+        return pygame.surfarray.array3d(self.atlas).swapaxes(0, 1)
@@ -0,0 +1,231 @@
+"""
+Headless benchmark for the RoboEyes update and render paths.
+
+Runs every scenario at every resolution with the SDL dummy video driver and
+a simulated 50 FPS clock, so results are reproducible between runs:
+
+    python benchmark.py
+    python benchmark.py --frames 500 --resolutions 128x64 1024x512 --json out.json
+
+Startup (import, construction and first frame, headless and windowed) is
+timed first, each run in a fresh interpreter; --startup-runs 0 skips it.
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import particles
+from emotions import RoboEyes, Mood
+
+STARTUP_RESOLUTION = (1024, 512)
+RESOLUTIONS = [(128, 64), (320, 240), (640, 480), (1024, 512), (1280, 720), (1920, 1080)]
+
+
+def keep_laughing(eyes, frame):
+    if not eyes.laugh:
+        eyes.anim_laugh()
+
+
+def keep_confused(eyes, frame):
+    if not eyes.confused:
+        eyes.anim_confused()
+
+
+def setup_mood(mood):
+    def setup(eyes):
+        eyes.set_mood(mood)
+    return setup
+
+
+def setup_cyclops(eyes):
+    eyes.set_cyclops(True)
+
+
+def setup_sweat(eyes):
+    eyes.set_sweat(True)
+
+
+def setup_rain(eyes):
+    eyes.set_sweat(True)
+    eyes.add_effect("rain", particles.rain(eyes.screen_width, eyes.screen_height,
+                                           np.random.default_rng(0), count=500))
+
+
+def setup_curious_idle(eyes):
+    eyes.set_curiosity(True)
+    eyes.set_idle_mode(True, 1, 2)
+
+
+# name -> (setup(eyes), per_frame(eyes, frame) or None)
+SCENARIOS = {
+    "default": (setup_mood(Mood.DEFAULT), None),
+    "tired": (setup_mood(Mood.TIRED), None),
+    "angry": (setup_mood(Mood.ANGRY), None),
+    "happy": (setup_mood(Mood.HAPPY), None),
+    "cyclops": (setup_cyclops, None),
+    "sweat": (setup_sweat, None),
+    "rain": (setup_rain, None),
+    "laugh": (None, keep_laughing),
+    "confused": (None, keep_confused),
+    "curious_idle": (setup_curious_idle, None),
+}
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def make_eyes(width, height, scenario, seed):
+    eyes = RoboEyes(width, height, headless=True, seed=seed)
+    eyes.open()
+    eyes.set_autoblinker(True, 2, 3)
+    setup, per_frame = SCENARIOS[scenario]
+    if setup is not None:
+        setup(eyes)
+    return eyes, per_frame
+
+
+def run_frames(eyes, per_frame, start_frame, frames, frame_ms, update_times=None, render_times=None):
+    for frame in range(start_frame, start_frame + frames):
+        if per_frame is not None:
+            per_frame(eyes, frame)
+        t0 = time.perf_counter_ns()
+        eyes.update(frame * frame_ms)
+        t1 = time.perf_counter_ns()
+        eyes.render()
+        t2 = time.perf_counter_ns()
+        if update_times is not None:
+            update_times.append((t1 - t0) / 1e6)
+            render_times.append((t2 - t1) / 1e6)
+
+
+def bench(width, height, scenario, frames=300, warmup=50, frame_ms=20, seed=0):
+    """Time one scenario at one resolution, returning a dict of results"""
+    eyes, per_frame = make_eyes(width, height, scenario, seed)
+    run_frames(eyes, per_frame, 0, warmup, frame_ms)
+    update_times = []
+    render_times = []
+    run_frames(eyes, per_frame, warmup, frames, frame_ms, update_times, render_times)
+
+    # Separate pass, tracemalloc slows everything down
+    eyes, per_frame = make_eyes(width, height, scenario, seed)
+    run_frames(eyes, per_frame, 0, warmup, frame_ms)
+    tracemalloc.start()
+    run_frames(eyes, per_frame, warmup, frames, frame_ms)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total_ms = sum(update_times) + sum(render_times)
+    return {
+        "resolution": "%dx%d" % (width, height),
+        "scenario": scenario,
+        "frames": frames,
+        "update_p50_ms": percentile(update_times, 50),
+        "update_p95_ms": percentile(update_times, 95),
+        "update_p99_ms": percentile(update_times, 99),
+        "render_p50_ms": percentile(render_times, 50),
+        "render_p95_ms": percentile(render_times, 95),
+        "render_p99_ms": percentile(render_times, 99),
+        "mean_frame_ms": statistics.fmean(u + r for u, r in zip(update_times, render_times)),
+        "fps": frames * 1000 / total_ms if total_ms else float("inf"),
+        "alloc_peak_kib": peak / 1024,
+        "alloc_retained_kib": current / 1024,
+    }
+
+
+# Runs in a fresh interpreter so nothing is imported or initialized yet
+STARTUP_SCRIPT = """
+import json, time
+t0 = time.perf_counter()
+from emotions import RoboEyes
+t1 = time.perf_counter()
+eyes = RoboEyes(%d, %d, headless=%s)
+t2 = time.perf_counter()
+eyes.open()
+eyes.draw_eyes()
+t3 = time.perf_counter()
+print(json.dumps([(t1 - t0) * 1000, (t2 - t1) * 1000, (t3 - t2) * 1000]))
+"""
+
+
+def bench_startup(width, height, headless, runs=5):
+    """Median import, construction and first frame times over fresh processes"""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT % (width, height, headless)],
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.splitlines()[-1]))
+    import_ms, init_ms, first_frame_ms = (statistics.median(column) for column in zip(*samples))
+    return {
+        "resolution": "%dx%d" % (width, height),
+        "scenario": "startup_headless" if headless else "startup_window",
+        "runs": runs,
+        "import_ms": import_ms,
+        "init_ms": init_ms,
+        "first_frame_ms": first_frame_ms,
+        "total_ms": import_ms + init_ms + first_frame_ms,
+    }
+
+
+def parse_resolution(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RoboEyes update and render paths")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--resolutions", nargs="+", type=parse_resolution,
+                        default=RESOLUTIONS, metavar="WxH")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--startup-runs", type=int, default=5, metavar="N",
+                        help="fresh processes per startup measurement (0 skips startup)")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    if args.startup_runs > 0:
+        print("%-10s %-17s %9s %9s %11s %9s" % ("res", "startup", "import", "init", "first frm", "total"))
+        for headless in (True, False):
+            result = bench_startup(*STARTUP_RESOLUTION, headless, args.startup_runs)
+            results.append(result)
+            print("%-10s %-17s %9.1f %9.1f %11.1f %9.1f" % (
+                result["resolution"], result["scenario"], result["import_ms"], result["init_ms"],
+                result["first_frame_ms"], result["total_ms"]))
+        print()
+
+    print("%-10s %-13s %9s %9s %9s %9s %9s %10s" % (
+        "res", "scenario", "upd p50", "upd p99", "rnd p50", "rnd p99", "fps", "peak KiB"))
+    for width, height in args.resolutions:
+        for scenario in args.scenarios:
+            result = bench(width, height, scenario, args.frames, args.warmup, seed=args.seed)
+            results.append(result)
+            print("%-10s %-13s %9.3f %9.3f %9.3f %9.3f %9.0f %10.1f" % (
+                result["resolution"], scenario,
+                result["update_p50_ms"], result["update_p99_ms"],
+                result["render_p50_ms"], result["render_p99_ms"],
+                result["fps"], result["alloc_peak_kib"]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Precomputed expression clips in one memory-mapped file.
+
+build_library() compiles a set of short timelines (a blink in every mood, a
+laugh, a confused look, a glance towards every Position), renders each frame
+once and stores only what changed since the previous frame, as runs of
+changed 16x16 tiles (the first frame of a clip against a cleared screen).
+A moving eye only changes along its edges, so most frames are a few
+kilobytes. Pixels are stored as one byte each, the coverage from BG_COLOR (0) to
+MAIN_COLOR (255), so the colors are picked at playback.
+
+ClipLibrary maps the file and wraps patches as 8-bit pygame surfaces that
+point straight into the mapping; playing a frame is a few blits with no
+decoding, and every robot with the same file shows the same pixels.
+
+    python cliplib.py build eyes.clips --size 1024x512
+    python cliplib.py play eyes.clips blink_happy --loop
+
+    library = ClipLibrary("eyes.clips")
+    player = LibraryPlayer(library, eyes)
+    player.play("laugh", now_ms)
+    while player.show(now_ms):          # False once the clip has ended
+        ...
+
+File layout: a 16 byte magic, the little-endian uint64 length of a JSON
+index, the index, then 64 byte aligned arrays whose offsets the index
+gives: per frame the (first, end) patch numbers, per patch its rect and
+pixel offset, per frame the RENDER_FIELDS state, and the pixel bytes.
+"""
+import argparse
+import json
+import mmap
+import struct
+
+import numpy as np
+import pygame
+
+from emotions import Mood, Position, RoboEyes
+from timeline import RENDER_FIELDS, ClipPlayer, Timeline, compile_timeline
+
+MAGIC = b"ROBOEYES-CLIPS01"
+ALIGNMENT = 64
+TILE_SIZE = 16
+PATCH_DTYPE = np.dtype([("x", "<i4"), ("y", "<i4"), ("width", "<i4"), ("height", "<i4"), ("offset", "<i8")])
+
+# Every clip starts after its mood has settled with the eyes open; the
+# frames before are compiled but not stored
+WARMUP_MS = 1000
+
+
+def canonical_timelines():
+    """name -> (commands after the warmup, duration_ms) of the standard library"""
+    timelines = {}
+    for mood in Mood:
+        timelines["blink_" + mood.name.lower()] = ([[0, "set_mood", mood.name], [WARMUP_MS, "blink"]], 500)
+    timelines["laugh"] = ([[WARMUP_MS, "anim_laugh"]], 700)
+    timelines["confused"] = ([[WARMUP_MS, "anim_confused"]], 700)
+    for position in Position:
+        # Look over, hold, and come back to the center (position 0)
+        timelines["glance_" + position.name.lower()] = (
+            [[WARMUP_MS, "set_position", position.name], [WARMUP_MS + 500, "set_position", 0]], 1000)
+    return timelines
+
+
+def coverage(surface, main_color, bg_color):
+    """(h, w) uint8 coverage of a surface, 0 for bg_color and 255 for main_color"""
+    pixels = pygame.surfarray.pixels3d(surface).transpose(1, 0, 2)
+    bg = np.asarray(bg_color, dtype=np.float32)
+    direction = np.asarray(main_color, dtype=np.float32) - bg
+    values = ((pixels - bg) @ direction) / max(1.0, float(direction @ direction))
+    return np.clip(np.rint(values * 255), 0, 255).astype(np.uint8)
+
+
+def changed_runs(previous, current, tile_size=TILE_SIZE):
+    """
+    Rects covering every pixel that differs between two coverage frames:
+    runs of changed tiles along each tile row, cropped to the frame.
+    """
+    height, width = current.shape
+    tiles_y, tiles_x = -(-height // tile_size), -(-width // tile_size)
+    changed = np.zeros((tiles_y * tile_size, tiles_x * tile_size), dtype=bool)
+    changed[:height, :width] = previous != current
+    tiles = changed.reshape(tiles_y, tile_size, tiles_x, tile_size).any(axis=(1, 3))
+    rects = []
+    for row, columns in enumerate(tiles):
+        # Run starts and ends from the edges of the changed tiles in this row
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], columns.astype(np.int8), [0]))))
+        for start, end in zip(edges[::2].tolist(), edges[1::2].tolist()):
+            rect = pygame.Rect(start * tile_size, row * tile_size, (end - start) * tile_size, tile_size)
+            rects.append(rect.clip(pygame.Rect(0, 0, width, height)))
+    return rects
+
+
+def palette(main_color, bg_color):
+    """256 colors blending bg_color to main_color, the inverse of coverage()"""
+    bg = np.asarray(bg_color, dtype=np.float32)
+    ramp = np.arange(256, dtype=np.float32)[:, None] / 255
+    colors = np.rint(bg + ramp * (np.asarray(main_color, dtype=np.float32) - bg)).astype(int)
+    return [tuple(color) for color in colors.tolist()]
+
+
+def build_library(path, width=1024, height=512, fps=50, seed=0, timelines=None):
+    """
+    Render timelines (canonical_timelines() by default) and write them to
+    path. Returns the number of bytes written.
+    """
+    timelines = timelines or canonical_timelines()
+    eyes = RoboEyes(width, height, headless=True, seed=seed)
+    warmup = WARMUP_MS * fps // 1000
+    clips = {}
+    frames, patches, tracks, pixels = [], [], [], []
+    size = 0
+    for name, (commands, duration_ms) in timelines.items():
+        timeline = Timeline(WARMUP_MS + duration_ms, [[0, "open"]] + list(commands))
+        clip = compile_timeline(timeline, width, height, fps, seed)
+        player = ClipPlayer(clip, eyes)
+        clips[name] = [len(frames), clip.frame_count - warmup]
+        # The player clears the screen when a clip starts
+        previous = np.zeros((height, width), dtype=np.uint8)
+        for frame in range(warmup, clip.frame_count):
+            player.seek(frame)
+            eyes.render()
+            current = coverage(eyes.screen, eyes.MAIN_COLOR, eyes.BG_COLOR)
+            rects = changed_runs(previous, current)
+            frames.append((len(patches), len(patches) + len(rects)))
+            for rect in rects:
+                data = current[rect.top:rect.bottom, rect.left:rect.right].tobytes()
+                patches.append((rect.x, rect.y, rect.width, rect.height, size))
+                pixels.append(data)
+                size += len(data)
+            previous = current
+            tracks.append(clip.tracks[frame])
+
+    arrays = [
+        ("frames", np.asarray(frames, dtype="<i8").reshape(-1, 2)),
+        ("patches", np.asarray(patches, dtype=PATCH_DTYPE)),
+        ("tracks", np.asarray(tracks, dtype="<i4").reshape(-1, len(RENDER_FIELDS))),
+    ]
+    index = {"width": width, "height": height, "fps": fps, "seed": seed, "fields": list(RENDER_FIELDS),
+             "clips": clips, "arrays": {}}
+    # Offsets depend on the index length, which depends on the offsets:
+    # reserve room for them first
+    for name in ("frames", "patches", "tracks", "pixels"):
+        index["arrays"][name] = 10 ** 12
+    header_size = align(len(MAGIC) + 8 + len(json.dumps(index).encode()))
+    offset = header_size
+    for name, array in arrays:
+        index["arrays"][name] = offset
+        offset = align(offset + array.nbytes)
+    index["arrays"]["pixels"] = offset
+    encoded = json.dumps(index).encode().ljust(header_size - len(MAGIC) - 8)
+
+    with open(path, "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", len(encoded)) + encoded)
+        for name, array in arrays:
+            f.seek(index["arrays"][name])
+            f.write(array.tobytes())
+        f.seek(index["arrays"]["pixels"])
+        for data in pixels:
+            f.write(data)
+        return f.tell()
+
+
+def align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+class ClipLibrary:
+    """Read-only view of a library file; clip data stays in the mapping"""
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError("%s is not a RoboEyes clip library" % path)
+        (length,) = struct.unpack_from("<Q", self.map, len(MAGIC))
+        index = json.loads(self.map[len(MAGIC) + 8:len(MAGIC) + 8 + length])
+        if index["fields"] != list(RENDER_FIELDS):
+            raise ValueError("%s was built for different render fields, rebuild it" % path)
+        self.width = index["width"]
+        self.height = index["height"]
+        self.fps = index["fps"]
+        self.clips = {name: tuple(span) for name, span in index["clips"].items()}
+        offsets = index["arrays"]
+        total = sum(count for _, count in self.clips.values())
+        self.frames = np.frombuffer(self.map, "<i8", total * 2, offsets["frames"]).reshape(-1, 2)
+        patch_count = int(self.frames[-1, 1]) if total else 0
+        self.patches = np.frombuffer(self.map, PATCH_DTYPE, patch_count, offsets["patches"])
+        self.tracks = np.frombuffer(self.map, "<i4", total * len(RENDER_FIELDS),
+                                    offsets["tracks"]).reshape(-1, len(RENDER_FIELDS))
+        self.pixels = memoryview(self.map)[offsets["pixels"]:]
+
+    @property
+    def names(self):
+        return list(self.clips)
+
+    def frame_count(self, name):
+        return self.clips[name][1]
+
+    def duration_ms(self, name):
+        return self.frame_count(name) * 1000 // self.fps
+
+    def frame_patches(self, name, frame):
+        """
+        (rect, 8-bit surface) pairs of one frame. The surfaces point into the
+        mapping: blit them and let them go, or keep surface.copy() instead.
+        """
+        first, count = self.clips[name]
+        if not 0 <= frame < count:
+            raise IndexError("%s has %d frames" % (name, count))
+        start, end = self.frames[first + frame].tolist()
+        result = []
+        for x, y, width, height, offset in self.patches[start:end].tolist():
+            surface = pygame.image.frombuffer(self.pixels[offset:offset + width * height], (width, height), "P")
+            result.append((pygame.Rect(x, y, width, height), surface))
+        return result
+
+    def state(self, name, frame):
+        """RENDER_FIELDS values of one frame"""
+        first, _ = self.clips[name]
+        return self.tracks[first + frame]
+
+    def close(self):
+        """
+        Drop the arrays and unmap the file. Surfaces from frame_patches() and
+        rows from state() that are still alive hold the mapping open; it is
+        then unmapped when the last of them is gone, and the library can no
+        longer be used either way. Closing twice does nothing.
+        """
+        if self.map is None:
+            return
+        self.frames = self.patches = self.tracks = None
+        pixels, self.pixels = self.pixels, None
+        mapping, self.map = self.map, None
+        try:
+            pixels.release()
+            mapping.close()
+        except BufferError:
+            pass
+
+
+class LibraryPlayer:
+    """Plays library clips on a RoboEyes instance of the same size"""
+    def __init__(self, library, eyes):
+        if (eyes.screen_width, eyes.screen_height) != (library.width, library.height):
+            raise ValueError("library is %dx%d but the eyes are %dx%d"
+                             % (library.width, library.height, eyes.screen_width, eyes.screen_height))
+        self.library = library
+        self.eyes = eyes
+        self.name = None
+        self.start_ms = 0
+        self.frame = None
+        self.loop = False
+
+    def play(self, name, now_ms, loop=False):
+        if name not in self.library.clips:
+            raise KeyError("no clip named %r" % (name,))
+        self.name = name
+        self.start_ms = now_ms
+        self.frame = None
+        self.loop = loop
+
+    def show(self, now_ms):
+        """
+        Blit the frame due at now_ms onto the screen and present it. Returns
+        False, handing the screen and the clip's last state back to the eyes,
+        once the clip has ended.
+        """
+        library, eyes = self.library, self.eyes
+        count = library.frame_count(self.name)
+        target = int((now_ms - self.start_ms) * library.fps // 1000)
+        if self.loop:
+            target %= count
+        elif target >= count:
+            self.finish()
+            return False
+
+        # Frames are deltas: catch up through every frame since the last one
+        # shown, or restart from the first frame
+        if self.frame is None or target < self.frame:
+            eyes.screen.fill(eyes.BG_COLOR)
+            eyes.dirty_rects = [eyes.screen.get_rect()]
+            first = 0
+        else:
+            eyes.dirty_rects = []
+            first = self.frame + 1
+        colors = palette(eyes.MAIN_COLOR, eyes.BG_COLOR)
+        for frame in range(first, target + 1):
+            for rect, surface in library.frame_patches(self.name, frame):
+                surface.set_palette(colors)
+                eyes.screen.blit(surface, rect)
+                eyes.dirty_rects.append(rect)
+        self.frame = target
+
+        if eyes.dirty_rects:
+            for output in eyes.outputs:
+                output(eyes.screen, eyes.dirty_rects, now_ms)
+            eyes.present()
+        return True
+
+    def finish(self):
+        """Put the eyes into the state of the last frame shown and let them draw again"""
+        if self.frame is not None:
+            for name, value in zip(RENDER_FIELDS, self.library.state(self.name, self.frame).tolist()):
+                setattr(self.eyes, name, value)
+        self.eyes.full_redraw = True
+        self.eyes.rest_frame_drawn = False
+        self.name = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or preview a RoboEyes clip library")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="render the canonical clips into a library file")
+    build.add_argument("path")
+    build.add_argument("--size", default="1024x512", metavar="WxH")
+    build.add_argument("--fps", type=int, default=50)
+    build.add_argument("--seed", type=int, default=0)
+    play = commands.add_parser("play", help="show one clip of a library")
+    play.add_argument("path")
+    play.add_argument("clip", nargs="?", help="clip name (default: list the clips)")
+    play.add_argument("--loop", action="store_true")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        width, height = (int(value) for value in args.size.lower().split("x"))
+        size = build_library(args.path, width, height, args.fps, args.seed)
+        print("Wrote %s (%.1f MB)" % (args.path, size / 1e6))
+        return
+
+    library = ClipLibrary(args.path)
+    if args.clip is None:
+        for name in library.names:
+            print("%-16s %4d frames %6d ms" % (name, library.frame_count(name), library.duration_ms(name)))
+        return
+    eyes = RoboEyes(library.width, library.height)
+    player = LibraryPlayer(library, eyes)
+    player.play(args.clip, eyes.time_source(), loop=args.loop)
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                running = False
+        if not player.show(eyes.time_source()):
+            running = False
+        eyes.clock.tick(library.fps)
+    library.close()
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
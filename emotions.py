@@ -1,8 +1,16 @@
+import math
 import pygame
-import pygame.gfxdraw
 import random
 import time
 from enum import IntEnum
+from operator import attrgetter
+from governor import FULL_QUALITY
+from layout import get_layout
+from profiler import FrameProfiler
+from sprite_cache import SpriteCache
+
+# Posted by RoboEyes.wake() to end a rest wait early
+WAKE_EVENT = pygame.event.custom_type()
 
 class Mood(IntEnum):
     DEFAULT = 0
@@ -20,25 +28,325 @@ class Position(IntEnum):
     W = 7   # west, middle left
     NW = 8  # north-west, top left
 
+def flag_arg(value):
+    if not isinstance(value, bool):
+        raise ValueError("expected true or false, got %r" % (value,))
+    return value
+
+def count_arg(value):
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise ValueError("expected a non-negative integer, got %r" % (value,))
+    return value
+
+def amplitude_arg(value):
+    return None if value is None else count_arg(value)
+
+def number_arg(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError("expected a number, got %r" % (value,))
+    return float(value)
+
+def enum_arg(enum, value, extra=()):
+    """Enum member from a name such as "HAPPY" or a value; values in extra pass through"""
+    if isinstance(value, str):
+        try:
+            return enum[value.upper()]
+        except KeyError:
+            pass
+    elif not isinstance(value, bool) and isinstance(value, int):
+        if value in extra:
+            return value
+        try:
+            return enum(value)
+        except ValueError:
+            pass
+    raise ValueError("expected a %s, got %r" % (enum.__name__, value))
+
+def mood_arg(value):
+    return enum_arg(Mood, value)
+
+def position_arg(value):
+    # 0 (or anything not a Position) is the center
+    return enum_arg(Position, value, extra=(0,))
+
+# RoboEyes methods that timelines and remote clients may call, with a
+# converter per positional argument. Setters only store their arguments, so
+# a wrong type would otherwise only fail later, inside draw_eyes.
+COMMAND_ARGS = {
+    "set_mood": (mood_arg,),
+    "set_position": (position_arg,),
+    "set_autoblinker": (flag_arg, count_arg, count_arg),
+    "set_idle_mode": (flag_arg, count_arg, count_arg),
+    "set_curiosity": (flag_arg,),
+    "set_cyclops": (flag_arg,),
+    "set_h_flicker": (flag_arg, amplitude_arg),
+    "set_v_flicker": (flag_arg, amplitude_arg),
+    "set_sweat": (flag_arg,),
+    "set_gaze": (number_arg, number_arg),
+    "set_position_easing": (flag_arg,),
+    "open": (flag_arg, flag_arg),
+    "close": (flag_arg, flag_arg),
+    "blink": (flag_arg, flag_arg),
+    "anim_confused": (),
+    "anim_laugh": (),
+}
+COMMANDS = tuple(COMMAND_ARGS)
+
+# Everything render() reads about the eyes, one int32 column each in a
+# compiled timeline.Clip
+RENDER_FIELDS = (
+    "cyclops", "sweat",
+    "eye_l_x", "eye_l_y", "eye_r_x", "eye_r_y", "h_flicker_offset", "v_flicker_offset",
+    "eye_l_width_current", "eye_l_height_current", "eye_l_border_radius_current", "eye_l_height_default",
+    "eye_r_width_current", "eye_r_height_current", "eye_r_border_radius_current", "eye_r_height_default",
+    "eyelids_tired_height", "eyelids_angry_height", "eyelids_happy_bottom_offset",
+)
+get_render_state = attrgetter(*RENDER_FIELDS)
+
+def parse_command(method, args=()):
+    """
+    Validate a command name, its argument count and argument types, and
+    convert Mood/Position names such as "HAPPY" or "NE" to their enum
+    values. Raises ValueError for anything draw_eyes could not handle.
+    Returns (method, args).
+    """
+    # Only needed to check commands, not on the startup path
+    import inspect
+    
+    if method not in COMMANDS:
+        raise ValueError("unknown RoboEyes command: %r" % (method,))
+    args = tuple(args)
+    try:
+        inspect.signature(getattr(RoboEyes, method)).bind(None, *args)
+    except TypeError as exc:
+        raise ValueError("%s: %s" % (method, exc)) from None
+    try:
+        args = tuple(convert(value) for convert, value in zip(COMMAND_ARGS[method], args))
+    except ValueError as exc:
+        raise ValueError("%s: %s" % (method, exc)) from None
+    return method, args
+
+def ease(current, target, factor):
+    """
+    One step of exponential easing: keep `factor` of the remaining distance.
+    Integer inputs stay integers and always land exactly on the target.
+    Integer NumPy arrays are eased element-wise, see batch.py.
+    """
+    remaining = (current - target) * factor
+    if hasattr(remaining, "astype"):
+        # Casting truncates towards zero like int()
+        return target + remaining.astype(target.dtype)
+    return target + int(remaining)
+
+def draw_smooth_rounded_rect(surface, color, rect, radius):
+    """Smooth rounded rectangle using pygame's built-in anti-aliasing"""
+    x, y, w, h = rect
+    if w <= 0 or h <= 0:
+        return
+    
+    # Clamp radius to valid range
+    radius = max(0, min(radius, w // 2, h // 2))
+    
+    # Use pygame's built-in rounded rectangle (has built-in anti-aliasing)
+    pygame.draw.rect(surface, color, rect, border_radius=radius)
+
+def compose_eye(surface, x, y, width, height, radius, height_default, left, cyclops,
+                tired_height, angry_height, happy_offset, main_color, bg_color):
+    """Rounded eye at (x, y) with the tired, angry and happy cutouts applied"""
+    draw_smooth_rounded_rect(surface, main_color, (x, y, width, height), radius)
+    
+    if tired_height > 0:
+        if not cyclops:
+            # Lid slopes down towards the outer corner of each eye
+            outer_x = x if left else x + width
+            pygame.draw.polygon(surface, bg_color, [
+                (x, y - 1),
+                (x + width, y - 1),
+                (outer_x, y + tired_height - 1)
+            ])
+        else:
+            pygame.draw.polygon(surface, bg_color, [
+                (x, y - 1),
+                (x + width // 2, y - 1),
+                (x, y + tired_height - 1)
+            ])
+            pygame.draw.polygon(surface, bg_color, [
+                (x + width // 2, y - 1),
+                (x + width, y - 1),
+                (x + width, y + tired_height - 1)
+            ])
+    
+    if angry_height > 0:
+        if not cyclops:
+            # Lid slopes down towards the inner corner of each eye
+            inner_x = x + width if left else x
+            pygame.draw.polygon(surface, bg_color, [
+                (x, y - 1),
+                (x + width, y - 1),
+                (inner_x, y + angry_height - 1)
+            ])
+        else:
+            pygame.draw.polygon(surface, bg_color, [
+                (x, y - 1),
+                (x + width // 2, y - 1),
+                (x + width // 2, y + angry_height - 1)
+            ])
+            pygame.draw.polygon(surface, bg_color, [
+                (x + width // 2, y - 1),
+                (x + width, y - 1),
+                (x + width // 2, y + angry_height - 1)
+            ])
+    
+    if happy_offset > 0:
+        draw_smooth_rounded_rect(surface, bg_color,
+                                 (x - 1, (y + height) - happy_offset + 1, width + 2, height_default),
+                                 radius)
+
+class PygameBackend:
+    """
+    Default eye renderer using pygame.draw. Any object with the same
+    compose_eye can be passed to RoboEyes.set_backend, see raster.NumpyBackend.
+    """
+    compose_eye = staticmethod(compose_eye)
+
+def monotonic_ms():
+    """Default RoboEyes time source; needs no SDL timer, unlike pygame.time.get_ticks"""
+    return int(time.monotonic() * 1000)
+
+class SimulatedClock:
+    """Manually advanced time source in milliseconds, for reproducible runs"""
+    def __init__(self, start_ms=0):
+        self.now_ms = start_ms
+    
+    def __call__(self):
+        return self.now_ms
+    
+    def advance(self, ms):
+        self.now_ms += ms
+        return self.now_ms
+
 class RoboEyes:
-    def __init__(self, width=1024, height=512):
+    # Animation and command state, captured by snapshot(). Configuration,
+    # surfaces, caches and outputs are not part of it.
+    STATE_FIELDS = (
+        "tired", "angry", "happy", "curious", "cyclops", "eye_l_open", "eye_r_open",
+        "eye_l_width_default", "eye_l_height_default", "eye_l_width_current", "eye_l_height_current",
+        "eye_l_width_next", "eye_l_height_next", "eye_l_height_offset",
+        "eye_l_border_radius", "eye_l_border_radius_current", "eye_l_border_radius_next",
+        "eye_r_width_default", "eye_r_height_default", "eye_r_width_current", "eye_r_height_current",
+        "eye_r_width_next", "eye_r_height_next", "eye_r_height_offset",
+        "eye_r_border_radius", "eye_r_border_radius_current", "eye_r_border_radius_next",
+        "space_between_default", "space_between_current", "space_between_next",
+        "eye_l_x_default", "eye_l_y_default", "eye_l_x", "eye_l_y", "eye_l_x_next", "eye_l_y_next",
+        "eye_r_x_default", "eye_r_y_default", "eye_r_x", "eye_r_y", "eye_r_x_next", "eye_r_y_next",
+        "eye_l_y_target", "eye_r_y_target",
+        "eyelids_tired_height", "eyelids_tired_height_next", "eyelids_angry_height",
+        "eyelids_angry_height_next", "eyelids_happy_bottom_offset", "eyelids_happy_bottom_offset_next",
+        "h_flicker", "h_flicker_alternate", "h_flicker_amplitude", "h_flicker_offset",
+        "v_flicker", "v_flicker_alternate", "v_flicker_amplitude", "v_flicker_offset",
+        "autoblinker", "blink_interval", "blink_interval_variation", "blink_timer",
+        "idle", "idle_interval", "idle_interval_variation", "idle_timer", "position_easing",
+        "confused", "confused_timer", "confused_duration", "confused_toggle",
+        "laugh", "laugh_timer", "laugh_duration", "laugh_toggle",
+        "sweat",
+        "last_update_ms", "dt_ms", "ease_factor",
+    )
+    
+    # No per-instance __dict__: the state fields take about 0.7 KB per face
+    # instead of 1.6 KB. Access is no faster than through a __dict__. The
+    # state is not packed into one numeric buffer: reading a field through a
+    # property over an array costs about ten times a slot read, and
+    # draw_eyes reads hundreds of them per frame.
+    __slots__ = STATE_FIELDS + (
+        "screen_width", "screen_height", "layout", "headless", "rng", "time_source", "screen",
+        "BG_COLOR", "MAIN_COLOR", "dirty_rects_enabled", "full_redraw", "previous_bounds", "dirty_rects",
+        "rest_frame_drawn", "rest_key", "max_rest_wait_ms", "wake_hooks", "sprite_cache", "backend", "quality", "low_res", "profiler", "outputs",
+        "window", "clock", "fps", "reference_frame_ms", "sweat_seed", "sweat_emitter", "effects",
+    )
+    
+    def __init__(self, width=1024, height=512, headless=False, seed=None, time_source=None):
         """
         Initialize RoboEyes with native resolution rendering (no scaling).
         Default is 1024x512 for smooth, high-quality display.
+        With headless=True the eyes are drawn into an offscreen surface,
+        no window is opened, SDL is never initialized and draw_eyes is not
+        frame limited. Otherwise only the SDL video subsystem is started and
+        the window opens with the first presented frame (or open_window()).
+        Blinks, idle glances and sweat use a private RNG seeded with seed,
+        and time comes from time_source() in ms (a monotonic clock by
+        default), so a fixed seed and a SimulatedClock make every run identical.
         """
-        pygame.init()
+        if not headless:
+            # Video and events only; pygame.init() would also start audio,
+            # joysticks and the other modules RoboEyes never uses
+            pygame.display.init()
         self.screen_width = width
         self.screen_height = height
-        # Render directly at native resolution - NO SCALING
-        self.screen = pygame.display.set_mode((width, height))
-        pygame.display.set_caption("RoboEyes - Press ESC to exit")
+        # Pixel sizes, default positions and Position targets for this resolution
+        self.layout = get_layout(width, height)
+        self.headless = headless
+        self.rng = random.Random(seed)
+        self.time_source = time_source or monotonic_ms
+        # Render directly at native resolution - NO SCALING. Until the
+        # window exists frames go to an offscreen surface.
+        self.window = None
+        self.screen = pygame.Surface((width, height))
         
         self.BG_COLOR = (0, 0, 0)
         self.MAIN_COLOR = (0, 200, 255)
         
+        # Only the areas covered by the eyes and sweat drops in the previous
+        # and current frame are cleared, redrawn and pushed to the display.
+        # Set full_redraw after changing colors or drawing on the screen
+        # from outside RoboEyes.
+        self.dirty_rects_enabled = True
+        self.full_redraw = True
+        self.previous_bounds = {}
+        self.dirty_rects = []
+        
+        # Once every transition has converged, draw_eyes stops redrawing and
+        # sleeps until the next blink/idle timer, an input event or wake(),
+        # waiting at most max_rest_wait_ms (None waits for the event).
+        # rest_key is the render key of that last rest frame, so a state
+        # change that does not start a transition (cyclops, colors, quality)
+        # is still drawn.
+        self.rest_frame_drawn = False
+        self.rest_key = None
+        self.max_rest_wait_ms = 100
+        # Callables wake() runs instead of posting WAKE_EVENT, for loops that
+        # do not wait on the pygame event queue (pipeline.PipelinedRuntime)
+        self.wake_hooks = []
+        
+        # Fully composited eye images keyed by geometry and mood, so a
+        # steady-state frame is a couple of blits. None draws directly.
+        self.sprite_cache = SpriteCache()
+        self.backend = PygameBackend()
+        
+        # Trade-offs for slow hardware, normally chosen by a governor.QualityGovernor
+        self.quality = FULL_QUALITY
+        self.low_res = None
+        
+        # Optional per-phase frame timings, see enable_profiling()
+        self.profiler = None
+        
+        # Callables given every newly drawn frame as output(surface,
+        # dirty_rects, time_ms), e.g. framebuffer.FramebufferOutput for OLED
+        # and SPI panels. Outputs get everything about the frame from their
+        # arguments: in a pipeline.PipelinedRuntime they run on the raster
+        # thread while the eyes already show another frame.
+        self.outputs = []
+        
         self.clock = pygame.time.Clock()
         self.fps = 50
         
+        # Animation speed is time based: every transition halves its
+        # remaining distance each reference frame (one frame at 50 FPS),
+        # so a lower fps shows the same motion with fewer frames.
+        self.reference_frame_ms = 20
+        self.last_update_ms = None
+        self.dt_ms = self.reference_frame_ms
+        self.ease_factor = 0.5
+        
         self.tired = False
         self.angry = False
         self.happy = False
@@ -47,47 +355,51 @@ class RoboEyes:
         self.eye_l_open = False
         self.eye_r_open = False
         
-        # Scale everything proportionally to the screen size
-        self.eye_l_width_default = 288
-        self.eye_l_height_default = 288
+        # Sizes come from the layout, which scales them to the screen size
+        layout = self.layout
+        self.eye_l_width_default = layout.eye_width
+        self.eye_l_height_default = layout.eye_height
         self.eye_l_width_current = self.eye_l_width_default
         self.eye_l_height_current = 1
         self.eye_l_width_next = self.eye_l_width_default
         self.eye_l_height_next = self.eye_l_height_default
         self.eye_l_height_offset = 0
-        self.eye_l_border_radius = 40
-        self.eye_l_border_radius_current = 40
-        self.eye_l_border_radius_next = 40
+        self.eye_l_border_radius = layout.border_radius
+        self.eye_l_border_radius_current = layout.border_radius
+        self.eye_l_border_radius_next = layout.border_radius
         
-        self.eye_r_width_default = 288
-        self.eye_r_height_default = 288
+        self.eye_r_width_default = layout.eye_width
+        self.eye_r_height_default = layout.eye_height
         self.eye_r_width_current = self.eye_r_width_default
         self.eye_r_height_current = 1
         self.eye_r_width_next = self.eye_r_width_default
         self.eye_r_height_next = self.eye_r_height_default
         self.eye_r_height_offset = 0
-        self.eye_r_border_radius = 40
-        self.eye_r_border_radius_current = 40
-        self.eye_r_border_radius_next = 40
+        self.eye_r_border_radius = layout.border_radius
+        self.eye_r_border_radius_current = layout.border_radius
+        self.eye_r_border_radius_next = layout.border_radius
         
-        self.space_between_default = 80
+        self.space_between_default = layout.space_between
         self.space_between_current = self.space_between_default
-        self.space_between_next = 80
+        self.space_between_next = layout.space_between
         
-        self.eye_l_x_default = ((self.screen_width) - (self.eye_l_width_default + self.space_between_default + self.eye_r_width_default)) // 2
-        self.eye_l_y_default = (self.screen_height - self.eye_l_height_default) // 2
+        self.eye_l_x_default = layout.eye_l_x_default
+        self.eye_l_y_default = layout.eye_l_y_default
         self.eye_l_x = self.eye_l_x_default
         self.eye_l_y = self.eye_l_y_default
         self.eye_l_x_next = self.eye_l_x
         self.eye_l_y_next = self.eye_l_y
         
-        self.eye_r_x_default = self.eye_l_x + self.eye_l_width_current + self.space_between_default
-        self.eye_r_y_default = self.eye_l_y
+        self.eye_r_x_default = layout.eye_r_x_default
+        self.eye_r_y_default = layout.eye_r_y_default
         self.eye_r_x = self.eye_r_x_default
         self.eye_r_y = self.eye_r_y_default
         self.eye_r_x_next = self.eye_r_x
         self.eye_r_y_next = self.eye_r_y
         
+        self.eye_l_y_target = self.eye_l_y
+        self.eye_r_y_target = self.eye_r_y
+        
         self.eyelids_tired_height = 0
         self.eyelids_tired_height_next = 0
         self.eyelids_angry_height = 0
@@ -97,11 +409,14 @@ class RoboEyes:
         
         self.h_flicker = False
         self.h_flicker_alternate = False
-        self.h_flicker_amplitude = 16
+        self.h_flicker_amplitude = layout.h_flicker
         
         self.v_flicker = False
         self.v_flicker_alternate = False
-        self.v_flicker_amplitude = 80
+        self.v_flicker_amplitude = layout.v_flicker
+        
+        self.h_flicker_offset = 0
+        self.v_flicker_offset = 0
         
         self.autoblinker = False
         self.blink_interval = 1
@@ -113,6 +428,10 @@ class RoboEyes:
         self.idle_interval_variation = 3
         self.idle_timer = 0
         
+        # With position_easing off the eyes jump straight to their target,
+        # for gaze input that is already smooth
+        self.position_easing = True
+        
         self.confused = False
         self.confused_timer = 0
         self.confused_duration = 500
@@ -124,33 +443,102 @@ class RoboEyes:
         self.laugh_toggle = True
         
         self.sweat = False
-        self.sweat_border_radius = 16
-        self.sweat1_x_initial = 16
-        self.sweat1_x = self.sweat1_x_initial
-        self.sweat1_y = 16.0
-        self.sweat1_y_max = 160
-        self.sweat1_height = 16.0
-        self.sweat1_width = 8.0
-        
-        self.sweat2_x_initial = 16
-        self.sweat2_x = self.sweat2_x_initial
-        self.sweat2_y = 16.0
-        self.sweat2_y_max = 160
-        self.sweat2_height = 16.0
-        self.sweat2_width = 8.0
-        
-        self.sweat3_x_initial = 16
-        self.sweat3_x = self.sweat3_x_initial
-        self.sweat3_y = 16.0
-        self.sweat3_y_max = 160
-        self.sweat3_height = 16.0
-        self.sweat3_width = 8.0
+        # Sweat and any extra effects are NumPy particle emitters drawing
+        # from their own generator, seeded from rng so runs stay reproducible.
+        # The sweat emitter is built on first use (see sweat_drops), so faces
+        # that never sweat do not import NumPy.
+        self.sweat_seed = self.rng.getrandbits(64)
+        self.sweat_emitter = None
+        self.effects = {}
+    
+    def snapshot(self):
+        """
+        Animation state, RNG state and particle arrays, as a tuple of the
+        STATE_FIELDS values rather than one buffer. Most of the cost is
+        copying the Mersenne Twister state.
+        """
+        emitters = {name: emitter.snapshot() for name, emitter in self.effects.items()}
+        # An emitter that was never built is fully described by its seed
+        emitters[None] = self.sweat_seed if self.sweat_emitter is None else self.sweat_emitter.snapshot()
+        return get_state(self), self.rng.getstate(), emitters
+    
+    def restore(self, snapshot):
+        """Return to a state taken with snapshot(), forcing the next frame to be redrawn"""
+        values, rng_state, emitters = snapshot
+        for name, value in zip(self.STATE_FIELDS, values):
+            setattr(self, name, value)
+        self.rng.setstate(rng_state)
+        if isinstance(emitters[None], int):
+            self.sweat_seed, self.sweat_emitter = emitters[None], None
+        else:
+            self.sweat_drops.restore(emitters[None])
+        for name, emitter in self.effects.items():
+            if name in emitters:
+                emitter.restore(emitters[name])
+        self.full_redraw = True
+        self.rest_frame_drawn = False
+    
+    def clone(self, headless=True):
+        """New instance with the same size, colors, clock and animation state"""
+        other = RoboEyes(self.screen_width, self.screen_height, headless=headless,
+                         time_source=self.time_source)
+        other.BG_COLOR = self.BG_COLOR
+        other.MAIN_COLOR = self.MAIN_COLOR
+        other.fps = self.fps
+        other.restore(self.snapshot())
+        return other
     
     def get_screen_constraint_x(self):
-        return self.screen_width - self.eye_l_width_current - self.space_between_current - self.eye_r_width_current
+        return self.layout.constraint_x
     
     def get_screen_constraint_y(self):
-        return self.screen_height - self.eye_l_height_default
+        return self.layout.constraint_y
+    
+    def resize(self, width, height):
+        """
+        Switch to a new resolution: the layout is looked up (or resolved once)
+        for it, the eyes snap to its sizes and default position, and the next
+        frame is redrawn in full.
+        """
+        layout = self.layout = get_layout(width, height)
+        self.screen_width = width
+        self.screen_height = height
+        if self.window is None:
+            self.screen = pygame.Surface((width, height))
+        else:
+            self.screen = self.window = pygame.display.set_mode((width, height))
+        
+        self.eye_l_width_default = self.eye_l_width_current = self.eye_l_width_next = layout.eye_width
+        self.eye_r_width_default = self.eye_r_width_current = self.eye_r_width_next = layout.eye_width
+        self.eye_l_height_default = self.eye_l_height_next = layout.eye_height
+        self.eye_r_height_default = self.eye_r_height_next = layout.eye_height
+        self.eye_l_height_current = layout.eye_height if self.eye_l_open else 1
+        self.eye_r_height_current = layout.eye_height if self.eye_r_open else 1
+        self.eye_l_border_radius = self.eye_l_border_radius_current = self.eye_l_border_radius_next = layout.border_radius
+        self.eye_r_border_radius = self.eye_r_border_radius_current = self.eye_r_border_radius_next = layout.border_radius
+        self.space_between_default = self.space_between_current = self.space_between_next = layout.space_between
+        self.eye_l_x_default, self.eye_l_y_default = layout.eye_l_x_default, layout.eye_l_y_default
+        self.eye_r_x_default, self.eye_r_y_default = layout.eye_r_x_default, layout.eye_r_y_default
+        self.eye_l_x = self.eye_l_x_next = self.eye_l_x_default
+        self.eye_l_y = self.eye_l_y_next = self.eye_l_y_target = self.eye_l_y_default
+        self.eye_r_x = self.eye_r_x_next = self.eye_r_x_default
+        self.eye_r_y = self.eye_r_y_next = self.eye_r_y_target = self.eye_r_y_default
+        # Eyelids snap to the mood's height at the new size too
+        self.update_eyelids()
+        self.eyelids_tired_height = self.eyelids_tired_height_next
+        self.eyelids_angry_height = self.eyelids_angry_height_next
+        self.eyelids_happy_bottom_offset = self.eyelids_happy_bottom_offset_next
+        self.h_flicker_amplitude = layout.h_flicker
+        self.v_flicker_amplitude = layout.v_flicker
+        if self.sweat_emitter is not None:
+            import particles
+            self.sweat_emitter = particles.sweat(width, self.sweat_emitter.rng, scale=layout.scale)
+        
+        if self.sprite_cache is not None:
+            self.sprite_cache.clear()
+        self.previous_bounds = {}
+        self.full_redraw = True
+        self.rest_frame_drawn = False
     
     def set_mood(self, mood):
         if mood == Mood.TIRED:
@@ -163,33 +551,20 @@ class RoboEyes:
             self.tired, self.angry, self.happy = False, False, False
     
     def set_position(self, position):
-        if position == Position.N:
-            self.eye_l_x_next = self.get_screen_constraint_x() // 2
-            self.eye_l_y_next = 0
-        elif position == Position.NE:
-            self.eye_l_x_next = self.get_screen_constraint_x()
-            self.eye_l_y_next = 0
-        elif position == Position.E:
-            self.eye_l_x_next = self.get_screen_constraint_x()
-            self.eye_l_y_next = self.get_screen_constraint_y() // 2
-        elif position == Position.SE:
-            self.eye_l_x_next = self.get_screen_constraint_x()
-            self.eye_l_y_next = self.get_screen_constraint_y()
-        elif position == Position.S:
-            self.eye_l_x_next = self.get_screen_constraint_x() // 2
-            self.eye_l_y_next = self.get_screen_constraint_y()
-        elif position == Position.SW:
-            self.eye_l_x_next = 0
-            self.eye_l_y_next = self.get_screen_constraint_y()
-        elif position == Position.W:
-            self.eye_l_x_next = 0
-            self.eye_l_y_next = self.get_screen_constraint_y() // 2
-        elif position == Position.NW:
-            self.eye_l_x_next = 0
-            self.eye_l_y_next = 0
-        else:
-            self.eye_l_x_next = self.get_screen_constraint_x() // 2
-            self.eye_l_y_next = self.get_screen_constraint_y() // 2
+        self.eye_l_x_next, self.eye_l_y_next = self.layout.position(position)
+    
+    def set_gaze(self, x, y):
+        """
+        Continuous gaze target: x and y from -1 (left/top) to 1 (right/bottom),
+        (0, 0) looks straight ahead. See gaze.GazeStream for tracker input.
+        """
+        x = min(1.0, max(-1.0, x))
+        y = min(1.0, max(-1.0, y))
+        self.eye_l_x_next = int(round((x + 1) / 2 * self.get_screen_constraint_x()))
+        self.eye_l_y_next = int(round((y + 1) / 2 * self.get_screen_constraint_y()))
+    
+    def set_position_easing(self, easing):
+        self.position_easing = easing
     
     def set_autoblinker(self, active, interval=1, variation=4):
         self.autoblinker = active
@@ -207,17 +582,57 @@ class RoboEyes:
     def set_cyclops(self, cyclops):
         self.cyclops = cyclops
     
-    def set_h_flicker(self, flicker, amplitude=16):
+    def set_h_flicker(self, flicker, amplitude=None):
         self.h_flicker = flicker
+        if amplitude is None:
+            amplitude = self.layout.h_flicker
         self.h_flicker_amplitude = amplitude
     
-    def set_v_flicker(self, flicker, amplitude=80):
+    def set_v_flicker(self, flicker, amplitude=None):
         self.v_flicker = flicker
+        if amplitude is None:
+            amplitude = self.layout.v_flicker
         self.v_flicker_amplitude = amplitude
     
+    def set_quality(self, quality):
+        """
+        Use a governor.Quality level. The next frame is redrawn in full when
+        it switches between native and scaled rendering.
+        """
+        if quality.render_scale != self.quality.render_scale:
+            self.full_redraw = True
+        self.quality = quality
+        self.rest_frame_drawn = False
+    
+    def set_backend(self, backend):
+        """Draw the eyes with backend from now on, e.g. raster.NumpyBackend()"""
+        self.backend = backend
+        if self.sprite_cache is not None:
+            self.sprite_cache.clear()
+        self.full_redraw = True
+        self.rest_frame_drawn = False
+    
+    @property
+    def sweat_drops(self):
+        """The sweat particles.ParticleEmitter, built on first use"""
+        if self.sweat_emitter is None:
+            import numpy as np
+            import particles
+            rng = np.random.default_rng(self.sweat_seed)
+            self.sweat_emitter = particles.sweat(self.screen_width, rng, scale=self.layout.scale)
+        return self.sweat_emitter
+    
     def set_sweat(self, sweat):
         self.sweat = sweat
     
+    def add_effect(self, name, emitter):
+        """Run an extra particles.ParticleEmitter (e.g. particles.rain) under name"""
+        self.effects[name] = emitter
+        self.rest_frame_drawn = False
+    
+    def remove_effect(self, name):
+        self.effects.pop(name, None)
+    
     def close(self, left=True, right=True):
         if left:
             self.eye_l_height_next = 1
@@ -243,68 +658,95 @@ class RoboEyes:
         self.laugh = True
     
     def draw_smooth_rounded_rect(self, surface, color, rect, radius):
-        """Smooth rounded rectangle using pygame's built-in anti-aliasing"""
-        x, y, w, h = rect
-        if w <= 0 or h <= 0:
-            return
-        
-        # Clamp radius to valid range
-        radius = max(0, min(radius, w // 2, h // 2))
-        
-        # Use pygame's built-in rounded rectangle (has built-in anti-aliasing)
-        pygame.draw.rect(surface, color, rect, border_radius=radius)
+        draw_smooth_rounded_rect(surface, color, rect, radius)
     
-    def draw_eyes(self):
-        current_time = pygame.time.get_ticks()
+    def update(self, now_ms=None):
+        """
+        Advance the animation state to now_ms (defaults to time_source())
+        without drawing anything.
+        """
+        if now_ms is None:
+            now_ms = self.time_source()
+        if self.last_update_ms is None:
+            self.dt_ms = self.reference_frame_ms
+        else:
+            self.dt_ms = max(0, now_ms - self.last_update_ms)
+        self.last_update_ms = now_ms
+        self.ease_factor = 0.5 ** (self.dt_ms / self.reference_frame_ms)
         
+        profiler = self.profiler
+        self.update_eye_geometry()
+        if profiler is not None:
+            profiler.mark("easing")
+        self.update_timers(now_ms)
+        self.update_flicker()
+        if profiler is not None:
+            profiler.mark("timers")
+        self.update_eyelids()
+        if profiler is not None:
+            profiler.mark("eyelids")
+        if self.sweat or self.effects:
+            self.update_sweat()
+            if profiler is not None:
+                profiler.mark("sweat")
+    
+    def update_eye_geometry(self):
         if self.curious:
-            if self.eye_l_x_next <= 80:
-                self.eye_l_height_offset = 64
-            elif self.eye_l_x_next >= (self.get_screen_constraint_x() - 80) and self.cyclops:
-                self.eye_l_height_offset = 64
+            margin = self.layout.curious_margin
+            offset = self.layout.curious_offset
+            if self.eye_l_x_next <= margin:
+                self.eye_l_height_offset = offset
+            elif self.eye_l_x_next >= (self.get_screen_constraint_x() - margin) and self.cyclops:
+                self.eye_l_height_offset = offset
             else:
                 self.eye_l_height_offset = 0
             
-            if self.eye_r_x_next >= self.screen_width - self.eye_r_width_current - 80:
-                self.eye_r_height_offset = 64
+            if self.eye_r_x_next >= self.screen_width - self.eye_r_width_current - margin:
+                self.eye_r_height_offset = offset
             else:
                 self.eye_r_height_offset = 0
         else:
             self.eye_l_height_offset = 0
             self.eye_r_height_offset = 0
         
-        self.eye_l_height_current = (self.eye_l_height_current + self.eye_l_height_next + self.eye_l_height_offset) // 2
-        self.eye_l_y += (self.eye_l_height_default - self.eye_l_height_current) // 2
-        self.eye_l_y -= self.eye_l_height_offset // 2
+        f = self.ease_factor
         
-        self.eye_r_height_current = (self.eye_r_height_current + self.eye_r_height_next + self.eye_r_height_offset) // 2
-        self.eye_r_y += (self.eye_r_height_default - self.eye_r_height_current) // 2
-        self.eye_r_y -= self.eye_r_height_offset // 2
+        # Shorter eyes are kept vertically centered on their y target
+        self.eye_l_height_current = ease(self.eye_l_height_current, self.eye_l_height_next + self.eye_l_height_offset, f)
+        eye_l_y_shift = (self.eye_l_height_default - self.eye_l_height_current) // 2 - self.eye_l_height_offset // 2
+        
+        self.eye_r_height_current = ease(self.eye_r_height_current, self.eye_r_height_next + self.eye_r_height_offset, f)
+        eye_r_y_shift = (self.eye_r_height_default - self.eye_r_height_current) // 2 - self.eye_r_height_offset // 2
         
         if self.eye_l_open and self.eye_l_height_current <= 1 + self.eye_l_height_offset:
             self.eye_l_height_next = self.eye_l_height_default
         if self.eye_r_open and self.eye_r_height_current <= 1 + self.eye_r_height_offset:
             self.eye_r_height_next = self.eye_r_height_default
         
-        self.eye_l_width_current = (self.eye_l_width_current + self.eye_l_width_next) // 2
-        self.eye_r_width_current = (self.eye_r_width_current + self.eye_r_width_next) // 2
-        self.space_between_current = (self.space_between_current + self.space_between_next) // 2
+        self.eye_l_width_current = ease(self.eye_l_width_current, self.eye_l_width_next, f)
+        self.eye_r_width_current = ease(self.eye_r_width_current, self.eye_r_width_next, f)
+        self.space_between_current = ease(self.space_between_current, self.space_between_next, f)
         
-        self.eye_l_x = (self.eye_l_x + self.eye_l_x_next) // 2
-        self.eye_l_y = (self.eye_l_y + self.eye_l_y_next) // 2
+        # A factor of 0 lands on the target in one step
+        fp = f if self.position_easing else 0.0
+        self.eye_l_x = ease(self.eye_l_x, self.eye_l_x_next, fp)
+        self.eye_l_y_target = self.eye_l_y_next + eye_l_y_shift
+        self.eye_l_y = ease(self.eye_l_y, self.eye_l_y_target, fp)
         
         self.eye_r_x_next = self.eye_l_x_next + self.eye_l_width_current + self.space_between_current
         self.eye_r_y_next = self.eye_l_y_next
-        self.eye_r_x = (self.eye_r_x + self.eye_r_x_next) // 2
-        self.eye_r_y = (self.eye_r_y + self.eye_r_y_next) // 2
-        
+        self.eye_r_x = ease(self.eye_r_x, self.eye_r_x_next, fp)
+        self.eye_r_y_target = self.eye_r_y_next + eye_r_y_shift
+        self.eye_r_y = ease(self.eye_r_y, self.eye_r_y_target, fp)
+    
+    def update_timers(self, current_time):
         if self.autoblinker and current_time >= self.blink_timer:
             self.blink()
-            self.blink_timer = current_time + (self.blink_interval * 1000) + (random.randint(0, self.blink_interval_variation) * 1000)
+            self.blink_timer = current_time + (self.blink_interval * 1000) + (self.rng.randint(0, self.blink_interval_variation) * 1000)
         
         if self.laugh:
             if self.laugh_toggle:
-                self.set_v_flicker(True, 40)
+                self.set_v_flicker(True, self.layout.laugh_flicker)
                 self.laugh_timer = current_time
                 self.laugh_toggle = False
             elif current_time >= self.laugh_timer + self.laugh_duration:
@@ -314,7 +756,7 @@ class RoboEyes:
         
         if self.confused:
             if self.confused_toggle:
-                self.set_h_flicker(True, 160)
+                self.set_h_flicker(True, self.layout.confused_flicker)
                 self.confused_timer = current_time
                 self.confused_toggle = False
             elif current_time >= self.confused_timer + self.confused_duration:
@@ -323,43 +765,24 @@ class RoboEyes:
                 self.confused = False
         
         if self.idle and current_time >= self.idle_timer:
-            self.eye_l_x_next = random.randint(0, self.get_screen_constraint_x())
-            self.eye_l_y_next = random.randint(0, self.get_screen_constraint_y())
-            self.idle_timer = current_time + (self.idle_interval * 1000) + (random.randint(0, self.idle_interval_variation) * 1000)
-        
-        eye_l_x_draw = self.eye_l_x
-        eye_r_x_draw = self.eye_r_x
-        eye_l_y_draw = self.eye_l_y
-        eye_r_y_draw = self.eye_r_y
+            # Eyes larger than the screen have no room to wander
+            self.eye_l_x_next = self.rng.randint(0, max(0, self.get_screen_constraint_x()))
+            self.eye_l_y_next = self.rng.randint(0, max(0, self.get_screen_constraint_y()))
+            self.idle_timer = current_time + (self.idle_interval * 1000) + (self.rng.randint(0, self.idle_interval_variation) * 1000)
+    
+    def update_flicker(self):
+        self.h_flicker_offset = 0
+        self.v_flicker_offset = 0
         
         if self.h_flicker:
-            offset = self.h_flicker_amplitude if self.h_flicker_alternate else -self.h_flicker_amplitude
-            eye_l_x_draw += offset
-            eye_r_x_draw += offset
+            self.h_flicker_offset = self.h_flicker_amplitude if self.h_flicker_alternate else -self.h_flicker_amplitude
             self.h_flicker_alternate = not self.h_flicker_alternate
         
         if self.v_flicker:
-            offset = self.v_flicker_amplitude if self.v_flicker_alternate else -self.v_flicker_amplitude
-            eye_l_y_draw += offset
-            eye_r_y_draw += offset
+            self.v_flicker_offset = self.v_flicker_amplitude if self.v_flicker_alternate else -self.v_flicker_amplitude
             self.v_flicker_alternate = not self.v_flicker_alternate
-        
-        eye_r_width_draw = 0 if self.cyclops else self.eye_r_width_current
-        eye_r_height_draw = 0 if self.cyclops else self.eye_r_height_current
-        
-        # Draw directly to screen - NO SCALING
-        self.screen.fill(self.BG_COLOR)
-        
-        # Use smooth rounded rectangles
-        self.draw_smooth_rounded_rect(self.screen, self.MAIN_COLOR, 
-                                     (eye_l_x_draw, eye_l_y_draw, self.eye_l_width_current, self.eye_l_height_current),
-                                     self.eye_l_border_radius_current)
-        
-        if not self.cyclops:
-            self.draw_smooth_rounded_rect(self.screen, self.MAIN_COLOR,
-                                         (eye_r_x_draw, eye_r_y_draw, eye_r_width_draw, eye_r_height_draw),
-                                         self.eye_r_border_radius_current)
-        
+    
+    def update_eyelids(self):
         if self.tired:
             self.eyelids_tired_height_next = self.eye_l_height_current // 2
             self.eyelids_angry_height_next = 0
@@ -377,144 +800,343 @@ class RoboEyes:
         else:
             self.eyelids_happy_bottom_offset_next = 0
         
-        self.eyelids_tired_height = (self.eyelids_tired_height + self.eyelids_tired_height_next) // 2
-        self.eyelids_angry_height = (self.eyelids_angry_height + self.eyelids_angry_height_next) // 2
-        self.eyelids_happy_bottom_offset = (self.eyelids_happy_bottom_offset + self.eyelids_happy_bottom_offset_next) // 2
-        
-        if self.eyelids_tired_height > 0:
-            if not self.cyclops:
-                pygame.draw.polygon(self.screen, self.BG_COLOR, [
-                    (eye_l_x_draw, eye_l_y_draw - 1),
-                    (eye_l_x_draw + self.eye_l_width_current, eye_l_y_draw - 1),
-                    (eye_l_x_draw, eye_l_y_draw + self.eyelids_tired_height - 1)
-                ])
-                pygame.draw.polygon(self.screen, self.BG_COLOR, [
-                    (eye_r_x_draw, eye_r_y_draw - 1),
-                    (eye_r_x_draw + eye_r_width_draw, eye_r_y_draw - 1),
-                    (eye_r_x_draw + eye_r_width_draw, eye_r_y_draw + self.eyelids_tired_height - 1)
-                ])
-            else:
-                pygame.draw.polygon(self.screen, self.BG_COLOR, [
-                    (eye_l_x_draw, eye_l_y_draw - 1),
-                    (eye_l_x_draw + self.eye_l_width_current // 2, eye_l_y_draw - 1),
-                    (eye_l_x_draw, eye_l_y_draw + self.eyelids_tired_height - 1)
-                ])
-                pygame.draw.polygon(self.screen, self.BG_COLOR, [
-                    (eye_l_x_draw + self.eye_l_width_current // 2, eye_l_y_draw - 1),
-                    (eye_l_x_draw + self.eye_l_width_current, eye_l_y_draw - 1),
-                    (eye_l_x_draw + self.eye_l_width_current, eye_l_y_draw + self.eyelids_tired_height - 1)
-                ])
-        
-        if self.eyelids_angry_height > 0:
-            if not self.cyclops:
-                pygame.draw.polygon(self.screen, self.BG_COLOR, [
-                    (eye_l_x_draw, eye_l_y_draw - 1),
-                    (eye_l_x_draw + self.eye_l_width_current, eye_l_y_draw - 1),
-                    (eye_l_x_draw + self.eye_l_width_current, eye_l_y_draw + self.eyelids_angry_height - 1)
-                ])
-                pygame.draw.polygon(self.screen, self.BG_COLOR, [
-                    (eye_r_x_draw, eye_r_y_draw - 1),
-                    (eye_r_x_draw + eye_r_width_draw, eye_r_y_draw - 1),
-                    (eye_r_x_draw, eye_r_y_draw + self.eyelids_angry_height - 1)
-                ])
+        f = self.ease_factor
+        self.eyelids_tired_height = ease(self.eyelids_tired_height, self.eyelids_tired_height_next, f)
+        self.eyelids_angry_height = ease(self.eyelids_angry_height, self.eyelids_angry_height_next, f)
+        self.eyelids_happy_bottom_offset = ease(self.eyelids_happy_bottom_offset, self.eyelids_happy_bottom_offset_next, f)
+    
+    def update_sweat(self):
+        # Per-frame particle speeds are scaled to the elapsed time
+        step = self.dt_ms / self.reference_frame_ms
+        if self.sweat:
+            self.sweat_drops.update(step)
+        for emitter in self.effects.values():
+            emitter.update(step)
+    
+    def render(self, surface=None):
+        """
+        Draw the current animation state into surface (defaults to the
+        screen). Does not advance any state.
+        """
+        if surface is None:
+            surface = self.screen
+        profiler = self.profiler
+        if surface is self.screen and self.quality.render_scale > 1:
+            return self.render_scaled(self.quality.render_scale)
+        
+        if surface is self.screen:
+            bounds = self.get_bounds()
+            if self.dirty_rects_enabled and not self.full_redraw:
+                self.dirty_rects = self.get_dirty_rects(self.previous_bounds, bounds)
+                for rect in self.dirty_rects:
+                    surface.fill(self.BG_COLOR, rect)
             else:
-                pygame.draw.polygon(self.screen, self.BG_COLOR, [
-                    (eye_l_x_draw, eye_l_y_draw - 1),
-                    (eye_l_x_draw + self.eye_l_width_current // 2, eye_l_y_draw - 1),
-                    (eye_l_x_draw + self.eye_l_width_current // 2, eye_l_y_draw + self.eyelids_angry_height - 1)
-                ])
-                pygame.draw.polygon(self.screen, self.BG_COLOR, [
-                    (eye_l_x_draw + self.eye_l_width_current // 2, eye_l_y_draw - 1),
-                    (eye_l_x_draw + self.eye_l_width_current, eye_l_y_draw - 1),
-                    (eye_l_x_draw + self.eye_l_width_current // 2, eye_l_y_draw + self.eyelids_angry_height - 1)
-                ])
-        
-        if self.eyelids_happy_bottom_offset > 0:
-            self.draw_smooth_rounded_rect(self.screen, self.BG_COLOR,
-                                         (eye_l_x_draw - 1, 
-                                          (eye_l_y_draw + self.eye_l_height_current) - self.eyelids_happy_bottom_offset + 1,
-                                          self.eye_l_width_current + 2, self.eye_l_height_default),
-                                         self.eye_l_border_radius_current)
-            if not self.cyclops:
-                self.draw_smooth_rounded_rect(self.screen, self.BG_COLOR,
-                                             (eye_r_x_draw - 1,
-                                              (eye_r_y_draw + eye_r_height_draw) - self.eyelids_happy_bottom_offset + 1,
-                                              eye_r_width_draw + 2, self.eye_r_height_default),
-                                             self.eye_r_border_radius_current)
+                self.dirty_rects = [surface.get_rect()]
+                surface.fill(self.BG_COLOR)
+            self.previous_bounds = bounds
+            self.full_redraw = False
+        else:
+            surface.fill(self.BG_COLOR)
+        if profiler is not None:
+            profiler.mark("fill")
         
+        # Draw directly to screen - NO SCALING
+        self.draw_eye_shapes(surface)
+        if profiler is not None:
+            profiler.mark("draw")
+        if self.sweat or self.effects:
+            self.draw_sweat(surface)
+            if profiler is not None:
+                profiler.mark("draw_sweat")
+        return surface
+    
+    def render_scaled(self, scale):
+        """
+        Draw at 1/scale resolution into low_res and upscale the dirty rects,
+        widened to whole low resolution pixels, onto the screen
+        """
+        profiler = self.profiler
+        size = (self.screen_width // scale, self.screen_height // scale)
+        if self.low_res is None or self.low_res.get_size() != size:
+            self.low_res = pygame.Surface(size, 0, self.screen)
+            self.full_redraw = True
+        bounds = self.get_bounds()
+        # Partial upscales only line up with a full one at a whole scale factor
+        exact = size[0] * scale == self.screen_width and size[1] * scale == self.screen_height
+        if self.dirty_rects_enabled and not self.full_redraw and exact:
+            rects = []
+            for rect in self.get_dirty_rects(self.previous_bounds, bounds):
+                left, top = rect.left // scale, rect.top // scale
+                rects.append(pygame.Rect(left, top, -(-rect.right // scale) - left, -(-rect.bottom // scale) - top))
+        else:
+            rects = None
+        self.previous_bounds = bounds
+        self.full_redraw = False
+        self.low_res.fill(self.BG_COLOR)
+        if profiler is not None:
+            profiler.mark("fill")
+        self.draw_eye_shapes(self.low_res, scale)
+        if profiler is not None:
+            profiler.mark("draw")
+        if self.sweat or self.effects:
+            self.draw_sweat(self.low_res, scale)
+            if profiler is not None:
+                profiler.mark("draw_sweat")
+        if rects is None:
+            pygame.transform.scale(self.low_res, (self.screen_width, self.screen_height), self.screen)
+            self.dirty_rects = [self.screen.get_rect()]
+        else:
+            self.dirty_rects = []
+            for rect in rects:
+                target = pygame.Rect(rect.x * scale, rect.y * scale, rect.width * scale, rect.height * scale)
+                pygame.transform.scale(self.low_res.subsurface(rect), target.size, self.screen.subsurface(target))
+                self.dirty_rects.append(target)
+        if profiler is not None:
+            profiler.mark("upscale")
+        return self.screen
+    
+    def get_bounds(self):
+        """
+        Rects of every non-background element of the current state, keyed
+        by element. Eyelid cutouts only paint background inside the eyes.
+        """
+        eye_l_x_draw, eye_l_y_draw, eye_r_x_draw, eye_r_y_draw = self.get_draw_positions()
+        bounds = {
+            "eye_l": pygame.Rect(eye_l_x_draw - 1, eye_l_y_draw - 1,
+                                 self.eye_l_width_current + 2, self.eye_l_height_current + 2)
+        }
+        if not self.cyclops:
+            bounds["eye_r"] = pygame.Rect(eye_r_x_draw - 1, eye_r_y_draw - 1,
+                                          self.eye_r_width_current + 2, self.eye_r_height_current + 2)
         if self.sweat:
-            if self.sweat1_y <= self.sweat1_y_max:
-                self.sweat1_y += 0.5
-            else:
-                self.sweat1_x_initial = random.randint(0, 240)
-                self.sweat1_y = 16.0
-                self.sweat1_y_max = random.randint(80, 160)
-                self.sweat1_width = 8.0
-                self.sweat1_height = 16.0
-            
-            if self.sweat1_y <= self.sweat1_y_max / 2:
-                self.sweat1_width += 0.5
-                self.sweat1_height += 0.5
-            else:
-                self.sweat1_width = max(0.8, self.sweat1_width - 0.1)
-                self.sweat1_height = max(0.8, self.sweat1_height - 0.5)
-            
-            self.sweat1_x = self.sweat1_x_initial - self.sweat1_width / 2
-            if self.sweat1_width > 0 and self.sweat1_height > 0:
-                self.draw_smooth_rounded_rect(self.screen, self.MAIN_COLOR,
-                                             (int(self.sweat1_x), int(self.sweat1_y), 
-                                              max(1, int(self.sweat1_width)), max(1, int(self.sweat1_height))),
-                                             self.sweat_border_radius)
-            
-            if self.sweat2_y <= self.sweat2_y_max:
-                self.sweat2_y += 0.5
-            else:
-                self.sweat2_x_initial = random.randint(240, self.screen_width - 240)
-                self.sweat2_y = 16.0
-                self.sweat2_y_max = random.randint(80, 160)
-                self.sweat2_width = 8.0
-                self.sweat2_height = 16.0
-            
-            if self.sweat2_y <= self.sweat2_y_max / 2:
-                self.sweat2_width += 0.5
-                self.sweat2_height += 0.5
-            else:
-                self.sweat2_width = max(0.8, self.sweat2_width - 0.1)
-                self.sweat2_height = max(0.8, self.sweat2_height - 0.5)
-            
-            self.sweat2_x = self.sweat2_x_initial - self.sweat2_width / 2
-            if self.sweat2_width > 0 and self.sweat2_height > 0:
-                self.draw_smooth_rounded_rect(self.screen, self.MAIN_COLOR,
-                                             (int(self.sweat2_x), int(self.sweat2_y),
-                                              max(1, int(self.sweat2_width)), max(1, int(self.sweat2_height))),
-                                             self.sweat_border_radius)
-            
-            if self.sweat3_y <= self.sweat3_y_max:
-                self.sweat3_y += 0.5
-            else:
-                self.sweat3_x_initial = self.screen_width - 240 + random.randint(0, 240)
-                self.sweat3_y = 16.0
-                self.sweat3_y_max = random.randint(80, 160)
-                self.sweat3_width = 8.0
-                self.sweat3_height = 16.0
-            
-            if self.sweat3_y <= self.sweat3_y_max / 2:
-                self.sweat3_width += 0.5
-                self.sweat3_height += 0.5
+            bounds.update(self.sweat_drops.bounds("sweat"))
+        for name, emitter in self.effects.items():
+            bounds.update(emitter.bounds(name))
+        return bounds
+    
+    def get_dirty_rects(self, previous_bounds, bounds):
+        """Union of the previous and current rect of each element, clipped to the screen"""
+        screen_rect = self.screen.get_rect()
+        rects = []
+        for key in previous_bounds.keys() | bounds.keys():
+            if key in previous_bounds and key in bounds:
+                rect = previous_bounds[key].union(bounds[key])
             else:
-                self.sweat3_width = max(0.8, self.sweat3_width - 0.1)
-                self.sweat3_height = max(0.8, self.sweat3_height - 0.5)
-            
-            self.sweat3_x = self.sweat3_x_initial - self.sweat3_width / 2
-            if self.sweat3_width > 0 and self.sweat3_height > 0:
-                self.draw_smooth_rounded_rect(self.screen, self.MAIN_COLOR,
-                                             (int(self.sweat3_x), int(self.sweat3_y),
-                                              max(1, int(self.sweat3_width)), max(1, int(self.sweat3_height))),
-                                             self.sweat_border_radius)
+                rect = previous_bounds.get(key) or bounds[key]
+            rect = rect.clip(screen_rect)
+            if rect.width > 0 and rect.height > 0:
+                rects.append(rect)
+        return rects
+    
+    def get_draw_positions(self):
+        """Eye positions including the flicker offsets: (lx, ly, rx, ry)"""
+        return (self.eye_l_x + self.h_flicker_offset, self.eye_l_y + self.v_flicker_offset,
+                self.eye_r_x + self.h_flicker_offset, self.eye_r_y + self.v_flicker_offset)
+    
+    def draw_eye_shapes(self, surface, scale=1):
+        """Both eyes, each composited with its eyelid cutouts, at 1/scale size"""
+        eye_l_x_draw, eye_l_y_draw, eye_r_x_draw, eye_r_y_draw = self.get_draw_positions()
+        self.draw_eye(surface, True, eye_l_x_draw // scale, eye_l_y_draw // scale, scale)
+        if not self.cyclops:
+            self.draw_eye(surface, False, eye_r_x_draw // scale, eye_r_y_draw // scale, scale)
+    
+    def get_eye_geometry(self, left):
+        """(width, height, border radius, default height) of one eye"""
+        if left:
+            return (self.eye_l_width_current, self.eye_l_height_current,
+                    self.eye_l_border_radius_current, self.eye_l_height_default)
+        return (self.eye_r_width_current, self.eye_r_height_current,
+                self.eye_r_border_radius_current, self.eye_r_height_default)
+    
+    def get_eye_shape(self, left, scale=1):
+        """
+        Eye geometry plus eyelids as drawn at 1/scale size:
+        (width, height, radius, height_default, tired, angry, happy).
+        Eyelids are rounded down to the quality's eyelid step.
+        """
+        shape = self.get_eye_geometry(left)
+        eyelids = (self.eyelids_tired_height, self.eyelids_angry_height, self.eyelids_happy_bottom_offset)
+        if self.quality.eyelid_step > 1:
+            step = max(1, int(round(self.quality.eyelid_step * self.layout.scale)))
+            eyelids = tuple(value // step * step for value in eyelids)
+        shape += eyelids
+        if scale > 1:
+            shape = tuple(value // scale for value in shape)
+        return shape
+    
+    def draw_eye(self, surface, left, x, y, scale=1):
+        if self.sprite_cache is None:
+            self.compose_eye(surface, left, x, y, scale)
+            return
+        
+        shape = self.get_eye_shape(left, scale)
+        width, height = shape[:2]
+        if width <= 0 or height <= 0:
+            return
+        key = (left, self.cyclops) + shape + (self.MAIN_COLOR, self.BG_COLOR)
+        
+        def build():
+            sprite = pygame.Surface((width, height), 0, surface)
+            sprite.fill(self.BG_COLOR)
+            self.compose_eye(sprite, left, 0, 0, scale)
+            return sprite
+        
+        surface.blit(self.sprite_cache.get(key, build), (x, y))
+    
+    def compose_eye(self, surface, left, x, y, scale=1):
+        width, height, radius, height_default, tired, angry, happy = self.get_eye_shape(left, scale)
+        self.backend.compose_eye(surface, x, y, width, height, radius, height_default, left, self.cyclops,
+                                 tired, angry, happy, self.MAIN_COLOR, self.BG_COLOR)
+    
+    def draw_sweat(self, surface, scale=1):
+        fraction = self.quality.particles
+        if self.sweat:
+            self.sweat_drops.draw(surface, self.MAIN_COLOR, self.BG_COLOR, self.sprite_cache, fraction, scale)
+        for emitter in self.effects.values():
+            emitter.draw(surface, self.MAIN_COLOR, self.BG_COLOR, self.sprite_cache, fraction, scale)
+    
+    def is_at_rest(self):
+        """
+        True when every transition has converged and no flicker or sweat
+        animation is running, so frames stay identical until the next
+        scheduled event or command. Whether the frame on screen still shows
+        this state is up to get_render_key().
+        """
+        if self.h_flicker or self.v_flicker or self.laugh or self.confused or self.sweat or self.effects:
+            return False
+        return (self.eye_l_height_current == self.eye_l_height_next + self.eye_l_height_offset
+                and self.eye_r_height_current == self.eye_r_height_next + self.eye_r_height_offset
+                and not (self.eye_l_open and self.eye_l_height_current <= 1 + self.eye_l_height_offset)
+                and not (self.eye_r_open and self.eye_r_height_current <= 1 + self.eye_r_height_offset)
+                and self.eye_l_width_current == self.eye_l_width_next
+                and self.eye_r_width_current == self.eye_r_width_next
+                and self.space_between_current == self.space_between_next
+                and self.eye_l_x == self.eye_l_x_next
+                and self.eye_l_y == self.eye_l_y_target
+                and self.eye_r_x == self.eye_r_x_next
+                and self.eye_r_y == self.eye_r_y_target
+                and self.eyelids_tired_height == self.eyelids_tired_height_next
+                and self.eyelids_angry_height == self.eyelids_angry_height_next
+                and self.eyelids_happy_bottom_offset == self.eyelids_happy_bottom_offset_next)
+    
+    def get_render_key(self):
+        """Everything a frame at rest depends on; equal keys draw identical frames"""
+        return get_render_state(self) + (self.MAIN_COLOR, self.BG_COLOR, self.quality)
+    
+    def next_event_ms(self):
+        """Time of the next scheduled blink or idle glance, or None"""
+        timers = []
+        if self.autoblinker:
+            timers.append(self.blink_timer)
+        if self.idle:
+            timers.append(self.idle_timer)
+        return min(timers) if timers else None
+    
+    def wait_for_event(self, until_ms):
+        """
+        Sleep until until_ms (capped by max_rest_wait_ms) or until an event
+        arrives. Events other than WAKE_EVENT are put back on the queue.
+        Returns at once when until_ms has already passed.
+        """
+        timeout = self.max_rest_wait_ms
+        if until_ms is not None:
+            remaining = until_ms - self.time_source()
+            if remaining <= 0:
+                return
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        if timeout is not None:
+            # pygame.event.wait(0) waits forever
+            timeout = max(1, timeout)
+        event = pygame.event.wait(timeout) if timeout is not None else pygame.event.wait()
+        if event.type not in (pygame.NOEVENT, WAKE_EVENT):
+            pygame.event.post(event)
+    
+    def wake(self):
+        """Force a redraw and end a rest wait, e.g. after changing state from another thread"""
+        self.rest_frame_drawn = False
+        if self.wake_hooks:
+            for hook in self.wake_hooks:
+                hook()
+        elif not self.headless:
+            pygame.event.post(pygame.event.Event(WAKE_EVENT))
+    
+    def open_window(self):
+        """Create the window now rather than with the first presented frame"""
+        if self.window is None:
+            self.window = pygame.display.set_mode((self.screen_width, self.screen_height))
+            pygame.display.set_caption("RoboEyes - Press ESC to exit")
+            # Carry over anything already drawn offscreen
+            self.window.blit(self.screen, (0, 0))
+            self.screen = self.window
+            self.dirty_rects = [self.screen.get_rect()]
+        return self.window
+    
+    def present(self):
+        """Push the dirty rects to the window, opening it on the first frame"""
+        if self.headless:
+            return
+        if self.window is None:
+            self.open_window()
+        pygame.display.update(self.dirty_rects)
+    
+    def enable_profiling(self, capacity=600):
+        """Start recording per-phase timings of draw_eyes, returns the FrameProfiler"""
+        self.profiler = FrameProfiler(self.get_frame_budget_ms(), capacity)
+        return self.profiler
+    
+    def get_frame_budget_ms(self):
+        """Time a frame may take at the current fps and quality level"""
+        return 1000 * self.quality.fps_divisor / self.fps
+    
+    def disable_profiling(self):
+        self.profiler = None
+    
+    def draw_eyes(self):
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin_frame()
+        
+        self.update()
+        at_rest = self.is_at_rest()
+        if (at_rest and self.rest_frame_drawn and not self.full_redraw
+                and self.get_render_key() == self.rest_key):
+            # Identical frame: skip drawing and sleep until something happens
+            if not self.headless:
+                self.wait_for_event(self.next_event_ms())
+                # The rest period had no motion; start easing from now
+                self.last_update_ms = self.time_source()
+            if profiler is not None:
+                profiler.mark("rest_wait")
+                profiler.end_frame(self.get_frame_budget_ms())
+            return self.screen
+        
+        self.render()
+        self.rest_frame_drawn = at_rest
+        self.rest_key = self.get_render_key() if at_rest else None
+        if self.outputs:
+            for output in self.outputs:
+                output(self.screen, self.dirty_rects, self.last_update_ms)
+            if profiler is not None:
+                profiler.mark("outputs")
         
         # NO SCALING - direct display update
-        pygame.display.flip()
-        self.clock.tick(self.fps)
+        if not self.headless:
+            self.present()
+            if profiler is not None:
+                profiler.mark("flip")
+            self.clock.tick(self.fps // self.quality.fps_divisor)
+            if profiler is not None:
+                profiler.mark("tick")
+        if profiler is not None:
+            profiler.end_frame(self.get_frame_budget_ms())
+        return self.screen
+    
+    def get_frame_array(self):
+        """Copy of the last drawn frame as a (height, width, 3) NumPy array"""
+        return pygame.surfarray.array3d(self.screen).swapaxes(0, 1)
+
+
+get_state = attrgetter(*RoboEyes.STATE_FIELDS)
 
 
 def main():
@@ -525,7 +1147,7 @@ def main():
     
     running = True
     demo_state = 0
-    state_timer = pygame.time.get_ticks()
+    state_timer = eyes.time_source()
     state_duration = 3000
     
     print("RoboEyes Demo Started! (Native Resolution - No Scaling)")
@@ -581,7 +1203,7 @@ def main():
                 elif event.key == pygame.K_SPACE:
                     eyes.blink()
         
-        current_time = pygame.time.get_ticks()
+        current_time = eyes.time_source()
         if current_time - state_timer > state_duration:
             demo_state = (demo_state + 1) % 8
             state_timer = current_time
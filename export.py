@@ -0,0 +1,168 @@
+"""
+Offline export of scripted RoboEyes animations.
+
+A timeline.Timeline is a list of timed RoboEyes calls. The exporter renders it
+headlessly with a simulated clock, splits the frames into segments and
+renders the segments in parallel across a process pool. A single state pass
+(no drawing) records a RoboEyes snapshot at the start of every segment as it
+goes, and each worker restores its snapshot, so the output matches a serial
+render frame for frame and no worker replays the frames before its segment.
+GIF frames are encoded by the workers and written as they arrive.
+
+    python export.py demo.json --format png --out frames/
+    python export.py demo.json --format gif --out demo.gif --fps 25
+    python export.py demo.json --format raw --out demo.rgb   # ffmpeg -f rawvideo -pix_fmt rgb24 ...
+
+See timeline.py for the timeline JSON format.
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import multiprocessing
+
+import numpy as np
+import pygame
+
+from cliplib import coverage, palette
+from emotions import RoboEyes
+from timeline import Timeline, TimelinePlayer, frame_time_ms
+
+FORMATS = ("png", "gif", "raw")
+
+
+def gif_image(frame, colors):
+    """8-bit PIL image of a coverage frame with the colors palette"""
+    # Optional dependency, only needed for GIF output
+    from PIL import Image
+
+    image = Image.frombytes("P", (frame.shape[1], frame.shape[0]), frame.tobytes())
+    image.putpalette([channel for color in colors for channel in color])
+    return image
+
+
+def gif_header(width, height, colors, duration_ms):
+    """GIF header and global palette shared by every frame, looping forever"""
+    from PIL import GifImagePlugin
+
+    image = gif_image(np.zeros((height, width), dtype=np.uint8), colors)
+    header, _ = GifImagePlugin.getheader(image, info={"loop": 0, "duration": duration_ms, "optimize": False})
+    return b"".join(header)
+
+
+def gif_frame(frame, previous, colors, duration_ms):
+    """Encoded GIF frame holding only the box that changed since previous"""
+    from PIL import GifImagePlugin
+
+    if previous is None:
+        box = (0, 0, frame.shape[1], frame.shape[0])
+    else:
+        rows = np.flatnonzero((frame != previous).any(axis=1))
+        columns = np.flatnonzero((frame != previous).any(axis=0))
+        if len(rows):
+            box = (int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1)
+        else:
+            # Unchanged: one pixel keeps the frame and its delay
+            box = (0, 0, 1, 1)
+    image = gif_image(frame[box[1]:box[3], box[0]:box[2]], colors)
+    return b"".join(GifImagePlugin.getdata(image, offset=box[:2], duration=duration_ms))
+
+
+def segment_jobs(timeline, width, height, fps, seed, total, segment_frames, fmt, out):
+    """
+    One job per segment, each with a (snapshot, command position) checkpoint
+    of the state at its first frame. The state pass runs lazily, so workers
+    start on the first segments while later checkpoints are still computed.
+    """
+    eyes = RoboEyes(width, height, headless=True, seed=seed)
+    player = TimelinePlayer(timeline, eyes)
+    for start in range(0, total, segment_frames):
+        stop = min(total, start + segment_frames)
+        yield (timeline, width, height, fps, seed, start, stop, fmt, out, (eyes.snapshot(), player.position))
+        for frame in range(start, stop):
+            player.advance(frame_time_ms(frame, fps))
+
+
+def render_segment(job):
+    """Worker: restore the checkpoint of job start, then render frames start..stop-1"""
+    timeline, width, height, fps, seed, start, stop, fmt, out, (snapshot, position) = job
+    eyes = RoboEyes(width, height, headless=True, seed=seed)
+    eyes.restore(snapshot)
+    player = TimelinePlayer(timeline, eyes)
+    player.position = position
+    colors = palette(eyes.MAIN_COLOR, eyes.BG_COLOR)
+    duration_ms = 1000 // fps
+
+    frames = []
+    previous = None
+    for frame in range(start, stop):
+        player.advance(frame_time_ms(frame, fps))
+        surface = eyes.render()
+        if fmt == "png":
+            pygame.image.save(surface, os.path.join(out, "frame_%06d.png" % frame))
+        elif fmt == "gif":
+            current = coverage(surface, eyes.MAIN_COLOR, eyes.BG_COLOR)
+            frames.append(gif_frame(current, previous, colors, duration_ms))
+            previous = current
+        else:
+            frames.append(pygame.image.tobytes(surface, "RGB"))
+    return frames
+
+
+def export(timeline, out, fmt="png", width=1024, height=512, fps=50, seed=0,
+           workers=None, segment_frames=250):
+    """Render timeline to out and return the number of frames written"""
+    if fmt not in FORMATS:
+        raise ValueError("unknown format %r, expected one of %s" % (fmt, ", ".join(FORMATS)))
+
+    total = timeline.frame_count(fps)
+    if fmt == "png":
+        os.makedirs(out, exist_ok=True)
+    jobs = segment_jobs(timeline, width, height, fps, seed, total, segment_frames, fmt, out)
+
+    with multiprocessing.Pool(workers) as pool:
+        # Segments arrive in order, so raw and GIF output is streamed as it is rendered
+        out_file = open(out, "wb") if fmt != "png" else None
+        try:
+            if fmt == "gif":
+                # Frames are stored as coverage indices into one BG..MAIN ramp
+                eyes = RoboEyes(width, height, headless=True)
+                out_file.write(gif_header(width, height, palette(eyes.MAIN_COLOR, eyes.BG_COLOR), 1000 // fps))
+            for frames in pool.imap(render_segment, jobs):
+                for frame in frames:
+                    if out_file is not None:
+                        out_file.write(frame)
+            if fmt == "gif":
+                out_file.write(b";")
+        finally:
+            if out_file is not None:
+                out_file.close()
+        # Let the workers exit on their own: with SDL video initialized in
+        # this process they inherit its SIGTERM handler, and terminate() hangs
+        pool.close()
+        pool.join()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a RoboEyes timeline to frames, GIF or raw video")
+    parser.add_argument("timeline", help="timeline JSON file")
+    parser.add_argument("--out", required=True, help="output directory (png) or file (gif, raw)")
+    parser.add_argument("--format", choices=FORMATS, default="png")
+    parser.add_argument("--size", default="1024x512", metavar="WxH")
+    parser.add_argument("--fps", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--segment-frames", type=int, default=250)
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    total = export(Timeline.load(args.timeline), args.out, args.format, width, height,
+                   args.fps, args.seed, args.workers, args.segment_frames)
+    print("Wrote %d frames to %s" % (total, args.out))
+
+
+if __name__ == "__main__":
+    main()
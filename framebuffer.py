@@ -0,0 +1,125 @@
+"""
+Packed framebuffer outputs for small panels.
+
+MonoFramebuffer packs a frame into the 1-bpp page layout of SSD1306-class
+OLEDs (pages of 8 rows, one byte per column, LSB at the top) and
+RGB565Framebuffer into 16-bit RGB565 for SPI LCDs. Both convert straight
+from a zero-copy NumPy view of the pygame surface into a preallocated
+bytearray, exposed as a memoryview, and can push every frame to a FileSink:
+
+    eyes = RoboEyes(128, 64, headless=True)
+    eyes.outputs.append(FramebufferOutput(MonoFramebuffer(128, 64), FileSink("/dev/fb1")))
+"""
+import os
+
+import numpy as np
+import pygame
+
+
+class MonoFramebuffer:
+    """1 bit per pixel, page ordered: byte (page * width + x) holds rows page*8..page*8+7"""
+    def __init__(self, width, height, threshold=64):
+        self.width = width
+        self.height = height
+        self.threshold = threshold
+        self.pages = -(-height // 8)
+        self.buffer = bytearray(self.pages * width)
+        self.view = memoryview(self.buffer)
+        self.array = np.frombuffer(self.buffer, dtype=np.uint8).reshape(self.pages, width)
+        self.bits = np.zeros((self.pages * 8, width), dtype=np.uint8)
+        self.lit = np.zeros((height, width), dtype=bool)
+        self.channel = np.zeros((height, width), dtype=np.uint32)
+        self.shifted = np.zeros((self.pages, width), dtype=np.uint8)
+
+    def convert(self, surface):
+        """Pack surface into the buffer and return the memoryview"""
+        pixels = pygame.surfarray.pixels2d(surface).T
+        lit, channel = self.lit, self.channel
+        lit[:] = False
+        # A pixel is lit when any of its channels is above the threshold
+        for mask, shift in zip(surface.get_masks()[:3], surface.get_shifts()[:3]):
+            np.bitwise_and(pixels, mask, out=channel)
+            lit |= channel > (self.threshold << shift)
+        del pixels
+        self.bits[:self.height] = lit
+
+        # Bit k of each byte is row k of its page
+        pages = self.bits.reshape(self.pages, 8, self.width)
+        self.array[:] = pages[:, 0, :]
+        for row in range(1, 8):
+            np.left_shift(pages[:, row, :], row, out=self.shifted)
+            self.array[:] |= self.shifted
+        return self.view
+
+
+class RGB565Framebuffer:
+    """16 bits per pixel, row major, big endian by default as most SPI LCDs expect"""
+    def __init__(self, width, height, big_endian=True):
+        self.width = width
+        self.height = height
+        self.buffer = bytearray(width * height * 2)
+        self.view = memoryview(self.buffer)
+        dtype = ">u2" if big_endian else "<u2"
+        self.array = np.frombuffer(self.buffer, dtype=dtype).reshape(height, width)
+        self.packed = np.zeros((height, width), dtype=np.uint32)
+        self.channel = np.zeros((height, width), dtype=np.uint32)
+
+    def convert(self, surface):
+        """Pack surface into the buffer and return the memoryview"""
+        pixels = pygame.surfarray.pixels2d(surface).T
+        packed, channel = self.packed, self.channel
+        packed[:] = 0
+        # Keep the top 5/6/5 bits of each channel and move them into place
+        red_shift, green_shift, blue_shift = surface.get_shifts()[:3]
+        for shift, bits, position in ((red_shift, 5, 11), (green_shift, 6, 5), (blue_shift, 5, 0)):
+            np.right_shift(pixels, shift + 8 - bits, out=channel)
+            np.bitwise_and(channel, (1 << bits) - 1, out=channel)
+            np.left_shift(channel, position, out=channel)
+            packed |= channel
+        del pixels
+        self.array[:] = packed
+        return self.view
+
+
+class FileSink:
+    """
+    Writes each frame to a path or an open file descriptor. With rewind the
+    frame is written at offset 0 (framebuffer devices, test files); without
+    it frames are written sequentially in chunk_size pieces (spidev, pipes).
+    """
+    def __init__(self, target, rewind=True, chunk_size=4096):
+        if isinstance(target, int):
+            self.fd = target
+            self.owns_fd = False
+        else:
+            self.fd = os.open(target, os.O_WRONLY | os.O_CREAT, 0o644)
+            self.owns_fd = True
+        self.rewind = rewind
+        self.chunk_size = chunk_size
+
+    def write(self, data):
+        # Both calls may write fewer bytes than asked, e.g. to a pipe or a
+        # driver with a small buffer, so carry on from where they stopped
+        data = memoryview(data).cast("B")
+        start = 0
+        while start < len(data):
+            if self.rewind:
+                start += os.pwrite(self.fd, data[start:], start)
+            else:
+                start += os.write(self.fd, data[start:start + self.chunk_size])
+
+    def close(self):
+        if self.owns_fd:
+            os.close(self.fd)
+
+
+class FramebufferOutput:
+    """RoboEyes output: converts every presented frame and hands it to the sink"""
+    def __init__(self, framebuffer, sink=None):
+        self.framebuffer = framebuffer
+        self.sink = sink
+
+    def __call__(self, surface, dirty_rects=None, time_ms=None):
+        data = self.framebuffer.convert(surface)
+        if self.sink is not None:
+            self.sink.write(data)
@@ -0,0 +1,107 @@
+"""
+Continuous gaze input for face trackers.
+
+A tracker thread pushes normalized (x, y) gaze targets at whatever rate it
+runs (100-200 Hz is typical); the render loop applies only the newest one
+before each frame, so samples never queue up behind a slower display. With
+prediction on, the target is extrapolated along the smoothed gaze velocity
+to the moment the frame will actually be shown, hiding tracker and display
+latency.
+
+    gaze = GazeStream(eyes, predict=True)
+    eyes.set_position_easing(False)          # tracker input is smooth enough
+
+    # tracker thread
+    gaze.push(x, y)                          # -1..1, (0, 0) straight ahead
+
+    # render loop
+    gaze.apply()
+    eyes.draw_eyes()
+"""
+import threading
+
+from emotions import monotonic_ms
+
+
+class GazeStream:
+    def __init__(self, eyes, predict=True, lead_ms=20.0, max_lead_ms=80.0, smoothing=0.5,
+                 time_source=monotonic_ms):
+        """
+        lead_ms is the expected time from apply() until the frame is visible
+        (about one frame). Predictions never reach further than max_lead_ms
+        past the newest sample. smoothing is the weight of the previous
+        velocity estimate (0 uses only the last two samples).
+        """
+        self.eyes = eyes
+        self.predict = predict
+        self.lead_ms = lead_ms
+        self.max_lead_ms = max_lead_ms
+        self.smoothing = smoothing
+        self.time_source = time_source
+        self.lock = threading.Lock()
+        self.sample = None              # (x, y, timestamp_ms)
+        self.velocity = (0.0, 0.0)      # normalized units per ms
+        self.sequence = 0
+        self.applied_sequence = 0
+        self.pushed = 0
+        self.coalesced = 0
+        # Set by push() when it wakes the eyes, cleared by apply(): samples
+        # arriving in between need no wake of their own
+        self.wake_pending = False
+        self.wakes = 0
+
+    def push(self, x, y, timestamp_ms=None):
+        """Newest gaze target from any thread; replaces a sample not yet applied"""
+        if timestamp_ms is None:
+            timestamp_ms = self.time_source()
+        with self.lock:
+            previous = self.sample
+            if previous is not None and timestamp_ms > previous[2]:
+                dt = timestamp_ms - previous[2]
+                vx = (x - previous[0]) / dt
+                vy = (y - previous[1]) / dt
+                s = self.smoothing
+                self.velocity = (s * self.velocity[0] + (1 - s) * vx, s * self.velocity[1] + (1 - s) * vy)
+            if self.sequence != self.applied_sequence:
+                self.coalesced += 1
+            self.sample = (x, y, timestamp_ms)
+            self.sequence += 1
+            self.pushed += 1
+            wake = not self.wake_pending
+            self.wake_pending = True
+        if wake:
+            # Ends a rest wait so the new target is drawn right away
+            self.wakes += 1
+            self.eyes.wake()
+
+    def target(self, now_ms=None):
+        """(x, y) the eyes should show at now_ms, predicted if enabled; None before any push"""
+        with self.lock:
+            sample, velocity = self.sample, self.velocity
+        if sample is None:
+            return None
+        x, y, timestamp_ms = sample
+        if self.predict:
+            if now_ms is None:
+                now_ms = self.time_source()
+            lead = min(self.max_lead_ms, max(0.0, now_ms - timestamp_ms) + self.lead_ms)
+            x += velocity[0] * lead
+            y += velocity[1] * lead
+        return min(1.0, max(-1.0, x)), min(1.0, max(-1.0, y))
+
+    def apply(self, now_ms=None):
+        """
+        Set the eyes' gaze from the newest sample; call once per frame from
+        the render loop. Returns True when a target was applied.
+        """
+        target = self.target(now_ms)
+        if target is None:
+            return False
+        with self.lock:
+            fresh = self.sequence != self.applied_sequence
+            self.applied_sequence = self.sequence
+            self.wake_pending = False
+        if not fresh and not self.predict:
+            return False
+        self.eyes.set_gaze(*target)
+        return True
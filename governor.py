@@ -0,0 +1,106 @@
+"""
+Adaptive quality for holding the frame deadline on slow hardware.
+
+QualityGovernor watches the working time of every drawn frame through the
+eyes' FrameProfiler. When the slowest frames of the last window come close
+to the frame budget it steps RoboEyes down one quality level; once frames
+have stayed well under budget for a while it steps back up. The gap between
+the two thresholds plus the hold time is the hysteresis, and a level that
+has to be left right after stepping up to it is retried less and less often.
+
+    governor = QualityGovernor(eyes)
+    while running:
+        eyes.draw_eyes()
+    governor.level, governor.quality.name     # e.g. 2, "simple_eyelids"
+"""
+from collections import deque, namedtuple
+
+# particles: fraction of each emitter's particles drawn
+# eyelid_step: eyelid heights are rounded down to this many pixels (at
+# 1024x512), so transitions reuse far fewer sprites
+# render_scale: draw at 1/render_scale resolution and upscale
+# fps_divisor: frame rate is divided by this
+Quality = namedtuple("Quality", "name particles eyelid_step render_scale fps_divisor")
+
+QUALITY_LEVELS = (
+    Quality("full", 1.0, 1, 1, 1),
+    Quality("fewer_particles", 0.34, 1, 1, 1),
+    Quality("simple_eyelids", 0.34, 16, 1, 1),
+    Quality("half_resolution", 0.34, 16, 2, 1),
+    Quality("half_rate", 0.34, 16, 2, 2),
+)
+FULL_QUALITY = QUALITY_LEVELS[0]
+
+
+class QualityGovernor:
+    def __init__(self, eyes, levels=QUALITY_LEVELS, budget_ms=None, risk=0.85, headroom=0.5,
+                 window=30, hold_frames=150, max_hold_frames=2400):
+        """
+        Steps down when the 90th percentile of the last window frames exceeds
+        risk * budget, and up when it is below headroom * budget and the
+        current level has been held for hold_frames. budget_ms defaults to
+        one frame at the eyes' current fps.
+        """
+        self.eyes = eyes
+        self.levels = levels
+        self.budget_ms = budget_ms
+        self.risk = risk
+        self.headroom = headroom
+        self.samples = deque(maxlen=window)
+        self.base_hold_frames = hold_frames
+        self.hold_frames = hold_frames
+        self.max_hold_frames = max_hold_frames
+        self.frames_at_level = 0
+        self.stepped_up = False
+        self.level = 0
+        self.changes = 0
+
+        if eyes.profiler is None:
+            eyes.enable_profiling()
+        eyes.profiler.add_hook(self.on_frame)
+        eyes.set_quality(levels[0])
+
+    @property
+    def quality(self):
+        return self.levels[self.level]
+
+    def on_frame(self, record):
+        """FrameProfiler hook, called with every finished frame"""
+        if "rest_wait" in record["phases"]:
+            # Nothing was drawn, so the frame says nothing about the cost
+            return
+        self.samples.append(record["work_ms"])
+        self.frames_at_level += 1
+        if len(self.samples) < self.samples.maxlen:
+            return
+
+        cost = sorted(self.samples)[int(0.9 * (len(self.samples) - 1))]
+        # A lower frame rate leaves proportionally more time per frame
+        budget = (self.budget_ms or 1000.0 / self.eyes.fps) * self.quality.fps_divisor
+        if cost > self.risk * budget and self.level < len(self.levels) - 1:
+            if self.stepped_up and self.frames_at_level < self.hold_frames:
+                # The level we just returned to does not fit: back off before retrying it
+                self.hold_frames = min(self.hold_frames * 2, self.max_hold_frames)
+            self.set_level(self.level + 1)
+        elif cost < self.headroom * budget and self.level > 0 and self.frames_at_level >= self.hold_frames:
+            self.set_level(self.level - 1)
+        elif self.frames_at_level >= self.max_hold_frames:
+            # Stable for a long time: forget earlier failed step-ups
+            self.hold_frames = self.base_hold_frames
+
+    def set_level(self, level):
+        """Force a quality level; the governor keeps adjusting from there"""
+        level = max(0, min(level, len(self.levels) - 1))
+        if level == self.level:
+            return
+        self.stepped_up = level < self.level
+        self.level = level
+        self.changes += 1
+        self.samples.clear()
+        self.frames_at_level = 0
+        self.eyes.set_quality(self.levels[level])
+
+    def detach(self):
+        """Stop adjusting and restore full quality"""
+        self.eyes.profiler.remove_hook(self.on_frame)
+        self.eyes.set_quality(FULL_QUALITY)
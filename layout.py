@@ -0,0 +1,72 @@
+"""
+Resolution-independent face geometry.
+
+Sizes are defined in face units: one unit is min(width / 2, height) pixels,
+the height of the largest 2:1 face that fits the screen. On the reference
+1024x512 screen a unit is 512 px and every size resolves to the original
+pixel constants, at 128x64 the whole face shrinks by 8 and at 1920x1080 it
+grows to fill the width.
+
+get_layout() resolves the geometry, the default eye positions, the screen
+constraints and the Position target table once per (width, height) and
+caches the result, so RoboEyes only looks values up per frame and a resize
+is a single cache lookup.
+"""
+from functools import lru_cache
+
+# Face units; the comments give the pixels at 1024x512
+GEOMETRY = {
+    "eye_width": 0.5625,            # 288
+    "eye_height": 0.5625,           # 288
+    "border_radius": 0.078125,      # 40
+    "space_between": 0.15625,       # 80
+    "h_flicker": 0.03125,           # 16
+    "v_flicker": 0.15625,           # 80
+    "laugh_flicker": 0.078125,      # 40
+    "confused_flicker": 0.3125,     # 160
+    "curious_margin": 0.15625,      # 80
+    "curious_offset": 0.125,        # 64
+}
+
+
+class Layout:
+    """Pixel geometry for one resolution; treat as read-only, instances are shared"""
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.unit = min(width / 2, height)
+        # Sweat and other per-pixel speeds scale with the face
+        self.scale = self.unit / 512
+        for name, value in GEOMETRY.items():
+            setattr(self, name, max(1, int(round(value * self.unit))))
+
+        self.eye_l_x_default = (width - (self.eye_width + self.space_between + self.eye_width)) // 2
+        self.eye_l_y_default = (height - self.eye_height) // 2
+        self.eye_r_x_default = self.eye_l_x_default + self.eye_width + self.space_between
+        self.eye_r_y_default = self.eye_l_y_default
+
+        # Room left for moving the left eye with both eyes at their default size
+        self.constraint_x = width - self.eye_width - self.space_between - self.eye_width
+        self.constraint_y = height - self.eye_height
+        x, y = self.constraint_x, self.constraint_y
+        # Keyed by emotions.Position value (N, NE, E, SE, S, SW, W, NW)
+        self.positions = {
+            1: (x // 2, 0),
+            2: (x, 0),
+            3: (x, y // 2),
+            4: (x, y),
+            5: (x // 2, y),
+            6: (0, y),
+            7: (0, y // 2),
+            8: (0, 0),
+        }
+        self.center = (x // 2, y // 2)
+
+    def position(self, position):
+        """Left eye (x, y) target for a Position, the center for anything else"""
+        return self.positions.get(position, self.center)
+
+
+@lru_cache(maxsize=32)
+def get_layout(width, height):
+    return Layout(width, height)
@@ -0,0 +1,176 @@
+"""
+Vectorized particle emitters for sweat drops, rain and similar effects.
+
+All particle state lives in NumPy arrays and is advanced in one vectorized
+step. Each particle falls from spawn_y until it has travelled past its
+randomly chosen y_max, growing during the first half of the way and
+shrinking during the second, then respawns at a random x inside its spawn
+band. Particles are drawn as rounded rects from cached sprites with a single
+blits() call.
+"""
+import numpy as np
+import pygame
+
+
+class ParticleEmitter:
+    def __init__(self, count, bands, rng, spawn_y=16.0, y_max_range=(80, 160), speed=0.5,
+                 size=(8.0, 16.0), grow=(0.5, 0.5), shrink=(0.1, 0.5), min_size=0.8, border_radius=16, scatter=False,
+                 merge_bounds=16):
+        """
+        bands is a list of inclusive (x_min, x_max) spawn ranges, particle i
+        uses bands[i % len(bands)]. Speeds and size changes are per reference
+        frame (20 ms) and scaled by the step passed to update(). With
+        scatter the particles start spread over their whole path instead of
+        all at the first spawn point. Emitters with more than merge_bounds
+        particles report one union rect for dirty-rect redraws, which is
+        cheaper than clearing hundreds of small rects.
+        """
+        self.count = count
+        band_index = np.arange(count) % len(bands)
+        self.x_low = np.array([bands[i][0] for i in band_index], dtype=np.int64)
+        self.x_high = np.array([max(bands[i]) for i in band_index], dtype=np.int64)
+        self.rng = rng
+        self.spawn_y = spawn_y
+        self.y_max_range = y_max_range
+        self.speed = speed
+        self.size = size
+        self.grow = grow
+        self.shrink = shrink
+        self.min_size = min_size
+        self.border_radius = border_radius
+        self.merge_bounds = merge_bounds
+
+        self.x_initial = np.full(count, 16.0)
+        self.x = self.x_initial.copy()
+        self.y = np.full(count, spawn_y)
+        self.y_max = np.full(count, float(y_max_range[1]))
+        self.width = np.full(count, size[0])
+        self.height = np.full(count, size[1])
+        if scatter:
+            self.x_initial = rng.integers(self.x_low, self.x_high + 1).astype(float)
+            self.y_max = rng.integers(y_max_range[0], y_max_range[1] + 1, count).astype(float)
+            self.y = spawn_y + rng.random(count) * (self.y_max - spawn_y)
+            self.x = self.x_initial - self.width / 2
+
+    def update(self, step, active=None):
+        """
+        Advance every particle by step reference frames, or only those where
+        the boolean array active is set
+        """
+        falling = self.y <= self.y_max
+        respawn = ~falling
+        if active is not None:
+            falling &= active
+            respawn &= active
+        self.y[falling] += self.speed * step
+
+        respawned = np.count_nonzero(respawn)
+        if respawned:
+            self.x_initial[respawn] = self.rng.integers(self.x_low[respawn], self.x_high[respawn] + 1)
+            self.y[respawn] = self.spawn_y
+            self.y_max[respawn] = self.rng.integers(self.y_max_range[0], self.y_max_range[1] + 1, respawned)
+            self.width[respawn] = self.size[0]
+            self.height[respawn] = self.size[1]
+
+        growing = self.y <= self.y_max / 2
+        width = np.where(growing, self.width + self.grow[0] * step,
+                         np.maximum(self.min_size, self.width - self.shrink[0] * step))
+        height = np.where(growing, self.height + self.grow[1] * step,
+                          np.maximum(self.min_size, self.height - self.shrink[1] * step))
+        x = self.x_initial - width / 2
+        if active is not None:
+            width = np.where(active, width, self.width)
+            height = np.where(active, height, self.height)
+            x = np.where(active, x, self.x)
+        self.x, self.width, self.height = x, width, height
+
+    def rects(self):
+        """Integer (x, y, w, h) columns of the particles as drawn"""
+        return (self.x.astype(np.int64), self.y.astype(np.int64),
+                np.maximum(1, self.width.astype(np.int64)), np.maximum(1, self.height.astype(np.int64)))
+
+    def bounds(self, prefix):
+        """Dirty-rect bounds keyed prefix0, prefix1, ..., grown by a pixel on each side"""
+        if self.count > self.merge_bounds:
+            xs, ys, ws, hs = self.rects()
+            left, top = int(xs.min()), int(ys.min())
+            right, bottom = int((xs + ws).max()), int((ys + hs).max())
+            return {prefix: pygame.Rect(left - 1, top - 1, right - left + 2, bottom - top + 2)}
+        xs, ys, ws, hs = (column.tolist() for column in self.rects())
+        return {"%s%d" % (prefix, i): pygame.Rect(x - 1, y - 1, w + 2, h + 2)
+                for i, (x, y, w, h) in enumerate(zip(xs, ys, ws, hs))}
+
+    def draw(self, surface, color, bg_color, sprite_cache=None, fraction=1.0, scale=1):
+        """
+        Draw the first fraction of the particles (at least one), at 1/scale
+        size for reduced resolution rendering
+        """
+        xs, ys, ws, hs = self.rects()
+        if fraction < 1.0:
+            count = max(1, int(self.count * fraction + 0.5))
+            xs, ys, ws, hs = xs[:count], ys[:count], ws[:count], hs[:count]
+        if scale > 1:
+            xs, ys = xs // scale, ys // scale
+            ws, hs = np.maximum(1, ws // scale), np.maximum(1, hs // scale)
+        xs, ys, ws, hs = xs.tolist(), ys.tolist(), ws.tolist(), hs.tolist()
+        if sprite_cache is None:
+            for x, y, w, h in zip(xs, ys, ws, hs):
+                radius = max(0, min(self.border_radius, w // 2, h // 2))
+                pygame.draw.rect(surface, color, (x, y, w, h), border_radius=radius)
+            return
+
+        sprites = {}
+
+        def sprite(w, h):
+            image = sprites.get((w, h))
+            if image is not None:
+                return image
+
+            def build():
+                image = pygame.Surface((w, h), 0, surface)
+                image.fill(bg_color)
+                radius = max(0, min(self.border_radius, w // 2, h // 2))
+                pygame.draw.rect(image, color, (0, 0, w, h), border_radius=radius)
+                # Corners stay transparent so drops never cover the eyes
+                image.set_colorkey(bg_color)
+                return image
+            image = sprites[w, h] = sprite_cache.get(("particle", w, h, self.border_radius, color, bg_color), build)
+            return image
+
+        surface.blits([(sprite(w, h), (x, y)) for x, y, w, h in zip(xs, ys, ws, hs)], doreturn=False)
+
+    def snapshot(self):
+        return (self.x_initial.copy(), self.x.copy(), self.y.copy(), self.y_max.copy(),
+                self.width.copy(), self.height.copy(), self.rng.bit_generator.state)
+
+    def restore(self, snapshot):
+        x_initial, x, y, y_max, width, height, rng_state = snapshot
+        self.x_initial[:] = x_initial
+        self.x[:] = x
+        self.y[:] = y
+        self.y_max[:] = y_max
+        self.width = width.copy()
+        self.height = height.copy()
+        self.rng.bit_generator.state = rng_state
+
+
+def sweat(screen_width, rng, count=3, scale=1.0):
+    """
+    The classic RoboEyes sweat: drops on the left, middle and right of the
+    forehead. scale resizes the drops, their paths and speeds (1.0 at 1024x512).
+    """
+    band = int(round(240 * scale))
+    bands = [(0, band), (band, max(band, screen_width - band)), (screen_width - band, screen_width)]
+    return ParticleEmitter(count, bands, rng, spawn_y=16.0 * scale,
+                           y_max_range=(int(round(80 * scale)), int(round(160 * scale))), speed=0.5 * scale,
+                           size=(8.0 * scale, 16.0 * scale), grow=(0.5 * scale, 0.5 * scale),
+                           shrink=(0.1 * scale, 0.5 * scale), min_size=0.8 * scale,
+                           border_radius=max(1, int(round(16 * scale))))
+
+
+def rain(screen_width, screen_height, rng, count=120):
+    """Thin fast streaks across the whole width, falling most of the screen"""
+    return ParticleEmitter(count, [(0, screen_width)], rng, spawn_y=0.0,
+                           y_max_range=(screen_height // 2, screen_height), speed=12.0,
+                           size=(2.0, 12.0), grow=(0.0, 0.5), shrink=(0.0, 0.0), border_radius=1,
+                           scatter=True)
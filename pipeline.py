@@ -0,0 +1,258 @@
+"""
+Pipelined runtime: state update, rasterization and presentation on their own
+threads.
+
+draw_eyes() does everything in order on one thread, so a slow display flip
+delays the next state update and slow drawing delays input. PipelinedRuntime
+splits a frame into three stages linked by bounded queues:
+
+    update   applies queued commands, advances the eyes and captures the
+             render state (the fields timeline.RENDER_FIELDS lists plus the
+             particle positions)
+    raster   applies that state to a private headless copy of the eyes,
+             draws it into that copy's screen (the back buffer) and hands
+             on only the dirty rects, copied out as patches
+    present  blits the patches onto eyes.screen and updates the display
+
+A full queue blocks the stage feeding it, so at most `depth` frames are in
+flight between two stages (2 is double, 3 triple buffering) and latency
+stays bounded. The stages only run at the same time while one of them is
+outside the GIL, e.g. blocked in a display update or on a queue; how much
+of pygame's drawing does that has not been measured here.
+
+    runtime = PipelinedRuntime(eyes).start()
+    while running:
+        for event in pygame.event.get():
+            ...
+            runtime.call("set_mood", Mood.HAPPY)    # instead of eyes.set_mood()
+    runtime.stop()
+
+While the runtime runs, change the eyes only through call() or
+before_update hooks, which run on the update thread. eyes.wake() ends the
+update thread's rest wait too. Some video drivers only
+allow display updates from the main thread; there, pass
+threaded_present=False and call present() from the main loop.
+"""
+import copy
+import queue
+import threading
+from collections import namedtuple
+
+import pygame
+
+from emotions import Mood, RoboEyes, parse_command
+from timeline import RENDER_FIELDS, get_render_state
+
+# Everything the raster stage needs to draw one frame. effects holds the
+# particle arrays of each extra emitter, emitters a copy of the emitters
+# themselves whenever the set of effects changed (None otherwise).
+Frame = namedtuple("Frame", "time_ms state sweat effects emitters quality colors full_redraw")
+
+
+def particle_arrays(emitter):
+    return emitter.x.copy(), emitter.y.copy(), emitter.width.copy(), emitter.height.copy()
+
+
+def set_particle_arrays(emitter, arrays):
+    emitter.x, emitter.y, emitter.width, emitter.height = arrays
+
+
+class PipelinedRuntime:
+    def __init__(self, eyes, depth=2, threaded_present=True, max_pending=1024):
+        self.eyes = eyes
+        self.depth = depth
+        self.threaded_present = threaded_present
+        self.renderer = eyes.clone(headless=True)
+        self.renderer.backend = eyes.backend
+        self.states = queue.Queue(depth)
+        self.rendered = queue.Queue(depth)
+        self.pending = queue.Queue(max_pending)
+        self.wake_event = threading.Event()
+        # Callables run on the update thread before every update, e.g.
+        # CommandServer.apply_pending or GazeStream.apply
+        self.before_update = []
+        self.running = False
+        self.threads = []
+        self.effect_names = None
+        self.updated = 0
+        self.rasterized = 0
+        self.presented = 0
+        self.latency_ms = None
+
+    def start(self):
+        self.running = True
+        self.eyes.wake_hooks.append(self.wake_event.set)
+        stages = [("update", self.run_update), ("raster", self.run_raster)]
+        if self.threaded_present:
+            if not self.eyes.headless:
+                # Create the window on this thread rather than the present thread
+                self.eyes.open_window()
+            stages.append(("present", self.run_present))
+        for name, target in stages:
+            thread = threading.Thread(target=target, name="roboeyes-" + name, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def stop(self):
+        """Stop all stages; frames still in flight are dropped"""
+        self.running = False
+        if self.wake_event.set in self.eyes.wake_hooks:
+            self.eyes.wake_hooks.remove(self.wake_event.set)
+        self.wake_event.set()
+        for thread in self.threads:
+            thread.join(timeout=2)
+        self.threads = []
+
+    def call(self, method, *args):
+        """Queue a RoboEyes call for the update thread, from any thread"""
+        self.pending.put(parse_command(method, args))
+        self.wake_event.set()
+
+    def apply_pending(self):
+        while True:
+            try:
+                method, args = self.pending.get_nowait()
+            except queue.Empty:
+                return
+            getattr(self.eyes, method)(*args)
+
+    def put(self, target, item):
+        """Blocking put that gives up once the runtime stops"""
+        while self.running:
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(self, source, timeout=None):
+        """Blocking get that gives up once the runtime stops (or after timeout seconds)"""
+        waited = 0.0
+        while self.running:
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                waited += 0.1
+                if timeout is not None and waited >= timeout:
+                    return None
+        return None
+
+    def capture(self, now_ms):
+        eyes = self.eyes
+        emitters = None
+        if self.effect_names != eyes.effects.keys():
+            # New or removed effects: the raster stage needs its own emitters
+            self.effect_names = set(eyes.effects)
+            emitters = copy.deepcopy(eyes.effects)
+        effects = {name: particle_arrays(emitter) for name, emitter in eyes.effects.items()}
+        frame = Frame(now_ms, get_render_state(eyes), particle_arrays(eyes.sweat_drops), effects, emitters,
+                      eyes.quality, (eyes.MAIN_COLOR, eyes.BG_COLOR), eyes.full_redraw)
+        eyes.full_redraw = False
+        return frame
+
+    def run_update(self):
+        eyes = self.eyes
+        while self.running:
+            for hook in self.before_update:
+                hook()
+            self.apply_pending()
+            now_ms = eyes.time_source()
+            eyes.update(now_ms)
+            at_rest = eyes.is_at_rest()
+            if (at_rest and eyes.rest_frame_drawn and not eyes.full_redraw
+                    and eyes.get_render_key() == eyes.rest_key):
+                # Nothing changes on screen: sleep until a command or the next
+                # blink/idle timer, at most a frame so wake() is noticed soon
+                timeout = 1000 / eyes.fps
+                until_ms = eyes.next_event_ms()
+                if until_ms is not None:
+                    timeout = min(timeout, max(0, until_ms - now_ms))
+                self.wake_event.wait(timeout / 1000)
+                self.wake_event.clear()
+                eyes.last_update_ms = eyes.time_source()
+                continue
+            if not self.put(self.states, self.capture(now_ms)):
+                return
+            eyes.rest_frame_drawn = at_rest
+            eyes.rest_key = eyes.get_render_key() if at_rest else None
+            self.updated += 1
+            eyes.clock.tick(eyes.fps // eyes.quality.fps_divisor)
+
+    def rasterize(self, frame):
+        """Draw frame into the back buffer and return its (time_ms, patches)"""
+        renderer = self.renderer
+        for name, value in zip(RENDER_FIELDS, frame.state):
+            setattr(renderer, name, value)
+        set_particle_arrays(renderer.sweat_drops, frame.sweat)
+        if frame.emitters is not None:
+            renderer.effects = frame.emitters
+        for name, arrays in frame.effects.items():
+            set_particle_arrays(renderer.effects[name], arrays)
+        if renderer.quality != frame.quality:
+            renderer.set_quality(frame.quality)
+        if frame.full_redraw or (renderer.MAIN_COLOR, renderer.BG_COLOR) != frame.colors:
+            renderer.MAIN_COLOR, renderer.BG_COLOR = frame.colors
+            renderer.full_redraw = True
+        screen = renderer.render()
+        for output in self.eyes.outputs:
+            output(screen, renderer.dirty_rects, frame.time_ms)
+        patches = [(rect, screen.subsurface(rect).copy()) for rect in renderer.dirty_rects]
+        return frame.time_ms, patches
+
+    def run_raster(self):
+        while self.running:
+            frame = self.get(self.states)
+            if frame is None or not self.put(self.rendered, self.rasterize(frame)):
+                return
+            self.rasterized += 1
+
+    def present(self, timeout=None):
+        """
+        Show the next rasterized frame, waiting up to timeout seconds for it.
+        Returns False when no frame arrived.
+        """
+        rendered = self.get(self.rendered, timeout)
+        if rendered is None:
+            return False
+        time_ms, patches = rendered
+        eyes = self.eyes
+        for rect, patch in patches:
+            eyes.screen.blit(patch, rect)
+        eyes.dirty_rects = [rect for rect, _ in patches]
+        eyes.present()
+        self.latency_ms = eyes.time_source() - time_ms
+        self.presented += 1
+        return True
+
+    def run_present(self):
+        while self.running:
+            self.present()
+
+
+def main():
+    eyes = RoboEyes(1024, 512)
+    eyes.open()
+    eyes.set_autoblinker(True, 2, 3)
+    runtime = PipelinedRuntime(eyes).start()
+    print("Pipelined RoboEyes; 1-4 moods, SPACE blinks, ESC exits")
+
+    moods = {pygame.K_1: Mood.DEFAULT, pygame.K_2: Mood.HAPPY, pygame.K_3: Mood.TIRED, pygame.K_4: Mood.ANGRY}
+    running = True
+    while running:
+        event = pygame.event.wait()
+        if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+            running = False
+        elif event.type == pygame.KEYDOWN and event.key in moods:
+            runtime.call("set_mood", moods[event.key])
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
+            runtime.call("blink")
+
+    runtime.stop()
+    print("%d frames presented, last latency %s ms" % (runtime.presented, runtime.latency_ms))
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
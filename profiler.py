@@ -0,0 +1,100 @@
+import sys
+import time
+from collections import deque
+
+# Phases that are spent sleeping rather than working
+WAIT_PHASES = ("tick", "rest_wait")
+
+
+class FrameProfiler:
+    """
+    Per-phase frame timings kept in a ring buffer of the last `capacity`
+    frames. RoboEyes calls mark(phase) after each phase of a frame; frames
+    whose working time exceeds budget_ms count as missed deadlines.
+    end_frame() can pass a new budget_ms with every frame, as RoboEyes does
+    when its fps or quality changes.
+    """
+    def __init__(self, budget_ms, capacity=600):
+        self.budget_ms = budget_ms
+        self.frames = deque(maxlen=capacity)
+        self.hooks = []
+        self.frame_count = 0
+        self.missed = 0
+        self.current = None
+        self.last_mark = None
+
+    def begin_frame(self):
+        self.current = {}
+        self.last_mark = time.perf_counter()
+
+    def mark(self, phase):
+        """Charge the time since the previous mark to phase"""
+        now = time.perf_counter()
+        if self.current is None:
+            self.current = {}
+        else:
+            elapsed = (now - self.last_mark) * 1000
+            self.current[phase] = self.current.get(phase, 0.0) + elapsed
+        self.last_mark = now
+
+    def end_frame(self, budget_ms=None):
+        if self.current is None:
+            return None
+        if budget_ms is not None:
+            self.budget_ms = budget_ms
+        phases = self.current
+        work_ms = sum(ms for phase, ms in phases.items() if phase not in WAIT_PHASES)
+        missed = work_ms > self.budget_ms
+        record = {"phases": phases, "work_ms": work_ms, "missed": missed, "budget_ms": self.budget_ms}
+        self.frames.append(record)
+        self.frame_count += 1
+        if missed:
+            self.missed += 1
+        self.current = None
+        for hook in self.hooks:
+            hook(record)
+        return record
+
+    def add_hook(self, callback):
+        """Call callback(record) with every finished frame"""
+        self.hooks.append(callback)
+
+    def remove_hook(self, callback):
+        self.hooks.remove(callback)
+
+    def reset(self):
+        self.frames.clear()
+        self.frame_count = 0
+        self.missed = 0
+
+    def stats(self):
+        """Mean, 95th percentile and max per phase over the buffered frames"""
+        samples = {}
+        for record in self.frames:
+            for phase, ms in record["phases"].items():
+                samples.setdefault(phase, []).append(ms)
+            samples.setdefault("work", []).append(record["work_ms"])
+
+        phases = {}
+        for phase, values in samples.items():
+            values.sort()
+            phases[phase] = {
+                "mean_ms": sum(values) / len(values),
+                "p95_ms": values[min(len(values) - 1, int(0.95 * len(values)))],
+                "max_ms": values[-1],
+            }
+        return {
+            "frames": self.frame_count,
+            "missed": self.missed,
+            "budget_ms": self.budget_ms,
+            "phases": phases,
+        }
+
+    def dump(self, file=None):
+        file = file or sys.stdout
+        stats = self.stats()
+        print("frames %d, missed deadlines %d (budget %.1f ms)" % (
+            stats["frames"], stats["missed"], stats["budget_ms"]), file=file)
+        for phase, values in stats["phases"].items():
+            print("  %-10s mean %7.3f  p95 %7.3f  max %7.3f ms" % (
+                phase, values["mean_ms"], values["p95_ms"], values["max_ms"]), file=file)
@@ -0,0 +1,228 @@
+"""
+Pure NumPy rasterizer for the RoboEyes shapes.
+
+Every shape is evaluated as a signed distance at the pixel centers and turned
+into a coverage value per pixel: 0 or 1 without antialiasing, a one pixel
+wide ramp across the edge with it. The eye is a rounded rect with the tired
+and angry lid triangles and the happy cutout subtracted as masks. Geometry
+may be plain numbers or arrays with one entry per face, so a batch of faces
+rasterizes in the same array operations as a single one.
+
+    eyes.set_backend(NumpyBackend())          # eye sprites drawn by NumPy instead of pygame.draw
+
+    coverage = render_eyes(eyes)              # (h, w) float32, no surface involved
+    frame = shade(coverage, eyes.MAIN_COLOR, eyes.BG_COLOR)      # (h, w, 3) uint8
+    panel = to_rgb565(frame)                                     # (h, w) uint16
+"""
+import numpy as np
+
+
+def pixel_grid(height, width, x0=0, y0=0):
+    """Pixel center coordinates as broadcastable (1, w) and (h, 1) arrays"""
+    xs = np.arange(x0, x0 + width, dtype=np.float32)[None, :] + 0.5
+    ys = np.arange(y0, y0 + height, dtype=np.float32)[:, None] + 0.5
+    return xs, ys
+
+
+def param(value):
+    """A number or per-face array, shaped to broadcast against (..., h, w) grids"""
+    value = np.asarray(value, dtype=np.float32)
+    return value.reshape(value.shape + (1, 1))
+
+
+def edge_coverage(distance, antialias):
+    """Coverage from a signed distance, negative inside"""
+    if antialias:
+        return np.clip(0.5 - distance, 0.0, 1.0)
+    return (distance <= 0).astype(np.float32)
+
+
+def union(a, b):
+    return a + b - a * b
+
+
+def rounded_rect(xs, ys, x, y, width, height, radius, antialias=True):
+    """
+    pygame.draw.rect(..., border_radius=radius), radius clamped likewise.
+    The corners are exact circles, which cover a few more pixels than
+    pygame's midpoint circles.
+    """
+    radius = np.maximum(0, np.minimum(radius, np.minimum(width // 2, height // 2)))
+    half_width, half_height = width / 2, height / 2
+    qx = np.abs(xs - (x + half_width)) - (half_width - radius)
+    qy = np.abs(ys - (y + half_height)) - (half_height - radius)
+    distance = (np.hypot(np.maximum(qx, 0), np.maximum(qy, 0))
+                + np.minimum(np.maximum(qx, qy), 0) - radius)
+    return edge_coverage(distance, antialias) * ((width > 0) & (height > 0))
+
+
+def triangle(xs, ys, x0, y0, x1, y1, x2, y2, antialias=True):
+    """Triangle with pygame.draw.polygon vertices (pixel indices), any winding"""
+    x0, y0, x1, y1, x2, y2 = (vertex + 0.5 for vertex in (x0, y0, x1, y1, x2, y2))
+    area = (x1 - x0) * (y2 - y0) - (y1 - y0) * (x2 - x0)
+    sign = np.where(area < 0, -1.0, 1.0).astype(np.float32)
+    distance = None
+    for ax, ay, bx, by in ((x0, y0, x1, y1), (x1, y1, x2, y2), (x2, y2, x0, y0)):
+        ex, ey = bx - ax, by - ay
+        length = np.maximum(np.hypot(ex, ey), 1e-6)
+        outside = sign * (ey * (xs - ax) - ex * (ys - ay)) / length
+        distance = outside if distance is None else np.maximum(distance, outside)
+    if antialias:
+        # pygame fills the pixels the edges pass through; keep those solid
+        distance = distance - 0.5
+    return edge_coverage(distance, antialias) * (area != 0)
+
+
+def lid(xs, ys, cyclops, single, pair, antialias):
+    """Lid triangles, only evaluating the variants some face actually needs"""
+    if not np.any(cyclops):
+        return triangle(xs, ys, *single, antialias)
+    both = union(triangle(xs, ys, *pair[0], antialias), triangle(xs, ys, *pair[1], antialias))
+    if np.all(cyclops):
+        return both
+    return np.where(cyclops, both, triangle(xs, ys, *single, antialias))
+
+
+def eye_coverage(xs, ys, x, y, width, height, radius, height_default, left, cyclops,
+                 tired_height, angry_height, happy_offset, antialias=True):
+    """Coverage of one eye, mirroring emotions.compose_eye"""
+    coverage = rounded_rect(xs, ys, x, y, width, height, radius, antialias)
+    top = y - 1
+    middle = x + width // 2
+    right = x + width
+
+    # Tired lids slope down towards the outer corner, angry ones towards the
+    # inner corner; a cyclops eye gets one lid per half
+    if np.any(tired_height > 0):
+        apex = top + tired_height
+        outer_x = np.where(left, x, right)
+        tired = lid(xs, ys, cyclops, (x, top, right, top, outer_x, apex),
+                    ((x, top, middle, top, x, apex), (middle, top, right, top, right, apex)), antialias)
+        coverage = coverage * (1 - tired * (tired_height > 0))
+    if np.any(angry_height > 0):
+        apex = top + angry_height
+        inner_x = np.where(left, right, x)
+        angry = lid(xs, ys, cyclops, (x, top, right, top, inner_x, apex),
+                    ((x, top, middle, top, middle, apex), (middle, top, right, top, middle, apex)), antialias)
+        coverage = coverage * (1 - angry * (angry_height > 0))
+    if np.any(happy_offset > 0):
+        happy = rounded_rect(xs, ys, x - 1, y + height - happy_offset + 1, width + 2, height_default,
+                             radius, antialias)
+        coverage = coverage * (1 - happy * (happy_offset > 0))
+    return coverage
+
+
+def clipped_grid(canvas_width, canvas_height, x, y, width, height):
+    """Pixel grid of a rect clipped to the canvas, and the clipped (x0, y0, x1, y1), or None"""
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + width, canvas_width), min(y + height, canvas_height)
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return pixel_grid(y1 - y0, x1 - x0, x0, y0), (x0, y0, x1, y1)
+
+
+def face_coverage(state, height, width, drops=None, drop_radius=16, antialias=True):
+    """
+    Coverage of a whole face: (h, w) for a RoboEyes instance, (faces, h, w)
+    for a BatchRoboEyes. drops is an (x, y, width, height) tuple of sweat
+    drop arrays, drawn where state.sweat is set.
+    """
+    xs, ys = pixel_grid(height, width)
+    get = lambda name: param(getattr(state, name))
+    h_flicker, v_flicker = get("h_flicker_offset"), get("v_flicker_offset")
+    left = eye_coverage(xs, ys, get("eye_l_x") + h_flicker, get("eye_l_y") + v_flicker,
+                        get("eye_l_width_current"), get("eye_l_height_current"),
+                        get("eye_l_border_radius_current"), get("eye_l_height_default"), True,
+                        get("cyclops"), get("eyelids_tired_height"), get("eyelids_angry_height"),
+                        get("eyelids_happy_bottom_offset"), antialias)
+    right = eye_coverage(xs, ys, get("eye_r_x") + h_flicker, get("eye_r_y") + v_flicker,
+                         get("eye_r_width_current"), get("eye_r_height_current"),
+                         get("eye_r_border_radius_current"), get("eye_r_height_default"), False,
+                         get("cyclops"), get("eyelids_tired_height"), get("eyelids_angry_height"),
+                         get("eyelids_happy_bottom_offset"), antialias)
+    coverage = union(left, right * (1 - get("cyclops")))
+
+    if drops is not None:
+        # Drops are drawn at truncated integer positions like ParticleEmitter.rects()
+        x, y, drop_width, drop_height = (np.trunc(param(column)) for column in drops)
+        drop = rounded_rect(xs, ys, x, y, np.maximum(1, drop_width), np.maximum(1, drop_height),
+                            np.float32(drop_radius), antialias)
+        drop = 1 - np.prod(1 - drop, axis=-3)
+        coverage = union(coverage, drop * get("sweat"))
+    return coverage
+
+
+def render_eyes(eyes, antialias=True):
+    """
+    Coverage of a RoboEyes instance's current state, sweat included. Each
+    shape is only evaluated inside its own box, unlike face_coverage.
+    """
+    width, height = eyes.screen_width, eyes.screen_height
+    coverage = np.zeros((height, width), dtype=np.float32)
+
+    def paint(rect, shape):
+        box = clipped_grid(width, height, *rect)
+        if box is not None:
+            (xs, ys), (x0, y0, x1, y1) = box
+            region = coverage[y0:y1, x0:x1]
+            region[:] = union(region, shape(xs, ys))
+
+    eye_l_x, eye_l_y, eye_r_x, eye_r_y = eyes.get_draw_positions()
+    for left, x, y in ((True, eye_l_x, eye_l_y), (False, eye_r_x, eye_r_y)):
+        if not left and eyes.cyclops:
+            continue
+        geometry = eyes.get_eye_geometry(left)
+        eyelids = (eyes.eyelids_tired_height, eyes.eyelids_angry_height, eyes.eyelids_happy_bottom_offset)
+        paint((x, y) + geometry[:2], lambda xs, ys: eye_coverage(
+            xs, ys, *(param(value) for value in (x, y) + geometry + (left, eyes.cyclops) + eyelids), antialias))
+
+    if eyes.sweat:
+        drops = eyes.sweat_drops
+        for rect in zip(*(column.tolist() for column in drops.rects())):
+            paint(rect, lambda xs, ys: rounded_rect(
+                xs, ys, *(param(value) for value in rect + (drops.border_radius,)), antialias))
+    return coverage
+
+
+def shade(coverage, main_color, bg_color):
+    """(..., 3) uint8 image blending bg_color to main_color by coverage"""
+    main = np.asarray(main_color, dtype=np.float32)
+    bg = np.asarray(bg_color, dtype=np.float32)
+    return (bg + coverage[..., None] * (main - bg) + 0.5).astype(np.uint8)
+
+
+def to_rgb565(image):
+    """(..., 3) uint8 image to RGB565 values"""
+    image = image.astype(np.uint16)
+    return (image[..., 0] >> 3) << 11 | (image[..., 1] >> 2) << 5 | image[..., 2] >> 3
+
+
+def to_mono(coverage, threshold=0.5):
+    """Lit pixels of a coverage array, e.g. for 1-bpp panels"""
+    return coverage >= threshold
+
+
+class NumpyBackend:
+    """Eye renderer for RoboEyes.set_backend using the rasterizer above"""
+    def __init__(self, antialias=True):
+        self.antialias = antialias
+
+    def compose_eye(self, surface, x, y, width, height, radius, height_default, left, cyclops,
+                    tired_height, angry_height, happy_offset, main_color, bg_color):
+        # Only drawing into surfaces needs pygame; the functions above do not
+        import pygame
+
+        box = clipped_grid(*surface.get_size(), x, y, width, height)
+        if box is None:
+            return
+        (xs, ys), (x0, y0, x1, y1) = box
+        coverage = eye_coverage(xs, ys, *(param(value) for value in (
+            x, y, width, height, radius, height_default, left, cyclops,
+            tired_height, angry_height, happy_offset)), self.antialias)
+
+        # Blend over what is already there, like the pygame primitives paint over it
+        pixels = pygame.surfarray.pixels3d(surface)
+        region = pixels[x0:x1, y0:y1]
+        alpha = coverage.T[..., None]
+        region[:] = (region * (1 - alpha) + np.asarray(main_color, dtype=np.float32) * alpha + 0.5).astype(np.uint8)
+        del region, pixels
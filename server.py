@@ -0,0 +1,202 @@
+"""
+Asyncio command server for driving RoboEyes from other processes.
+
+The server runs its own event loop on a background thread and accepts
+newline-delimited JSON over localhost TCP or a Unix socket. Each line is
+one command or a batch of commands, and clients may pipeline as many lines
+as they like; every line is answered with {"ok": true} or an error:
+
+    ["set_mood", "HAPPY"]
+    [["set_position", "NE"], ["blink"], ["set_sweat", true]]
+
+Commands are queued in a bounded queue and applied by the render loop
+between frames with apply_pending(). When the queue is full the server stops
+reading from clients, so a flood of commands turns into socket backpressure
+instead of growing latency.
+
+    python server.py --tcp 127.0.0.1:8765
+    python server.py --unix /tmp/roboeyes.sock
+"""
+import argparse
+import asyncio
+import json
+import os
+import queue
+import sys
+import threading
+
+import pygame
+
+from emotions import RoboEyes, parse_command
+
+
+def parse_line(line):
+    """Commands in one request line as a list of (method, args)"""
+    try:
+        data = json.loads(line)
+    except json.JSONDecodeError as exc:
+        raise ValueError("invalid JSON: %s" % exc) from None
+    if not isinstance(data, list) or not data:
+        raise ValueError("expected a command list such as [\"blink\"]")
+    batch = [data] if isinstance(data[0], str) else data
+    commands = []
+    for command in batch:
+        if not isinstance(command, list) or not command or not isinstance(command[0], str):
+            raise ValueError("invalid command: %r" % (command,))
+        commands.append(parse_command(command[0], command[1:]))
+    return commands
+
+
+class CommandServer:
+    def __init__(self, eyes, host="127.0.0.1", port=8765, path=None, max_pending=1024):
+        self.eyes = eyes
+        self.host = host
+        self.port = port
+        self.path = path
+        self.pending = queue.Queue(max_pending)
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.clients = set()
+        self.ready = threading.Event()
+        self.error = None
+        self.failed = 0
+
+    def start(self):
+        """Start serving on a background thread, returns once the socket is listening"""
+        self.thread = threading.Thread(target=self.run_loop, name="roboeyes-server", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def run_loop(self):
+        try:
+            asyncio.run(self.serve())
+        except Exception as exc:
+            self.error = exc
+            self.ready.set()
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        if self.path is not None:
+            self.server = await asyncio.start_unix_server(self.handle_client, self.path)
+        else:
+            self.server = await asyncio.start_server(self.handle_client, self.host, self.port)
+            self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        async with self.server:
+            try:
+                await self.server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    async def handle_client(self, reader, writer):
+        task = asyncio.current_task()
+        self.clients.add(task)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    commands = parse_line(line)
+                except ValueError as exc:
+                    writer.write((json.dumps({"ok": False, "error": str(exc)}) + "\n").encode())
+                else:
+                    for command in commands:
+                        await self.enqueue(command)
+                    self.eyes.wake()
+                    writer.write(b'{"ok": true}\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # Client went away, or stop() is closing the connection
+            pass
+        finally:
+            self.clients.discard(task)
+            writer.close()
+
+    async def enqueue(self, command):
+        while True:
+            try:
+                self.pending.put_nowait(command)
+                return
+            except queue.Full:
+                # Render loop is behind: hold this client until a frame drains the queue
+                await asyncio.sleep(0.002)
+
+    def apply_pending(self):
+        """
+        Apply every queued command to the eyes; call between frames. A
+        command that fails is reported on stderr and counted in failed,
+        and the rest are still applied. Returns the number applied.
+        """
+        applied = 0
+        while True:
+            try:
+                method, args = self.pending.get_nowait()
+            except queue.Empty:
+                return applied
+            try:
+                getattr(self.eyes, method)(*args)
+            except Exception as exc:
+                self.failed += 1
+                print("RoboEyes command %s%r failed: %r" % (method, args, exc), file=sys.stderr)
+                continue
+            applied += 1
+
+    async def shutdown(self):
+        clients = list(self.clients)
+        for task in clients:
+            task.cancel()
+        await asyncio.gather(*clients, return_exceptions=True)
+        # Last, as it ends serve() and with it the loop
+        self.server.close()
+
+    def stop(self):
+        """Close the socket and every client connection, then end the server thread"""
+        if self.loop is not None and self.server is not None and self.thread.is_alive():
+            asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result(timeout=2)
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+        if self.path is not None and os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show RoboEyes and accept commands over a socket")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--tcp", default="127.0.0.1:8765", metavar="HOST:PORT")
+    group.add_argument("--unix", metavar="PATH")
+    parser.add_argument("--size", default="1024x512", metavar="WxH")
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    eyes = RoboEyes(width, height)
+    eyes.open()
+    eyes.set_autoblinker(True, 2, 3)
+    if args.unix:
+        server = CommandServer(eyes, path=args.unix)
+    else:
+        host, port = args.tcp.rsplit(":", 1)
+        server = CommandServer(eyes, host, int(port))
+    server.start()
+    print("RoboEyes command server listening on %s" % (args.unix or "%s:%d" % (server.host, server.port)))
+
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                running = False
+        server.apply_pending()
+        eyes.draw_eyes()
+
+    server.stop()
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Shared-memory frame ring so other processes can read RoboEyes frames
+without serialization.
+
+SharedFrameWriter owns a multiprocessing.shared_memory block holding a small
+header and a ring of frame slots. Each slot has its own header with a
+sequence number, timestamp and dirty rect, followed by the raw pixels. The
+writer publishes with a sequence lock: the slot's begin counter is bumped
+before the pixels are copied and its end counter after, so a reader that
+sees both equal knows the frame was not overwritten mid-read.
+
+    writer = SharedFrameWriter(1024, 512)                   # renderer process
+    eyes.outputs.append(writer)
+
+    reader = SharedFrameReader(writer.name)                 # any other process
+    frame = reader.read()                                   # copy, always consistent
+    frame = reader.read(copy=False)                         # zero-copy view...
+    if reader.is_current(frame): use(frame.pixels)          # ...valid while unchanged
+
+Pixels are stored as 4 bytes per pixel in the order named by the header
+format field (b"BGRX" for standard 32-bit pygame surfaces).
+"""
+import struct
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pygame
+
+MAGIC = b"REFB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHHH4sQ")
+HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct("<QQdiiii")
+SLOT_HEADER_SIZE = 64
+LATEST_OFFSET = struct.calcsize("<4sHHHH4s")
+STANDARD_MASKS = (0xFF0000, 0xFF00, 0xFF)
+
+Frame = namedtuple("Frame", "seq timestamp_ms dirty_rect pixels slot")
+
+
+def attach(name):
+    """
+    Open an existing block without registering it with this process's
+    resource tracker, which would otherwise unlink it when a reader exits.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track argument
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def slot_offset(slot, frame_bytes):
+    return HEADER_SIZE + slot * (SLOT_HEADER_SIZE + frame_bytes)
+
+
+class SharedFrameWriter:
+    def __init__(self, width, height, slots=3, name=None):
+        self.width = width
+        self.height = height
+        self.slots = slots
+        self.frame_bytes = width * height * 4
+        size = slot_offset(slots, self.frame_bytes)
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = self.shm.name
+        self.seq = 0
+        HEADER.pack_into(self.shm.buf, 0, MAGIC, VERSION, slots, width, height, b"BGRX", 0)
+        self.pixels = [
+            np.ndarray((height, width), dtype=np.uint32, buffer=self.shm.buf,
+                       offset=slot_offset(slot, self.frame_bytes) + SLOT_HEADER_SIZE)
+            for slot in range(slots)
+        ]
+
+    def __call__(self, surface, dirty_rects=None, time_ms=0):
+        """RoboEyes output hook: publish surface with its frame time and dirty rects"""
+        dirty_rect = None
+        if dirty_rects:
+            dirty_rect = dirty_rects[0].unionall(dirty_rects[1:])
+        self.write(surface, float(time_ms), dirty_rect)
+
+    def write(self, surface, timestamp_ms=0.0, dirty_rect=None):
+        """Copy surface into the next slot and publish it, returns its sequence number"""
+        seq = self.seq + 1
+        slot = seq % self.slots
+        offset = slot_offset(slot, self.frame_bytes)
+        buf = self.shm.buf
+        if dirty_rect is None:
+            dirty_rect = (0, 0, self.width, self.height)
+
+        # begin != end marks the slot as being written
+        struct.pack_into("<Q", buf, offset, seq)
+        if surface.get_bitsize() == 32 and surface.get_masks()[:3] == STANDARD_MASKS:
+            pixels = pygame.surfarray.pixels2d(surface)
+            self.pixels[slot][:] = pixels.T
+            del pixels
+        else:
+            buf[offset + SLOT_HEADER_SIZE:offset + SLOT_HEADER_SIZE + self.frame_bytes] = \
+                pygame.image.tobytes(surface, "BGRA")
+        SLOT_HEADER.pack_into(buf, offset, seq, seq, timestamp_ms, *dirty_rect)
+        struct.pack_into("<Q", buf, LATEST_OFFSET, seq)
+        self.seq = seq
+        return seq
+
+    def close(self, unlink=True):
+        self.pixels = []
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+class SharedFrameReader:
+    def __init__(self, name):
+        self.shm = attach(name)
+        magic, version, slots, width, height, pixel_format, _ = HEADER.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%r is not a RoboEyes frame ring" % (name,))
+        self.slots = slots
+        self.width = width
+        self.height = height
+        self.pixel_format = pixel_format
+        self.frame_bytes = width * height * 4
+        self.pixels = [
+            np.ndarray((height, width, 4), dtype=np.uint8, buffer=self.shm.buf,
+                       offset=slot_offset(slot, self.frame_bytes) + SLOT_HEADER_SIZE)
+            for slot in range(slots)
+        ]
+
+    def latest_seq(self):
+        return struct.unpack_from("<Q", self.shm.buf, LATEST_OFFSET)[0]
+
+    def slot_header(self, slot):
+        return SLOT_HEADER.unpack_from(self.shm.buf, slot_offset(slot, self.frame_bytes))
+
+    def read(self, copy=True):
+        """
+        Latest frame, or None if nothing was published yet or the slot was
+        overwritten while copying. With copy=False the pixels are a view
+        into shared memory; check is_current(frame) after using them.
+        """
+        seq = self.latest_seq()
+        if seq == 0:
+            return None
+        slot = seq % self.slots
+        begin, end, timestamp_ms, x, y, w, h = self.slot_header(slot)
+        if begin != end or end != seq:
+            return None
+        pixels = self.pixels[slot].copy() if copy else self.pixels[slot]
+        frame = Frame(seq, timestamp_ms, (x, y, w, h), pixels, slot)
+        if copy and not self.is_current(frame):
+            return None
+        return frame
+
+    def is_current(self, frame):
+        """True while the frame's slot has not been reused by the writer"""
+        begin, end = struct.unpack_from("<QQ", self.shm.buf, slot_offset(frame.slot, self.frame_bytes))
+        return begin == end == frame.seq
+
+    def close(self):
+        self.pixels = []
+        self.shm.close()
@@ -0,0 +1,57 @@
+from collections import OrderedDict
+
+
+class SpriteCache:
+    """
+    LRU cache of pre-rendered pygame surfaces, bounded by entry count and
+    by the total pixel memory of the cached surfaces.
+    """
+    def __init__(self, max_entries=256, max_bytes=16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, build):
+        """Return the cached surface for key, calling build() to create it on a miss"""
+        sprite = self.entries.get(key)
+        if sprite is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return sprite
+
+        self.misses += 1
+        sprite = build()
+        size = self.surface_bytes(sprite)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return sprite
+
+        self.entries[key] = sprite
+        self.bytes_used += size
+        while len(self.entries) > self.max_entries or self.bytes_used > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes_used -= self.surface_bytes(evicted)
+            self.evictions += 1
+        return sprite
+
+    @staticmethod
+    def surface_bytes(surface):
+        return surface.get_pitch() * surface.get_height()
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes_used = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes_used,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
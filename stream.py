@@ -0,0 +1,179 @@
+"""
+Delta frame encoding for streaming RoboEyes to remote displays.
+
+DeltaEncoder compares each frame with the previous one in 16x16 tiles and
+emits only the changed tiles, every tile run-length encoded. Every
+keyframe_interval frames (and on the first frame) a keyframe containing all
+tiles is sent instead, so a display that joins late or drops a packet
+recovers. DeltaDecoder is plain Python with no dependencies so it is easy to
+port to the display side.
+
+Packet layout, all integers little endian:
+
+    header   "RE" u8 version u8 flags(1 = keyframe) u16 width u16 height
+             u8 tile_size u32 frame_number u16 tile_count
+    tile     u16 tile_x u16 tile_y u32 run_count
+             run_count * (u16 length, u8 r, u8 g, u8 b)
+
+Pixels inside a tile are run-length encoded in row-major order; tiles on the
+right and bottom edges are cropped to the frame. The eyes are
+mostly flat MAIN_COLOR on BG_COLOR, so a tile is usually a handful of runs.
+
+    encoder = DeltaEncoder(1024, 512)
+    eyes.outputs.append(lambda surface, dirty_rects, time_ms: sock.sendall(frame_packet(encoder.encode(surface))))
+"""
+import struct
+
+import numpy as np
+import pygame
+
+MAGIC = b"RE"
+VERSION = 1
+FLAG_KEYFRAME = 1
+HEADER = struct.Struct("<2sBBHHBIH")
+TILE = struct.Struct("<HHI")
+RUN = struct.Struct("<HBBB")
+RUN_DTYPE = np.dtype([("length", "<u2"), ("r", "u1"), ("g", "u1"), ("b", "u1")])
+LENGTH = struct.Struct("<I")
+
+
+def frame_packet(data):
+    """Prefix an encoded frame with its u32 length for stream transports"""
+    return LENGTH.pack(len(data)) + data
+
+
+class DeltaEncoder:
+    def __init__(self, width, height, tile_size=16, keyframe_interval=100):
+        if not 0 < tile_size < 256:
+            raise ValueError("tile_size must be between 1 and 255")
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.keyframe_interval = keyframe_interval
+        self.tiles_x = -(-width // tile_size)
+        self.tiles_y = -(-height // tile_size)
+        self.previous = None
+        self.frame_number = 0
+        self.bytes_raw = 0
+        self.bytes_encoded = 0
+
+        # Frame padded to whole tiles, and which padded pixels are real
+        self.padded = np.zeros((self.tiles_y * tile_size, self.tiles_x * tile_size), dtype=np.uint32)
+        valid = np.zeros(self.padded.shape, dtype=bool)
+        valid[:height, :width] = True
+        self.valid = self.tile_view(valid)
+
+    def tile_view(self, array):
+        """(tiles_y * tiles_x, size * size) view of a padded (h, w) array, one row per tile"""
+        size = self.tile_size
+        return (array.reshape(self.tiles_y, size, self.tiles_x, size)
+                .transpose(0, 2, 1, 3).reshape(self.tiles_y * self.tiles_x, size * size))
+
+    def request_keyframe(self):
+        """Make the next frame a keyframe, e.g. when a new display connects"""
+        self.previous = None
+
+    def encode(self, surface):
+        """Encode surface (or an (h, w, 3) uint8 array) and return the packet bytes"""
+        if isinstance(surface, np.ndarray):
+            frame = surface
+        else:
+            frame = pygame.surfarray.pixels3d(surface).swapaxes(0, 1)
+        padded = self.padded
+        padded[:self.height, :self.width] = (frame[:, :, 0].astype(np.uint32) << 16
+                                             | frame[:, :, 1].astype(np.uint32) << 8
+                                             | frame[:, :, 2])
+        del frame
+        tiles = self.tile_view(padded)
+
+        keyframe = (self.previous is None
+                    or self.keyframe_interval and self.frame_number % self.keyframe_interval == 0)
+        if keyframe:
+            selected = np.arange(len(tiles))
+        else:
+            selected = np.flatnonzero((tiles != self.previous).any(axis=1))
+
+        # Run-length encode the real pixels of all selected tiles at once;
+        # a run never crosses a tile boundary
+        valid = self.valid[selected]
+        values = tiles[selected][valid]
+        tile_of_pixel = np.repeat(np.arange(len(selected)), valid.sum(axis=1))
+        starts = np.ones(len(values), dtype=bool)
+        starts[1:] = (values[1:] != values[:-1]) | (tile_of_pixel[1:] != tile_of_pixel[:-1])
+        start_index = np.flatnonzero(starts)
+        runs = np.empty(len(start_index), dtype=RUN_DTYPE)
+        runs["length"] = np.diff(np.append(start_index, len(values)))
+        run_values = values[start_index]
+        runs["r"] = run_values >> 16
+        runs["g"] = run_values >> 8
+        runs["b"] = run_values
+        run_counts = np.bincount(tile_of_pixel[start_index], minlength=len(selected))
+        run_bytes = runs.tobytes()
+
+        body = bytearray()
+        offset = 0
+        for tile, run_count in zip(selected.tolist(), run_counts.tolist()):
+            ty, tx = divmod(tile, self.tiles_x)
+            body += TILE.pack(tx, ty, run_count)
+            end = offset + run_count * RUN.size
+            body += run_bytes[offset:end]
+            offset = end
+
+        header = HEADER.pack(MAGIC, VERSION, FLAG_KEYFRAME if keyframe else 0,
+                             self.width, self.height, self.tile_size, self.frame_number, len(selected))
+        self.previous = tiles.copy()
+        self.frame_number += 1
+        self.bytes_raw += self.width * self.height * 3
+        self.bytes_encoded += len(header) + len(body)
+        return header + bytes(body)
+
+    def compression_ratio(self):
+        return self.bytes_raw / self.bytes_encoded if self.bytes_encoded else 0.0
+
+
+class DeltaDecoder:
+    """Reference decoder keeping the frame as a bytearray of packed RGB rows"""
+    def __init__(self):
+        self.width = 0
+        self.height = 0
+        self.frame = bytearray()
+        self.frame_number = -1
+        self.synced = False
+
+    def decode(self, data):
+        """Apply one packet; returns True once the frame is valid (a keyframe was seen)"""
+        magic, version, flags, width, height, size, frame_number, tile_count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a RoboEyes delta packet")
+        keyframe = bool(flags & FLAG_KEYFRAME)
+        if keyframe and (width, height) != (self.width, self.height):
+            self.width, self.height = width, height
+            self.frame = bytearray(width * height * 3)
+        if keyframe:
+            self.synced = True
+        elif not self.synced or frame_number != self.frame_number + 1:
+            # Missed a packet: wait for the next keyframe
+            self.synced = False
+            return False
+        self.frame_number = frame_number
+
+        offset = HEADER.size
+        for _ in range(tile_count):
+            tx, ty, run_count = TILE.unpack_from(data, offset)
+            offset += TILE.size
+            x0, y0 = tx * size, ty * size
+            tile_w = min(size, width - x0)
+            pixel = 0
+            for _ in range(run_count):
+                length, r, g, b = RUN.unpack_from(data, offset)
+                offset += RUN.size
+                color = bytes((r, g, b))
+                while length:
+                    # Runs follow the tile rows, which are tile_w pixels wide
+                    row, column = divmod(pixel, tile_w)
+                    span = min(length, tile_w - column)
+                    start = ((y0 + row) * width + x0 + column) * 3
+                    self.frame[start:start + span * 3] = color * span
+                    pixel += span
+                    length -= span
+        return True
@@ -0,0 +1,68 @@
+import numpy as np
+import pygame
+
+from batch import SWEAT_DROPS, BatchRoboEyes
+from emotions import Mood, Position, RoboEyes, SimulatedClock
+
+WIDTH, HEIGHT, COUNT, SEED = 128, 64, 4, 3
+# (frame, face, command, args): no autoblinker or idle mode, whose random
+# timers come from a different generator in each engine
+SCRIPT = [
+    (10, 1, "set_mood", (Mood.HAPPY,)), (20, 2, "set_position", (Position.NE,)),
+    (30, 3, "anim_laugh", ()), (40, 0, "set_cyclops", (True,)),
+    (50, 2, "set_mood", (Mood.ANGRY,)), (60, 1, "anim_confused", ()),
+    (70, 2, "set_curiosity", (True,)), (70, 2, "set_position", (Position.W,)),
+    (80, 0, "blink", ()), (90, 3, "set_mood", (Mood.TIRED,)),
+    # Drops only respawn, from each engine's own generator, after the end
+    (100, 1, "set_sweat", (True,)),
+]
+
+
+def run(frames=200):
+    """Yields the batch and the matching single faces after every frame"""
+    clock = SimulatedClock()
+    batch = BatchRoboEyes(COUNT, WIDTH, HEIGHT, columns=2, seed=SEED)
+    faces = [RoboEyes(WIDTH, HEIGHT, headless=True, seed=SEED, time_source=clock) for _ in range(COUNT)]
+    batch.open()
+    for eyes in faces:
+        eyes.open()
+    for frame in range(frames):
+        for when, face, command, args in SCRIPT:
+            if when == frame:
+                getattr(batch, command)(*args, faces=face)
+                getattr(faces[face], command)(*args)
+        clock.advance(20)
+        batch.update(clock.now_ms)
+        for eyes in faces:
+            eyes.update(clock.now_ms)
+        yield frame, batch, faces
+
+
+def tile(batch, array, index):
+    rect = batch.face_rect(index)
+    return array[rect.top:rect.bottom, rect.left:rect.right]
+
+
+def test_render_matches_independent_faces():
+    for frame, batch, faces in run():
+        atlas = batch.render()
+        for i, eyes in enumerate(faces):
+            expected = pygame.image.tobytes(eyes.render(pygame.Surface((WIDTH, HEIGHT))), "RGB")
+            assert pygame.image.tobytes(atlas.subsurface(batch.face_rect(i)), "RGB") == expected, (frame, i)
+    # Faces that never sweated kept their drops where they started
+    ys = batch.sweat_drops.y.reshape(COUNT, SWEAT_DROPS)
+    assert (ys[[0, 2, 3]] == batch.sweat_drops.spawn_y).all() and (ys[1] > batch.sweat_drops.spawn_y).all()
+
+
+def test_render_array_matches_render():
+    # pygame draws the rounded corners with a midpoint circle that leaves out
+    # a few pixels the rasterizer's exact circle covers, up to five per
+    # corner of each eye and drop at these sizes
+    tolerance = 5 * 4 * (2 + SWEAT_DROPS)
+    for frame, batch, faces in run():
+        rendered = pygame.surfarray.array3d(batch.render()).swapaxes(0, 1)
+        array = batch.render_array(antialias=False)
+        for i in range(COUNT):
+            differing = np.any(tile(batch, array, i) != tile(batch, rendered, i), axis=-1)
+            assert np.count_nonzero(differing) <= tolerance, (frame, i)
+    assert array.shape == rendered.shape
@@ -0,0 +1,57 @@
+import gc
+
+import pygame
+import pytest
+
+import cliplib
+from emotions import RoboEyes
+from timeline import Timeline, TimelinePlayer, frame_time_ms
+
+WIDTH, HEIGHT, FPS = 256, 128, 50
+CLIP = ([[cliplib.WARMUP_MS, "anim_laugh"]], 300)
+
+
+@pytest.fixture
+def library(tmp_path):
+    path = tmp_path / "test.clips"
+    cliplib.build_library(str(path), WIDTH, HEIGHT, FPS, seed=2, timelines={"laugh": CLIP})
+    library = cliplib.ClipLibrary(str(path))
+    yield library
+    library.close()
+
+
+def live_frames(seed=2):
+    """The clip's frames as draw_eyes-style live rendering produces them"""
+    commands, duration_ms = CLIP
+    timeline = Timeline(cliplib.WARMUP_MS + duration_ms, [[0, "open"]] + commands)
+    eyes = RoboEyes(WIDTH, HEIGHT, headless=True, seed=seed)
+    player = TimelinePlayer(timeline, eyes)
+    frames = []
+    for frame in range(timeline.frame_count(FPS)):
+        player.advance(frame_time_ms(frame, FPS))
+        if frame >= cliplib.WARMUP_MS * FPS // 1000:
+            frames.append(pygame.image.tobytes(eyes.render(pygame.Surface((WIDTH, HEIGHT))), "RGB"))
+    return frames
+
+
+def test_playback_matches_live_rendering(library):
+    eyes = RoboEyes(WIDTH, HEIGHT, headless=True)
+    player = cliplib.LibraryPlayer(library, eyes)
+    player.play("laugh", 0)
+    shown = []
+    for frame in range(library.frame_count("laugh")):
+        assert player.show(frame * 1000 // FPS)
+        shown.append(pygame.image.tobytes(eyes.screen, "RGB"))
+    assert shown == live_frames()
+    assert not player.show(library.duration_ms("laugh"))
+
+
+def test_close_with_live_patch_surfaces(library):
+    rect, surface = library.frame_patches("laugh", 0)[-1]
+    row = library.state("laugh", 0)
+    library.close()
+    # The surfaces keep the mapping alive until they are gone
+    surface.set_palette(cliplib.palette((255, 255, 255), (0, 0, 0)))
+    pygame.Surface(rect.size).blit(surface, (0, 0))
+    del rect, surface, row
+    gc.collect()
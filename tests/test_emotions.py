@@ -0,0 +1,106 @@
+import threading
+import time
+
+import pygame
+
+from emotions import Mood, RoboEyes, SimulatedClock
+
+
+def settled_eyes():
+    clock = SimulatedClock()
+    eyes = RoboEyes(320, 160, headless=True, seed=1, time_source=clock)
+    eyes.open()
+    for _ in range(100):
+        clock.advance(20)
+        eyes.draw_eyes()
+    assert eyes.is_at_rest() and eyes.rest_frame_drawn
+    return eyes, clock
+
+
+def full_render(eyes):
+    surface = pygame.Surface(eyes.screen.get_size())
+    eyes.render(surface)
+    return pygame.image.tobytes(surface, "RGB")
+
+
+def test_wait_for_event_returns_when_timer_is_due():
+    clock = SimulatedClock(1000)
+    eyes = RoboEyes(320, 160, seed=1, time_source=clock)
+    # Unblocks a wait that would otherwise never end
+    rescue = threading.Timer(2.0, lambda: pygame.event.post(pygame.event.Event(pygame.USEREVENT)))
+    rescue.start()
+    try:
+        for until_ms in (clock() - 10, clock()):
+            start = time.monotonic()
+            eyes.wait_for_event(until_ms)
+            assert time.monotonic() - start < 1.0
+    finally:
+        rescue.cancel()
+        pygame.event.clear()
+
+
+def test_rest_frame_redrawn_after_state_change():
+    eyes, clock = settled_eyes()
+    for change in (lambda: eyes.set_cyclops(True), lambda: setattr(eyes, "MAIN_COLOR", (255, 0, 0))):
+        change()
+        clock.advance(20)
+        eyes.draw_eyes()
+        assert pygame.image.tobytes(eyes.screen, "RGB") == full_render(eyes)
+
+
+def test_settled_frames_skip_drawing():
+    eyes, clock = settled_eyes()
+    eyes.screen.fill((1, 2, 3))
+    clock.advance(20)
+    eyes.draw_eyes()
+    # Nothing changed, so the frame was not drawn again
+    assert eyes.screen.get_at((0, 0))[:3] == (1, 2, 3)
+
+
+def run_frames(eyes, clock, count):
+    frames = []
+    for _ in range(count):
+        clock.advance(20)
+        eyes.draw_eyes()
+        frames.append(pygame.image.tobytes(eyes.screen, "RGB"))
+    return frames
+
+
+def test_restore_and_clone_replay_the_same_frames():
+    clock = SimulatedClock()
+    eyes = RoboEyes(320, 160, headless=True, seed=5, time_source=clock)
+    eyes.open()
+    eyes.set_autoblinker(True, 1, 1)
+    eyes.set_idle_mode(True, 1, 1)
+    eyes.set_sweat(True)
+    run_frames(eyes, clock, 50)
+    snapshot, start = eyes.snapshot(), clock()
+    first = run_frames(eyes, clock, 200)
+    assert len(set(first)) > 20
+    clock.now_ms = start
+    eyes.restore(snapshot)
+    other = eyes.clone()
+    assert run_frames(eyes, clock, 200) == first
+    clock.now_ms = start
+    assert run_frames(other, clock, 200) == first
+
+
+def test_dirty_rect_frames_match_full_redraws():
+    clock = SimulatedClock()
+    eyes = RoboEyes(320, 160, headless=True, seed=3, time_source=clock)
+    eyes.open()
+    eyes.set_autoblinker(True, 1, 1)
+    eyes.set_idle_mode(True, 1, 1)
+    script = {20: lambda: eyes.set_mood(Mood.HAPPY), 60: eyes.anim_laugh, 90: lambda: eyes.set_sweat(True),
+              140: lambda: eyes.set_mood(Mood.ANGRY), 170: eyes.anim_confused, 200: lambda: eyes.set_cyclops(True)}
+    partial = 0
+    for frame in range(250):
+        if frame in script:
+            script[frame]()
+        clock.advance(20)
+        eyes.draw_eyes()
+        assert pygame.image.tobytes(eyes.screen, "RGB") == full_render(eyes), frame
+        area = sum(rect.width * rect.height for rect in eyes.dirty_rects)
+        partial += 0 < area < 320 * 160
+    # Most frames only touch part of the screen
+    assert partial > 100
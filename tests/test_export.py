@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from export import export
+from timeline import Timeline
+
+TIMELINE = {
+    "duration_ms": 2000,
+    "commands": [[0, "open"], [0, "set_autoblinker", True, 1, 1], [300, "set_sweat", True],
+                 [700, "anim_laugh"], [1200, "set_mood", "ANGRY"], [1500, "set_position", "NE"]],
+}
+
+
+def raw_frames(path, width, height):
+    with open(path, "rb") as f:
+        return np.frombuffer(f.read(), dtype=np.uint8).reshape(-1, height, width, 3)
+
+
+def test_segments_match_serial_render(tmp_path):
+    timeline = Timeline.from_dict(TIMELINE)
+    export(timeline, str(tmp_path / "serial.rgb"), "raw", 64, 32, seed=5, workers=1, segment_frames=1000)
+    export(timeline, str(tmp_path / "segments.rgb"), "raw", 64, 32, seed=5, workers=2, segment_frames=7)
+    serial = raw_frames(tmp_path / "serial.rgb", 64, 32)
+    assert len(serial) == timeline.frame_count(50)
+    assert np.array_equal(serial, raw_frames(tmp_path / "segments.rgb", 64, 32))
+
+
+def test_gif_matches_raw(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    from PIL import ImageSequence
+
+    timeline = Timeline.from_dict(TIMELINE)
+    export(timeline, str(tmp_path / "out.rgb"), "raw", 64, 32, seed=5, workers=2, segment_frames=9)
+    export(timeline, str(tmp_path / "out.gif"), "gif", 64, 32, seed=5, workers=2, segment_frames=9)
+    raw = raw_frames(tmp_path / "out.rgb", 64, 32)
+    with Image.open(tmp_path / "out.gif") as gif:
+        frames = [np.asarray(frame.convert("RGB")) for frame in ImageSequence.Iterator(gif)]
+    assert len(frames) == len(raw)
+    assert all(np.array_equal(frame, expected) for frame, expected in zip(frames, raw))
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pygame
+import pytest
+
+from framebuffer import FileSink, FramebufferOutput, MonoFramebuffer, RGB565Framebuffer
+from raster import to_rgb565
+
+# Neither a multiple of 8 wide nor high, so the last page is partial
+WIDTH, HEIGHT = 13, 20
+
+
+def surface_from(pixels):
+    """Surface showing a (height, width, 3) uint8 array"""
+    surface = pygame.Surface((pixels.shape[1], pixels.shape[0]))
+    pygame.surfarray.blit_array(surface, pixels.swapaxes(0, 1))
+    return surface
+
+
+def random_pixels(seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+
+
+def test_mono_page_layout():
+    pixels = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    pixels[9, 3] = pixels[0, 12] = pixels[19, 0] = 255
+    data = bytes(MonoFramebuffer(WIDTH, HEIGHT).convert(surface_from(pixels)))
+    assert len(data) == 3 * WIDTH
+    # Byte page * width + x, bit (y % 8): row 9 is bit 1 of page 1
+    expected = bytearray(3 * WIDTH)
+    expected[1 * WIDTH + 3] = 0b10
+    expected[0 * WIDTH + 12] = 0b1
+    expected[2 * WIDTH + 0] = 0b1000
+    assert data == bytes(expected)
+
+
+def test_mono_round_trip():
+    pixels = random_pixels()
+    framebuffer = MonoFramebuffer(WIDTH, HEIGHT, threshold=100)
+    data = np.frombuffer(framebuffer.convert(surface_from(pixels)), dtype=np.uint8).reshape(3, WIDTH)
+    rows = np.unpackbits(data[:, None, :], axis=1, bitorder="little").reshape(3 * 8, WIDTH)
+    assert np.array_equal(rows[:HEIGHT], (pixels > 100).any(axis=-1))
+    assert not rows[HEIGHT:].any()
+
+
+@pytest.mark.parametrize("big_endian", [True, False])
+def test_rgb565_byte_order(big_endian):
+    pixels = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    pixels[0, 0] = (255, 0, 0)
+    pixels[0, 1] = (0, 0, 255)
+    data = bytes(RGB565Framebuffer(WIDTH, HEIGHT, big_endian).convert(surface_from(pixels)))
+    assert len(data) == WIDTH * HEIGHT * 2
+    if big_endian:
+        assert data[:4] == b"\xf8\x00\x00\x1f"
+    else:
+        assert data[:4] == b"\x00\xf8\x1f\x00"
+
+
+@pytest.mark.parametrize("big_endian", [True, False])
+def test_rgb565_round_trip(big_endian):
+    pixels = random_pixels(1)
+    data = RGB565Framebuffer(WIDTH, HEIGHT, big_endian).convert(surface_from(pixels))
+    values = np.frombuffer(data, dtype=">u2" if big_endian else "<u2").reshape(HEIGHT, WIDTH)
+    assert np.array_equal(values, to_rgb565(pixels))
+    # Unpacking restores the top bits of every channel
+    unpacked = np.stack([values >> 11 << 3, (values >> 5 & 0x3F) << 2, (values & 0x1F) << 3], axis=-1)
+    assert np.array_equal(unpacked, pixels & np.array([0xF8, 0xFC, 0xF8]))
+
+
+@pytest.mark.parametrize("rewind", [True, False])
+def test_short_writes_are_continued(tmp_path, monkeypatch, rewind):
+    real_write, real_pwrite = os.write, os.pwrite
+    # A device that never takes more than 5 bytes at a time
+    monkeypatch.setattr(os, "write", lambda fd, data: real_write(fd, data[:5]))
+    monkeypatch.setattr(os, "pwrite", lambda fd, data, offset: real_pwrite(fd, data[:5], offset))
+    path = tmp_path / "fb"
+    sink = FileSink(str(path), rewind=rewind, chunk_size=16)
+    output = FramebufferOutput(RGB565Framebuffer(WIDTH, HEIGHT), sink)
+    surface = surface_from(random_pixels(2))
+    output(surface)
+    output(surface)
+    sink.close()
+    monkeypatch.undo()
+    frame = bytes(output.framebuffer.view)
+    assert path.read_bytes() == (frame if rewind else frame * 2)
@@ -0,0 +1,40 @@
+import pytest
+
+from emotions import RoboEyes, SimulatedClock
+from gaze import GazeStream
+
+
+def test_pushes_between_frames_wake_once():
+    eyes = RoboEyes(320, 160, headless=True, seed=1)
+    wakes = []
+    eyes.wake_hooks.append(lambda: wakes.append(1))
+    gaze = GazeStream(eyes, predict=False)
+    for i in range(50):
+        gaze.push(i / 100, 0.0)
+    assert len(wakes) == 1
+    assert gaze.apply()
+    # Only the newest sample is applied
+    expected = RoboEyes(320, 160, headless=True)
+    expected.set_gaze(0.49, 0.0)
+    assert (eyes.eye_l_x_next, eyes.eye_l_y_next) == (expected.eye_l_x_next, expected.eye_l_y_next)
+    gaze.push(0.5, 0.5)
+    gaze.push(0.6, 0.5)
+    assert len(wakes) == 2
+    assert gaze.coalesced == 50
+
+
+def test_prediction_leads_along_velocity():
+    clock = SimulatedClock()
+    eyes = RoboEyes(320, 160, headless=True, seed=1, time_source=clock)
+    gaze = GazeStream(eyes, lead_ms=20, smoothing=0, time_source=clock)
+    gaze.push(0.0, 0.0)
+    clock.advance(10)
+    gaze.push(0.1, -0.1)
+    assert gaze.target() == pytest.approx((0.3, -0.3))
+    # Never further ahead than max_lead_ms, never outside -1..1
+    clock.advance(1000)
+    assert gaze.target() == pytest.approx((0.9, -0.9))
+    gaze.push(0.1, -0.1)
+    clock.advance(1)
+    gaze.push(0.2, 0.0)
+    assert gaze.target() == (1.0, 1.0)
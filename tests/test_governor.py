@@ -0,0 +1,122 @@
+import pygame
+import pytest
+
+from emotions import Mood, RoboEyes, SimulatedClock
+from governor import QUALITY_LEVELS, QualityGovernor
+
+
+def frame(work_ms, rest=False):
+    phases = {"rest_wait": 0.0} if rest else {"draw": work_ms}
+    return {"phases": phases, "work_ms": work_ms, "missed": False}
+
+
+@pytest.fixture
+def governor():
+    # 50 fps: 20 ms budget, steps down above 17 ms and up below 10 ms
+    eyes = RoboEyes(128, 64, headless=True)
+    return QualityGovernor(eyes, window=30, hold_frames=150)
+
+
+def feed(governor, work_ms, count):
+    for _ in range(count):
+        governor.on_frame(frame(work_ms))
+
+
+def test_steps_down_one_level_per_full_window(governor):
+    feed(governor, 19.0, 29)
+    assert governor.level == 0
+    feed(governor, 19.0, 1)
+    assert governor.level == 1
+    assert governor.quality is QUALITY_LEVELS[1] and governor.eyes.quality is QUALITY_LEVELS[1]
+    feed(governor, 19.0, 30 * 10)
+    assert governor.level == len(QUALITY_LEVELS) - 1
+    assert governor.eyes.quality.name == "half_rate"
+
+
+def test_steps_up_after_holding_with_headroom(governor):
+    governor.set_level(2)
+    feed(governor, 5.0, 149)
+    assert governor.level == 2
+    feed(governor, 5.0, 1)
+    assert governor.level == 1
+
+
+def test_costs_between_the_thresholds_change_nothing(governor):
+    governor.set_level(2)
+    changes = governor.changes
+    for i in range(3000):
+        governor.on_frame(frame(11.0 if i % 2 else 16.5))
+    assert governor.level == 2 and governor.changes == changes
+
+
+def test_failed_step_up_backs_off(governor):
+    governor.set_level(1)
+    feed(governor, 5.0, 150)
+    assert governor.level == 0
+    feed(governor, 19.0, 30)
+    assert governor.level == 1 and governor.hold_frames == 300
+    # The next attempt waits twice as long
+    feed(governor, 5.0, 299)
+    assert governor.level == 1
+    feed(governor, 5.0, 1)
+    assert governor.level == 0
+
+
+def test_budget_follows_the_eyes_fps(governor):
+    # 25 fps after the governor was set up: 40 ms budget
+    governor.eyes.fps = 25
+    feed(governor, 19.0, 60)
+    assert governor.level == 0
+    feed(governor, 35.0, 30)
+    assert governor.level == 1
+
+
+def test_rest_frames_are_ignored(governor):
+    for _ in range(100):
+        governor.on_frame(frame(50.0, rest=True))
+    assert governor.level == 0 and not governor.samples
+
+
+def reduced_eyes(level, dirty_rects=True):
+    clock = SimulatedClock()
+    eyes = RoboEyes(320, 160, headless=True, seed=8, time_source=clock)
+    eyes.dirty_rects_enabled = dirty_rects
+    governor = QualityGovernor(eyes, hold_frames=10 ** 9)
+    governor.set_level(level)
+    eyes.open()
+    return eyes, clock
+
+
+@pytest.mark.parametrize("level", [3, 4])
+def test_reduced_level_skips_frames_at_rest(level):
+    eyes, clock = reduced_eyes(level)
+    for _ in range(100):
+        clock.advance(20)
+        eyes.draw_eyes()
+    eyes.screen.fill((1, 2, 3))
+    skipped = eyes.profiler.frame_count
+    for _ in range(20):
+        clock.advance(20)
+        eyes.draw_eyes()
+    assert eyes.screen.get_at((0, 0))[:3] == (1, 2, 3)
+    assert all("rest_wait" in record["phases"] for record in list(eyes.profiler.frames)[skipped:])
+
+
+@pytest.mark.parametrize("level", [3, 4])
+def test_reduced_level_dirty_rects_match_full_upscales(level):
+    eyes, clock = reduced_eyes(level)
+    reference, reference_clock = reduced_eyes(level, dirty_rects=False)
+    partial = 0
+    for i in range(200):
+        if i == 30:
+            eyes.set_mood(Mood.HAPPY)
+            reference.set_mood(Mood.HAPPY)
+        if i == 80:
+            eyes.anim_laugh()
+            reference.anim_laugh()
+        for instance, instance_clock in ((eyes, clock), (reference, reference_clock)):
+            instance_clock.advance(20)
+            instance.draw_eyes()
+        assert pygame.image.tobytes(eyes.screen, "RGB") == pygame.image.tobytes(reference.screen, "RGB"), i
+        partial += eyes.dirty_rects != [eyes.screen.get_rect()] and bool(eyes.dirty_rects)
+    assert partial > 50
@@ -0,0 +1,89 @@
+import pygame
+import pytest
+
+from emotions import Mood, Position, RoboEyes, SimulatedClock
+from layout import GEOMETRY, get_layout
+
+REFERENCE = {
+    "eye_width": 288, "eye_height": 288, "border_radius": 40, "space_between": 80, "h_flicker": 16,
+    "v_flicker": 80, "laugh_flicker": 40, "confused_flicker": 160, "curious_margin": 80, "curious_offset": 64,
+}
+
+
+def test_reference_screen_keeps_the_original_constants():
+    layout = get_layout(1024, 512)
+    assert {name: getattr(layout, name) for name in GEOMETRY} == REFERENCE
+    assert (layout.eye_l_x_default, layout.eye_l_y_default) == (184, 112)
+    assert layout.position(Position.SE) == (layout.constraint_x, layout.constraint_y) == (368, 224)
+    assert get_layout(1024, 512) is layout
+
+
+@pytest.mark.parametrize("width, height", [(128, 64), (256, 128), (320, 160), (2048, 1024), (200, 300), (1920, 1080)])
+def test_geometry_scales_with_the_face(width, height):
+    layout = get_layout(width, height)
+    factor = min(width / 2, height) / 512
+    assert layout.scale == factor
+    for name, pixels in REFERENCE.items():
+        assert abs(getattr(layout, name) - max(1, pixels * factor)) <= 0.5, name
+    # The eyes are centered with the same proportions
+    face = 2 * layout.eye_width + layout.space_between
+    assert abs(2 * layout.eye_l_x_default + face - width) <= 1
+    assert abs(2 * layout.eye_l_y_default + layout.eye_height - height) <= 1
+    assert layout.eye_r_x_default == layout.eye_l_x_default + layout.eye_width + layout.space_between
+    assert layout.position(Position.E) == (width - face, (height - layout.eye_height) // 2)
+    assert layout.position(0) == layout.center
+
+
+def test_doubling_the_screen_doubles_the_geometry():
+    small, large = get_layout(256, 128), get_layout(512, 256)
+    for name in GEOMETRY:
+        assert abs(getattr(large, name) - 2 * getattr(small, name)) <= 1, name
+
+
+GEOMETRY_FIELDS = [
+    prefix + name for prefix in ("eye_l_", "eye_r_") for name in (
+        "width_default", "width_current", "width_next", "height_default", "height_current", "height_next",
+        "border_radius", "border_radius_current", "border_radius_next", "x_default", "y_default",
+        "x", "y", "x_next", "y_next")
+] + ["space_between_default", "space_between_current", "space_between_next",
+     "eyelids_tired_height", "eyelids_angry_height", "eyelids_happy_bottom_offset",
+     "h_flicker_amplitude", "v_flicker_amplitude"]
+
+
+def face(width, height, mood):
+    clock = SimulatedClock()
+    eyes = RoboEyes(width, height, headless=True, seed=9, time_source=clock)
+    eyes.open()
+    eyes.set_mood(mood)
+    eyes.set_sweat(True)
+    for _ in range(100):
+        clock.advance(20)
+        eyes.draw_eyes()
+    return eyes
+
+
+@pytest.mark.parametrize("mood", list(Mood))
+def test_resized_face_matches_a_fresh_one(mood):
+    resized = face(128, 64, mood)
+    resized.resize(320, 160)
+    fresh = face(320, 160, mood)
+    assert {name: getattr(resized, name) for name in GEOMETRY_FIELDS} == \
+        {name: getattr(fresh, name) for name in GEOMETRY_FIELDS}
+
+    # Same drops from here on; the emitter itself must have the new size
+    resized.sweat_drops.restore(fresh.sweat_drops.snapshot())
+    for frame in range(150):
+        if frame == 20:
+            for eyes in (resized, fresh):
+                eyes.set_position(Position.NE)
+                eyes.set_curiosity(True)
+        if frame == 80:
+            for eyes in (resized, fresh):
+                eyes.anim_laugh()
+        for eyes in (resized, fresh):
+            eyes.update(eyes.time_source.advance(20))
+        assert resized.screen.get_size() == (320, 160)
+        rendered = [pygame.image.tobytes(eyes.render(pygame.Surface((320, 160))), "RGB") for eyes in (resized, fresh)]
+        assert rendered[0] == rendered[1], frame
+    # Nothing drawn at the old size is left in the sprite cache
+    assert set(resized.sprite_cache.entries) <= set(fresh.sprite_cache.entries)
@@ -0,0 +1,83 @@
+import copy
+
+import numpy as np
+
+from particles import ParticleEmitter, rain, sweat
+
+
+def test_spawns_and_respawns_inside_the_bands():
+    emitter = sweat(512, np.random.default_rng(1), count=30, scale=0.5)
+    low, high = emitter.y_max_range
+    # Until their first respawn the drops all start at the same point
+    spawned = np.zeros(emitter.count, dtype=bool)
+    respawns = 0
+    for _ in range(2000):
+        falling = emitter.y <= emitter.y_max
+        emitter.update(4.0)
+        respawned = ~falling
+        respawns += np.count_nonzero(respawned)
+        spawned |= respawned
+        x_initial = emitter.x_initial[spawned]
+        assert ((x_initial >= emitter.x_low[spawned]) & (x_initial <= emitter.x_high[spawned])).all()
+        assert ((emitter.y_max[spawned] >= low) & (emitter.y_max[spawned] <= high)).all()
+        assert (emitter.y >= emitter.spawn_y).all()
+        assert (emitter.y[respawned] == emitter.spawn_y).all()
+        assert (emitter.width >= emitter.min_size).all() and (emitter.height >= emitter.min_size).all()
+    assert spawned.all() and respawns > 100
+    # Left, middle and right bands of the forehead
+    assert emitter.x_high[0] == emitter.x_low[1] == 120 and emitter.x_low[2] == 512 - 120
+
+
+def test_scattered_particles_start_along_their_path():
+    emitter = rain(200, 100, np.random.default_rng(2), count=500)
+    assert ((emitter.x_initial >= 0) & (emitter.x_initial <= 200)).all()
+    assert ((emitter.y >= emitter.spawn_y) & (emitter.y <= emitter.y_max)).all()
+    assert emitter.y.std() > 10
+
+
+def test_one_step_of_two_equals_two_steps_of_one():
+    emitter = ParticleEmitter(500, [(0, 200)], np.random.default_rng(3), scatter=True)
+    twice = copy.deepcopy(emitter)
+    emitter.update(2.0)
+    twice.update(1.0)
+    twice.update(1.0)
+    # Particles that reach the halfway point or the end of their path
+    # in between switch from growing to shrinking or respawn one step apart
+    travel = 2 * emitter.speed
+    crossing = ((emitter.y > emitter.y_max / 2) & (emitter.y - travel <= emitter.y_max / 2)
+                | (emitter.y == emitter.spawn_y) | (twice.y == twice.spawn_y) | (twice.y > twice.y_max))
+    assert 50 < np.count_nonzero(~crossing) < emitter.count
+    for name in ("x", "y", "width", "height"):
+        assert np.allclose(getattr(emitter, name)[~crossing], getattr(twice, name)[~crossing]), name
+
+
+def test_restore_replays_the_same_particles():
+    emitter = sweat(256, np.random.default_rng(4), scale=0.25)
+    for _ in range(50):
+        emitter.update(3.0)
+    snapshot = emitter.snapshot()
+
+    def play():
+        rects = []
+        for _ in range(400):
+            emitter.update(3.0)
+            rects.append([column.tolist() for column in emitter.rects()])
+        return rects
+
+    first = play()
+    emitter.restore(snapshot)
+    assert play() == first
+    # The snapshot is a copy, so it replays after further updates too
+    emitter.restore(snapshot)
+    assert play() == first
+
+
+def test_inactive_particles_stay_put():
+    emitter = sweat(256, np.random.default_rng(5), count=6, scale=0.25)
+    active = np.array([True, False] * 3)
+    before = emitter.snapshot()
+    for _ in range(300):
+        emitter.update(2.0, active)
+    for column, previous in zip(emitter.snapshot()[:6], before[:6]):
+        assert np.array_equal(column[~active], previous[~active])
+        assert not np.array_equal(column[active], previous[active])
@@ -0,0 +1,76 @@
+import time
+
+import numpy as np
+import pygame
+
+from emotions import Mood, Position, RoboEyes
+from pipeline import PipelinedRuntime
+from shm import SharedFrameReader, SharedFrameWriter
+
+
+def full_render(eyes):
+    surface = pygame.Surface(eyes.screen.get_size())
+    eyes.render(surface)
+    return pygame.image.tobytes(surface, "RGB")
+
+
+def settled_runtime():
+    eyes = RoboEyes(320, 160, headless=True, seed=1)
+    eyes.open()
+    runtime = PipelinedRuntime(eyes, threaded_present=False).start()
+    deadline = time.monotonic() + 10
+    while runtime.present(timeout=0.3):
+        assert time.monotonic() < deadline
+    # Rest waits now last five seconds unless something wakes the update
+    # thread (and fps // 1 == 0 turns the frame limiter off)
+    eyes.fps = 0.2
+    time.sleep(0.1)
+    return eyes, runtime
+
+
+def test_call_and_wake_end_the_rest_wait():
+    eyes, runtime = settled_runtime()
+    try:
+        runtime.call("set_cyclops", True)
+        assert runtime.present(timeout=0.5)
+        time.sleep(0.1)
+        eyes.MAIN_COLOR = (255, 0, 0)
+        eyes.wake()
+        assert runtime.present(timeout=0.5)
+        assert pygame.image.tobytes(eyes.screen, "RGB") == full_render(eyes)
+    finally:
+        runtime.stop()
+    assert eyes.wake_hooks == []
+
+
+def test_shared_frames_carry_their_own_dirty_rects():
+    eyes = RoboEyes(128, 64, headless=True, seed=2)
+    writer = SharedFrameWriter(128, 64, slots=256)
+    reader = SharedFrameReader(writer.name)
+    eyes.outputs.append(writer)
+    eyes.open()
+    runtime = PipelinedRuntime(eyes, threaded_present=False).start()
+    try:
+        for command in (None, ("anim_laugh",), ("set_mood", Mood.ANGRY), ("set_position", Position.NE)):
+            if command:
+                runtime.call(*command)
+            while runtime.present(timeout=0.3):
+                pass
+    finally:
+        runtime.stop()
+    try:
+        assert 20 < writer.seq < writer.slots
+        previous = None
+        for seq in range(1, writer.seq + 1):
+            begin, end, timestamp_ms, x, y, w, h = reader.slot_header(seq % writer.slots)
+            assert begin == end == seq
+            pixels = reader.pixels[seq % writer.slots][:, :, :3].copy()
+            if previous is not None:
+                assert timestamp_ms >= previous_ms
+                outside = np.ones(pixels.shape[:2], dtype=bool)
+                outside[y:y + h, x:x + w] = False
+                assert (pixels[outside] == previous[outside]).all(), seq
+            previous, previous_ms = pixels, timestamp_ms
+    finally:
+        reader.close()
+        writer.close()
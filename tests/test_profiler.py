@@ -0,0 +1,81 @@
+import io
+
+import pytest
+
+import profiler as profiler_module
+from emotions import RoboEyes, SimulatedClock
+from governor import QUALITY_LEVELS
+from profiler import FrameProfiler
+
+
+@pytest.fixture
+def fake_time(monkeypatch):
+    """Milliseconds the profiler sees passing, advanced by hand"""
+    now = [0.0]
+    monkeypatch.setattr(profiler_module.time, "perf_counter", lambda: now[0] / 1000)
+    return now
+
+
+def frame(profiler, now, phases, budget_ms=None):
+    profiler.begin_frame()
+    for phase, ms in phases:
+        now[0] += ms
+        profiler.mark(phase)
+    return profiler.end_frame(budget_ms)
+
+
+def test_ring_buffer_keeps_the_last_frames(fake_time):
+    profiler = FrameProfiler(22.0, capacity=5)
+    for i in range(8):
+        frame(profiler, fake_time, [("draw", 5.0 * i), ("tick", 100.0)])
+    assert profiler.frame_count == 8 and len(profiler.frames) == 5
+    assert [record["phases"]["draw"] for record in profiler.frames] == pytest.approx([15.0, 20.0, 25.0, 30.0, 35.0])
+    # Sleeping in tick is not work
+    assert [record["missed"] for record in profiler.frames] == [False, False, True, True, True]
+    assert profiler.missed == 3
+    profiler.reset()
+    assert profiler.frame_count == profiler.missed == 0 and not profiler.frames
+
+
+def test_stats_summarize_the_buffered_frames(fake_time):
+    profiler = FrameProfiler(20.5)
+    seen = []
+    profiler.add_hook(seen.append)
+    for ms in range(1, 21):
+        frame(profiler, fake_time, [("easing", 1.0), ("draw", float(ms)), ("rest_wait", 50.0)])
+    stats = profiler.stats()
+    assert stats["frames"] == 20 and stats["missed"] == 1 and stats["budget_ms"] == 20.5
+    assert stats["phases"]["draw"] == pytest.approx({"mean_ms": 10.5, "p95_ms": 20.0, "max_ms": 20.0})
+    assert stats["phases"]["easing"] == pytest.approx({"mean_ms": 1.0, "p95_ms": 1.0, "max_ms": 1.0})
+    assert stats["phases"]["work"] == pytest.approx({"mean_ms": 11.5, "p95_ms": 21.0, "max_ms": 21.0})
+    assert len(seen) == 20 and seen[-1] is profiler.frames[-1]
+    out = io.StringIO()
+    profiler.dump(out)
+    assert out.getvalue().startswith("frames 20, missed deadlines 1 (budget 20.5 ms)")
+
+
+def test_budget_can_change_per_frame(fake_time):
+    profiler = FrameProfiler(20.0)
+    assert frame(profiler, fake_time, [("draw", 30.0)])["missed"]
+    record = frame(profiler, fake_time, [("draw", 30.0)], budget_ms=40.0)
+    assert not record["missed"] and record["budget_ms"] == 40.0
+    # Later frames keep the last budget
+    assert not frame(profiler, fake_time, [("draw", 30.0)])["missed"]
+
+
+def test_eyes_budget_follows_fps_and_quality():
+    clock = SimulatedClock()
+    eyes = RoboEyes(128, 64, headless=True, time_source=clock)
+    profiler = eyes.enable_profiling()
+    eyes.open()
+
+    def budget():
+        clock.advance(20)
+        eyes.draw_eyes()
+        return profiler.frames[-1]["budget_ms"]
+
+    assert budget() == 20.0
+    eyes.fps = 25
+    assert budget() == 40.0
+    eyes.set_quality(QUALITY_LEVELS[-1])
+    assert budget() == 80.0 and profiler.stats()["budget_ms"] == 80.0
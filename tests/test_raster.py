@@ -0,0 +1,72 @@
+import numpy as np
+import pygame
+import pytest
+
+from emotions import Mood, RoboEyes, SimulatedClock
+from raster import NumpyBackend, render_eyes, shade, to_mono, to_rgb565
+
+# Without antialias both backends draw the same shapes, except that pygame's
+# midpoint-circle corners leave out up to two pixels per corner that the
+# exact circles cover. While lids are moving their sloped edges also round
+# differently: either two eyes with a lid each or a cyclops with two lids.
+SETTLED_TOLERANCE = 8
+MOVING_TOLERANCE = 2 * 24
+
+
+def run(mood, cyclops, backend=None, frames=40):
+    """The face and its screen pixels after each frame of easing into mood"""
+    clock = SimulatedClock()
+    eyes = RoboEyes(256, 128, headless=True, seed=5, time_source=clock)
+    if backend is not None:
+        eyes.set_backend(backend)
+    eyes.open()
+    eyes.set_mood(mood)
+    eyes.set_cyclops(cyclops)
+    for _ in range(frames):
+        clock.advance(20)
+        eyes.draw_eyes()
+        yield eyes, pygame.surfarray.array3d(eyes.screen).swapaxes(0, 1)
+
+
+def differing(a, b):
+    return np.count_nonzero(np.any(a != b, axis=-1))
+
+
+@pytest.mark.parametrize("cyclops", [False, True])
+@pytest.mark.parametrize("mood", list(Mood))
+def test_numpy_backend_matches_pygame(mood, cyclops):
+    drawn = 1 if cyclops else 2
+    frames = zip(run(mood, cyclops), run(mood, cyclops, NumpyBackend(antialias=False)))
+    for frame, ((eyes, expected), (_, actual)) in enumerate(frames):
+        tolerance = drawn * SETTLED_TOLERANCE if eyes.is_at_rest() else MOVING_TOLERANCE
+        assert differing(actual, expected) <= tolerance, frame
+        # The same shapes rasterized without any surface
+        rasterized = shade(render_eyes(eyes, antialias=False), eyes.MAIN_COLOR, eyes.BG_COLOR)
+        assert differing(rasterized, expected) <= tolerance, frame
+    assert eyes.is_at_rest()
+
+
+def test_antialiased_edges_are_blended():
+    *_, (eyes, expected) = run(Mood.DEFAULT, False)
+    eyes.set_backend(NumpyBackend())
+    eyes.render()
+    actual = pygame.surfarray.array3d(eyes.screen).swapaxes(0, 1)
+    blended = np.any((actual != 0) & (actual != eyes.MAIN_COLOR), axis=-1)
+    assert np.count_nonzero(blended) > 0
+    # Fully covered and uncovered pixels are the same as pygame's
+    mismatched = ~blended & np.any(expected != actual, axis=-1)
+    assert np.count_nonzero(mismatched) <= 2 * SETTLED_TOLERANCE
+
+
+def test_to_rgb565():
+    image = np.array([[[255, 255, 255], [255, 0, 0], [0, 255, 0], [0, 0, 255]],
+                      [[8, 4, 8], [7, 3, 7], [0, 200, 255], [0, 0, 0]]], dtype=np.uint8)
+    assert to_rgb565(image).tolist() == [[0xFFFF, 0xF800, 0x07E0, 0x001F],
+                                         [0x0821, 0x0000, 0x065F, 0x0000]]
+    assert to_rgb565(image).dtype == np.uint16
+
+
+def test_to_mono():
+    coverage = np.array([[0.0, 0.49, 0.5, 1.0]], dtype=np.float32)
+    assert to_mono(coverage).tolist() == [[False, False, True, True]]
+    assert to_mono(coverage, threshold=0.25).tolist() == [[False, True, True, True]]
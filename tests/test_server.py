@@ -0,0 +1,86 @@
+import json
+import socket
+
+import pytest
+
+from emotions import Mood, Position, RoboEyes, SimulatedClock, parse_command
+from server import CommandServer, parse_line
+
+
+def test_parse_line_converts_enum_names():
+    assert parse_line('[["set_mood", "HAPPY"], ["blink"]]') == [("set_mood", (Mood.HAPPY,)), ("blink", ())]
+
+
+@pytest.mark.parametrize("line", ['["set_sweat"]', '["blink", 1, 2, 3]', '["set_gaze", 0.5]', '["explode"]', "{}"])
+def test_parse_line_rejects_bad_commands(line):
+    with pytest.raises(ValueError):
+        parse_line(line)
+
+
+@pytest.mark.parametrize("command", [
+    ["set_autoblinker", True, "2"], ["set_h_flicker", True, "big"], ["set_sweat", 1], ["set_mood", 7],
+    ["set_position", "UP"], ["set_gaze", 0.5, None], ["set_gaze", True, 0], ["set_idle_mode", True, -1],
+    ["blink", "yes"],
+])
+def test_parse_line_rejects_bad_argument_types(command):
+    with pytest.raises(ValueError, match=command[0]):
+        parse_line(json.dumps(command))
+
+
+def test_parse_command_converts_arguments():
+    assert parse_command("set_position", ["ne"]) == ("set_position", (Position.NE,))
+    assert parse_command("set_position", [0]) == ("set_position", (0,))
+    assert parse_command("set_mood", [3]) == ("set_mood", (Mood.HAPPY,))
+    assert parse_command("set_gaze", [1, -0.5]) == ("set_gaze", (1.0, -0.5))
+    assert parse_command("set_v_flicker", [True, None]) == ("set_v_flicker", (True, None))
+
+
+def test_parse_command_checks_argument_count():
+    assert parse_command("set_autoblinker", [True]) == ("set_autoblinker", (True,))
+    with pytest.raises(ValueError, match="set_sweat"):
+        parse_command("set_sweat", [])
+
+
+def test_apply_pending_survives_failing_command():
+    eyes = RoboEyes(64, 32, headless=True)
+    server = CommandServer(eyes)
+    server.pending.put(("set_mood", ()))
+    server.pending.put(("set_cyclops", (True,)))
+    assert server.apply_pending() == 1
+    assert server.failed == 1
+    assert eyes.cyclops
+
+
+def test_round_trip_and_clean_stop(capfd):
+    eyes = RoboEyes(64, 32, headless=True)
+    server = CommandServer(eyes, port=0).start()
+    with socket.create_connection(("127.0.0.1", server.port)) as client:
+        client.sendall(b'["set_sweat"]\n["set_cyclops", true]\n')
+        reader = client.makefile()
+        assert json.loads(reader.readline())["ok"] is False
+        assert json.loads(reader.readline()) == {"ok": True}
+        assert server.apply_pending() == 1
+        # Still connected while the server stops
+        server.stop()
+    assert eyes.cyclops
+    assert "Traceback" not in capfd.readouterr().err
+
+
+def test_badly_typed_commands_never_reach_the_eyes():
+    clock = SimulatedClock()
+    eyes = RoboEyes(64, 32, headless=True, seed=1, time_source=clock)
+    eyes.open()
+    server = CommandServer(eyes, port=0).start()
+    try:
+        with socket.create_connection(("127.0.0.1", server.port)) as client:
+            client.sendall(b'["set_autoblinker", true, "2"]\n["set_h_flicker", true, "big"]\n'
+                           b'["set_autoblinker", true, 1, 0]\n')
+            reader = client.makefile()
+            assert [json.loads(reader.readline())["ok"] for _ in range(3)] == [False, False, True]
+    finally:
+        server.stop()
+    assert server.apply_pending() == 1
+    for _ in range(200):
+        clock.advance(20)
+        eyes.draw_eyes()
+    assert not eyes.h_flicker and eyes.autoblinker
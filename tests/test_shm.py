@@ -0,0 +1,85 @@
+import multiprocessing
+
+import numpy as np
+import pygame
+import pytest
+
+from emotions import RoboEyes, SimulatedClock
+from shm import SLOT_HEADER, SharedFrameReader, SharedFrameWriter, slot_offset
+
+
+@pytest.fixture
+def ring():
+    writer = SharedFrameWriter(64, 32, slots=2)
+    reader = SharedFrameReader(writer.name)
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def test_reader_sees_the_eyes_frames():
+    clock = SimulatedClock(500)
+    eyes = RoboEyes(64, 32, headless=True, seed=1, time_source=clock)
+    writer = SharedFrameWriter(64, 32)
+    reader = SharedFrameReader(writer.name)
+    try:
+        assert reader.read() is None
+        eyes.outputs.append(writer)
+        eyes.open()
+        clock.advance(20)
+        eyes.draw_eyes()
+        frame = reader.read()
+        expected = pygame.surfarray.array3d(eyes.screen).swapaxes(0, 1)
+        assert reader.pixel_format == b"BGRX"
+        assert np.array_equal(frame.pixels[:, :, 2::-1], expected)
+        assert frame.seq == 1 and frame.timestamp_ms == 520
+        assert frame.dirty_rect == tuple(eyes.dirty_rects[0].unionall(eyes.dirty_rects[1:]))
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_views_go_stale_when_the_slot_is_reused(ring):
+    writer, reader = ring
+    surface = pygame.Surface((64, 32))
+    writer.write(surface)
+    frame = reader.read(copy=False)
+    assert reader.is_current(frame)
+    writer.write(surface)
+    assert reader.is_current(frame)
+    writer.write(surface)
+    assert not reader.is_current(frame)
+
+
+def test_half_written_slot_is_not_read(ring):
+    writer, reader = ring
+    seq = writer.write(pygame.Surface((64, 32)))
+    # What a reader sees while the writer is copying the next frame into this slot
+    offset = slot_offset(seq % writer.slots, writer.frame_bytes)
+    begin, end, *rest = SLOT_HEADER.unpack_from(writer.shm.buf, offset)
+    SLOT_HEADER.pack_into(writer.shm.buf, offset, begin + writer.slots, end, *rest)
+    assert reader.read() is None
+
+
+def publish(writer, count):
+    surface = pygame.Surface((64, 32))
+    for seq in range(1, count + 1):
+        surface.fill((seq % 256, 0, 0))
+        writer.write(surface)
+
+
+def test_concurrent_reads_are_never_torn(ring):
+    writer, reader = ring
+    count = 3000
+    process = multiprocessing.get_context("fork").Process(target=publish, args=(writer, count))
+    process.start()
+    frames = 0
+    while process.is_alive() or frames == 0:
+        frame = reader.read()
+        if frame is None:
+            continue
+        frames += 1
+        red = frame.pixels[:, :, 2]
+        assert (red == frame.seq % 256).all()
+    process.join()
+    assert process.exitcode == 0 and reader.latest_seq() == count
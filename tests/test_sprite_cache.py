@@ -0,0 +1,59 @@
+import pygame
+
+from emotions import Mood, RoboEyes, SimulatedClock
+from sprite_cache import SpriteCache
+
+
+def sprite(width=10, height=10):
+    return pygame.Surface((width, height))
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SpriteCache(max_entries=2)
+    a, b, c = sprite(), sprite(), sprite()
+    cache.get("a", lambda: a)
+    cache.get("b", lambda: b)
+    assert cache.get("a", sprite) is a
+    cache.get("c", lambda: c)
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 3 and cache.evictions == 1
+
+
+def test_byte_limit():
+    size = SpriteCache.surface_bytes(sprite())
+    cache = SpriteCache(max_bytes=2 * size)
+    for key in "abc":
+        cache.get(key, sprite)
+    assert list(cache.entries) == ["b", "c"] and cache.bytes_used == 2 * size
+    # Larger than the whole budget: returned but never cached
+    cache.get("big", lambda: sprite(100, 100))
+    assert "big" not in cache.entries and cache.bytes_used == 2 * size
+    cache.clear()
+    assert cache.bytes_used == 0 and not cache.entries
+
+
+def frames(sprite_cache):
+    clock = SimulatedClock()
+    eyes = RoboEyes(320, 160, headless=True, seed=4, time_source=clock)
+    eyes.sprite_cache = sprite_cache
+    eyes.open()
+    eyes.set_autoblinker(True, 1, 1)
+    result = []
+    for frame in range(300):
+        if frame % 60 == 30:
+            eyes.set_mood(Mood((frame // 60) % 4))
+        if frame == 200:
+            eyes.anim_laugh()
+        clock.advance(20)
+        eyes.draw_eyes()
+        result.append(pygame.image.tobytes(eyes.screen, "RGB"))
+    return result
+
+
+def test_cached_sprites_draw_the_same_frames():
+    cache = SpriteCache()
+    assert frames(cache) == frames(None)
+    # The same run again finds every sprite in the cache
+    misses = cache.misses
+    assert frames(cache) == frames(None)
+    assert cache.misses == misses and cache.hits > misses
@@ -0,0 +1,47 @@
+import numpy as np
+import pygame
+
+from emotions import Mood, RoboEyes, SimulatedClock
+from stream import FLAG_KEYFRAME, HEADER, DeltaDecoder, DeltaEncoder
+
+
+def is_keyframe(packet):
+    return bool(HEADER.unpack_from(packet, 0)[2] & FLAG_KEYFRAME)
+
+
+def test_round_trip_of_animated_frames():
+    # Not a multiple of the tile size, so edge tiles are cropped
+    clock = SimulatedClock()
+    eyes = RoboEyes(200, 100, headless=True, seed=6, time_source=clock)
+    eyes.open()
+    eyes.set_autoblinker(True, 1, 1)
+    eyes.set_sweat(True)
+    encoder = DeltaEncoder(200, 100, keyframe_interval=50)
+    decoder = DeltaDecoder()
+    for frame in range(150):
+        if frame == 40:
+            eyes.set_mood(Mood.HAPPY)
+        clock.advance(20)
+        eyes.draw_eyes()
+        packet = encoder.encode(eyes.screen)
+        assert is_keyframe(packet) == (frame % 50 == 0)
+        assert decoder.decode(packet)
+        assert bytes(decoder.frame) == pygame.image.tobytes(eyes.screen, "RGB"), frame
+    assert encoder.compression_ratio() > 10
+
+
+def test_decoder_resyncs_on_the_next_keyframe():
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 4, (40, 50, 3), dtype=np.uint8) * 60 for _ in range(6)]
+    encoder = DeltaEncoder(50, 40, tile_size=8, keyframe_interval=0)
+    packets = [encoder.encode(frame) for frame in frames[:3]]
+    encoder.request_keyframe()
+    packets += [encoder.encode(frame) for frame in frames[3:]]
+    decoder = DeltaDecoder()
+    assert decoder.decode(packets[0])
+    # packets[1] is lost
+    assert not decoder.decode(packets[2])
+    assert decoder.decode(packets[3]) and is_keyframe(packets[3])
+    for frame, packet in zip(frames[4:], packets[4:]):
+        assert decoder.decode(packet)
+        assert bytes(decoder.frame) == frame.tobytes()
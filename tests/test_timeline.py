@@ -0,0 +1,56 @@
+import json
+
+import pygame
+import pytest
+
+from emotions import Mood, RoboEyes
+from timeline import ClipPlayer, Timeline, TimelinePlayer, compile_timeline, frame_time_ms
+
+WIDTH, HEIGHT, FPS, SEED = 192, 96, 50, 7
+SCRIPT = {
+    "duration_ms": 5000,
+    "commands": [
+        [0, "open"], [0, "set_autoblinker", True, 1, 1],
+        [400, "set_mood", "HAPPY"], [900, "anim_laugh"],
+        [1600, "set_mood", "TIRED"], [1600, "set_position", "NE"],
+        [2200, "set_curiosity", True], [2200, "set_position", "W"],
+        [2800, "anim_confused"], [3300, "set_sweat", True],
+        [3800, "set_mood", "ANGRY"], [4200, "set_cyclops", True], [4200, "set_position", 0],
+    ],
+}
+
+
+def render(eyes):
+    return pygame.image.tobytes(eyes.render(pygame.Surface((WIDTH, HEIGHT))), "RGB")
+
+
+def test_compiled_clip_matches_live_rendering():
+    timeline = Timeline.from_dict(SCRIPT)
+    clip = compile_timeline(timeline, WIDTH, HEIGHT, FPS, SEED)
+    assert clip.frame_count == timeline.frame_count(FPS) == 251
+
+    live = RoboEyes(WIDTH, HEIGHT, headless=True, seed=SEED)
+    timeline_player = TimelinePlayer(timeline, live)
+    played = RoboEyes(WIDTH, HEIGHT, headless=True)
+    clip_player = ClipPlayer(clip, played)
+    for frame in range(clip.frame_count):
+        timeline_player.advance(frame_time_ms(frame, FPS))
+        clip_player.seek(frame)
+        assert render(played) == render(live), frame
+
+
+def test_commands_are_parsed_and_sorted(tmp_path):
+    path = tmp_path / "script.json"
+    path.write_text(json.dumps({"commands": [[500, "set_mood", "HAPPY"], [0, "open"], [500, "blink"]]}))
+    timeline = Timeline.load(str(path))
+    assert timeline.commands == [(0, "open", ()), (500, "set_mood", (Mood.HAPPY,)), (500, "blink", ())]
+    assert timeline.duration_ms == 500
+    with pytest.raises(ValueError):
+        Timeline().at(0, "set_mood", "SLEEPY")
+
+
+def test_frame_at_wraps_or_holds():
+    clip = compile_timeline(Timeline(1000, [[0, "open"]]), WIDTH, HEIGHT, FPS)
+    assert clip.frame_at(-100) == 0
+    assert clip.frame_at(5000) == clip.frame_count - 1
+    assert clip.frame_at(clip.duration_ms() + 40, loop=True) == 2
@@ -1,15 +1,13 @@
 from emotions import RoboEyes, Mood, Position
 import pygame
 
-pygame.init()
-
 eyes = RoboEyes(1024, 512)
 eyes.open()
 eyes.set_autoblinker(True, 2, 3)
     
 running = True
 demo_state = 0
-state_timer = pygame.time.get_ticks()
+state_timer = eyes.time_source()
 state_duration = 3000
     
 print("RoboEyes Demo Started!")
@@ -65,7 +63,7 @@ while running:
             elif event.key == pygame.K_SPACE:
                 eyes.blink()
     
-    current_time = pygame.time.get_ticks()
+    current_time = eyes.time_source()
     if current_time - state_timer > state_duration:
         demo_state = (demo_state + 1) % 8
         state_timer = current_time
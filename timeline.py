@@ -0,0 +1,227 @@
+"""
+Declarative RoboEyes timelines and clips compiled from them.
+
+A Timeline is a list of timed RoboEyes calls, loaded from JSON (or YAML when
+PyYAML is installed):
+
+    {"duration_ms": 6000,
+     "commands": [[0, "open"], [0, "set_autoblinker", true, 2, 3],
+                  [1000, "set_mood", "HAPPY"], [3000, "anim_laugh"],
+                  [4000, "set_position", "NE"]]}
+
+compile_timeline() runs a timeline once with a simulated clock and records,
+frame by frame, everything render() reads: eye positions and sizes, border
+radii, eyelid heights, flicker offsets and the sweat drops. The resulting
+Clip plays back by indexing those arrays, so seeking, looping and scrubbing
+cost the same at any point of the clip and no easing logic runs:
+
+    clip = compile_timeline(Timeline.load("demo.json"), 1024, 512, fps=50)
+    player = ClipPlayer(clip, RoboEyes(1024, 512), loop=True)
+    player.show(eyes.time_source())
+
+    python timeline.py demo.json --loop     # preview with scrubbing
+"""
+import argparse
+import json
+
+import numpy as np
+import pygame
+
+from emotions import RENDER_FIELDS, RoboEyes, get_render_state, parse_command
+
+PARTICLE_FIELDS = ("x", "y", "width", "height")
+
+# The mood cycle of emotions.main(), one state every 3 s
+DEMO_TIMELINE = {
+    "duration_ms": 24000,
+    "commands": [
+        [0, "open"], [0, "set_autoblinker", True, 2, 3],
+        [3000, "set_mood", "HAPPY"],
+        [6000, "set_mood", "TIRED"],
+        [9000, "set_mood", "ANGRY"],
+        [12000, "set_mood", "DEFAULT"], [12000, "set_curiosity", True], [12000, "set_idle_mode", True, 1, 2],
+        [15000, "set_curiosity", False], [15000, "set_idle_mode", False], [15000, "anim_laugh"],
+        [18000, "anim_confused"],
+        [21000, "set_sweat", True],
+    ],
+}
+
+
+def frame_time_ms(frame, fps):
+    return frame * 1000 // fps
+
+
+class Timeline:
+    """Timed RoboEyes calls, kept sorted by time (stable for equal times)"""
+    def __init__(self, duration_ms=0, commands=()):
+        self.duration_ms = duration_ms
+        self.commands = []
+        for command in commands:
+            self.at(*command)
+
+    def at(self, time_ms, method, *args):
+        method, args = parse_command(method, args)
+        self.commands.append((time_ms, method, args))
+        self.commands.sort(key=lambda command: command[0])
+        self.duration_ms = max(self.duration_ms, time_ms)
+        return self
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("duration_ms", 0), data.get("commands", ()))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            if path.endswith((".yaml", ".yml")):
+                # Optional dependency, only needed for YAML timelines
+                import yaml
+                return cls.from_dict(yaml.safe_load(f))
+            return cls.from_dict(json.load(f))
+
+    def frame_count(self, fps):
+        return int(self.duration_ms * fps // 1000) + 1
+
+
+class TimelinePlayer:
+    """Applies the calls of a timeline to a RoboEyes instance as time advances"""
+    def __init__(self, timeline, eyes):
+        self.timeline = timeline
+        self.eyes = eyes
+        self.position = 0
+
+    def advance(self, now_ms):
+        commands = self.timeline.commands
+        while self.position < len(commands) and commands[self.position][0] <= now_ms:
+            _, method, args = commands[self.position]
+            getattr(self.eyes, method)(*args)
+            self.position += 1
+        self.eyes.update(now_ms)
+
+
+class Clip:
+    """Per-frame render state of a compiled timeline"""
+    def __init__(self, width, height, fps, tracks, particles):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.tracks = tracks            # (frames, len(RENDER_FIELDS)) int32
+        self.particles = particles      # (frames, len(PARTICLE_FIELDS), drops) float64
+        self.frame_count = len(tracks)
+
+    def duration_ms(self):
+        return frame_time_ms(self.frame_count, self.fps)
+
+    def track(self, name):
+        """One field over the whole clip, e.g. clip.track("eye_l_height_current")"""
+        return self.tracks[:, RENDER_FIELDS.index(name)]
+
+    def frame_at(self, time_ms, loop=False):
+        """Frame shown at time_ms; wraps around with loop, otherwise holds the ends"""
+        frame = int(time_ms * self.fps // 1000)
+        if loop:
+            return frame % self.frame_count
+        return min(max(frame, 0), self.frame_count - 1)
+
+    def apply(self, eyes, frame):
+        """Put eyes into the recorded state of frame, ready for render()"""
+        for name, value in zip(RENDER_FIELDS, self.tracks[frame].tolist()):
+            setattr(eyes, name, value)
+        drops = eyes.sweat_drops
+        drops.x, drops.y, drops.width, drops.height = self.particles[frame].copy()
+
+
+def compile_timeline(timeline, width=1024, height=512, fps=50, seed=0):
+    """Run timeline once without drawing and record every frame's render state"""
+    eyes = RoboEyes(width, height, headless=True, seed=seed)
+    player = TimelinePlayer(timeline, eyes)
+    total = timeline.frame_count(fps)
+    drops = eyes.sweat_drops
+    tracks = np.empty((total, len(RENDER_FIELDS)), dtype=np.int32)
+    particles = np.empty((total, len(PARTICLE_FIELDS), drops.count))
+    for frame in range(total):
+        player.advance(frame_time_ms(frame, fps))
+        tracks[frame] = get_render_state(eyes)
+        particles[frame] = drops.x, drops.y, drops.width, drops.height
+    return Clip(width, height, fps, tracks, particles)
+
+
+class ClipPlayer:
+    """Shows a clip on a RoboEyes instance of the same size"""
+    def __init__(self, clip, eyes, loop=False):
+        if (eyes.screen_width, eyes.screen_height) != (clip.width, clip.height):
+            raise ValueError("clip is %dx%d but the eyes are %dx%d"
+                             % (clip.width, clip.height, eyes.screen_width, eyes.screen_height))
+        self.clip = clip
+        self.eyes = eyes
+        self.loop = loop
+        self.frame = None
+
+    def seek(self, frame):
+        """Apply frame (wrapped or clamped like frame_at) and return its index"""
+        clip = self.clip
+        frame = frame % clip.frame_count if self.loop else min(max(frame, 0), clip.frame_count - 1)
+        if frame != self.frame:
+            clip.apply(self.eyes, frame)
+            self.frame = frame
+        return frame
+
+    def render(self, time_ms, surface=None):
+        self.seek(self.clip.frame_at(time_ms, self.loop))
+        return self.eyes.render(surface)
+
+    def show(self, time_ms):
+        """Render the frame at time_ms to the screen and present it like draw_eyes"""
+        eyes = self.eyes
+        self.render(time_ms)
+        for output in eyes.outputs:
+            output(eyes.screen, eyes.dirty_rects, time_ms)
+        eyes.present()
+        return eyes.screen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a RoboEyes timeline and preview it")
+    parser.add_argument("timeline", nargs="?", help="timeline JSON/YAML file (default: the emotions.main demo)")
+    parser.add_argument("--size", default="1024x512", metavar="WxH")
+    parser.add_argument("--fps", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--loop", action="store_true")
+    args = parser.parse_args()
+
+    timeline = Timeline.load(args.timeline) if args.timeline else Timeline.from_dict(DEMO_TIMELINE)
+    width, height = (int(value) for value in args.size.lower().split("x"))
+    clip = compile_timeline(timeline, width, height, args.fps, args.seed)
+    print("Compiled %d frames; SPACE pauses, LEFT/RIGHT scrub 1 s, HOME restarts, ESC exits" % clip.frame_count)
+
+    eyes = RoboEyes(width, height)
+    player = ClipPlayer(clip, eyes, loop=args.loop)
+    position_ms = 0
+    paused = False
+    running = True
+    while running:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_LEFT:
+                    position_ms = max(0, position_ms - 1000)
+                elif event.key == pygame.K_RIGHT:
+                    position_ms += 1000
+                elif event.key == pygame.K_HOME:
+                    position_ms = 0
+        player.show(position_ms)
+        elapsed_ms = eyes.clock.tick(args.fps)
+        if not paused:
+            position_ms += elapsed_ms
+        if not args.loop and position_ms >= clip.duration_ms():
+            paused = True
+            position_ms = clip.duration_ms()
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()